@@ -6,16 +6,37 @@ Batch build Topogram CSVs for a list of source packages using the existing
 The script fetches the Debian Packages file for the given suite/component,
 parses packages, maps source->binary, and for each source in the input CSV it
 selects a representative binary package and builds a Topogram CSV using the
-build_graph/write_topogram_csv functions from the other script.
+build_graph/write_topogram_csv functions from the other script. The parsed
+Packages metadata comes from the shared on-disk index in `debian_packages.py`.
+
+With `--jobs N` the per-source builds run in a process pool. Workers share the
+parsed package index instead of receiving a pickled copy per task: with the
+`fork` start method they inherit it copy-on-write, otherwise each worker
+memory-maps the on-disk index once. Results are reported in input order and a
+failing source is recorded without aborting the batch.
+
+Files are only rewritten when their content changes. With
+`--previous-packages OLD` (the Packages file the existing topograms were built
+from) the batch is incremental: the two snapshots are diffed, a reverse walk
+over the old dependency graph finds the roots whose depth-limited closure
+contains an added, removed or changed package, and only those topograms are
+rebuilt. Every other file is left untouched. A JSON manifest of written,
+removed and failed files goes to `--manifest` (stdout by default in
+incremental mode) so the importer can pick up just those.
 
 Outputs (per source):
-  {outdir}/{source}.topogram.csv
+  {outdir}/{source}.topogram.csv   (.csv.gz/.csv.bz2/.csv.xz/.bin with `--format`)
 
 """
 
 import argparse
 import csv
+import filecmp
+import json
+import multiprocessing
+import os
 import sys
+import traceback
 from pathlib import Path
 
 # Import helper functions from the existing script
@@ -28,10 +49,22 @@ script_path = Path(__file__).parent / 'build_debian_topogram.py'
 spec = importlib.util.spec_from_file_location('bdt', str(script_path))
 bdt = importlib.util.module_from_spec(spec)
 spec.loader.exec_module(bdt)
+# register it so pool workers can unpickle bdt.DependencyGraph under spawn
+sys.modules.setdefault('bdt', bdt)
+
+import debian_packages
 
 
 def build_src_to_bins(pkgs):
     src_to_bins = {}
+    if isinstance(pkgs, debian_packages.PackageIndex):
+        # avoid materializing a metadata dict per package
+        for idx in range(len(pkgs)):
+            src_field = pkgs.field(idx, 'Source')
+            pkgname = pkgs.name(idx)
+            src_name = src_field.split()[0] if src_field else pkgname
+            src_to_bins.setdefault(src_name, []).append(pkgname)
+        return src_to_bins
     for pkgname, meta in pkgs.items():
         src_field = meta.get('Source')
         if src_field:
@@ -42,6 +75,104 @@ def build_src_to_bins(pkgs):
     return src_to_bins
 
 
+# fields that end up in a topogram besides the dependency relations (see bdt.make_node)
+NODE_FIELDS = ('Description', 'Section', 'Version')
+
+
+def diff_snapshots(old, new, relations):
+    """Return (changed names, summary) between two package mappings.
+
+    A package counts as changed when it was added, removed, or any field that
+    shows up in a topogram (node metadata and the selected relations) differs.
+    """
+    fields = NODE_FIELDS + tuple(relations)
+    added = [name for name in new if name not in old]
+    removed = [name for name in old if name not in new]
+    modified = []
+    for name in old:
+        if name in new:
+            before, after = old[name], new[name]
+            if any(before.get(f, '') != after.get(f, '') for f in fields):
+                modified.append(name)
+    summary = {'added': len(added), 'removed': len(removed), 'changed': len(modified)}
+    return set(added) | set(removed) | set(modified), summary
+
+
+def write_if_changed(nodes, edges, outpath):
+    """Write the topogram next to `outpath` and swap it in only if the bytes differ."""
+    tmp = f'{outpath}.tmp{os.getpid()}'
+    bdt.write_topogram(nodes, edges, tmp, fmt=bdt.output_format(outpath), quiet=True)
+    if os.path.exists(outpath) and filecmp.cmp(tmp, outpath, shallow=False):
+        os.unlink(tmp)
+        return False
+    os.replace(tmp, outpath)
+    return True
+
+
+# Dependency graph and closure cache used by `build_one`; set in the parent for
+# serial runs and by `init_worker` in pool workers (each worker keeps its own cache).
+_GRAPH = None
+_CACHE = None
+
+
+def init_worker(graph, index_path, cache_size):
+    global _GRAPH, _CACHE
+    _GRAPH = graph
+    _CACHE = bdt.ClosureCache(max_ids=cache_size) if cache_size > 0 else None
+    if index_path:
+        graph.pkgs = debian_packages.PackageIndex.open(index_path)
+
+
+def cache_stats():
+    if _CACHE is None:
+        return None
+    return os.getpid(), _CACHE.hits, _CACHE.misses, _CACHE.evictions
+
+
+def build_one(task):
+    """Build and write one topogram.
+
+    Returns (src, root_bin, outpath, n_nodes, n_edges, n_truncated, written, error, cache_stats).
+    """
+    src, root_bin, outpath, depth, include_recommends, max_nodes, max_edges = task
+    try:
+        nodes, edges = bdt.build_graph(root_bin, _GRAPH.pkgs, depth=depth, include_recommends=include_recommends,
+                                       graph=_GRAPH, cache=_CACHE, max_nodes=max_nodes, max_edges=max_edges)
+        written = write_if_changed(nodes, edges, outpath)
+        truncated = sum(1 for n in nodes.values() if n.get('truncated'))
+        return src, root_bin, outpath, len(nodes), len(edges), truncated, written, None, cache_stats()
+    except Exception as exc:
+        detail = ''.join(traceback.format_exception_only(type(exc), exc)).strip()
+        return src, root_bin, outpath, 0, 0, 0, False, detail, cache_stats()
+
+
+def iter_builds(tasks, graph, jobs, cache_size=0):
+    """Yield `build_one` results in task order, serially or across `jobs` processes."""
+    if jobs <= 1 or len(tasks) <= 1:
+        init_worker(graph, None, cache_size)
+        for task in tasks:
+            yield build_one(task)
+        return
+    pkgs = graph.pkgs
+    if 'fork' in multiprocessing.get_all_start_methods():
+        ctx = multiprocessing.get_context('fork')
+        initargs = (graph, None, cache_size)
+    else:
+        # the adjacency arrays are pickled once per worker; an mmap-backed
+        # package index is re-opened from its file instead of being copied
+        ctx = multiprocessing.get_context()
+        index_path = pkgs.path if isinstance(pkgs, debian_packages.PackageIndex) else None
+        if index_path:
+            graph.pkgs = None
+        initargs = (graph, index_path, cache_size)
+    try:
+        with ctx.Pool(processes=jobs, initializer=init_worker, initargs=initargs) as pool:
+            yield from pool.imap(build_one, tasks, chunksize=1)
+    finally:
+        if graph.pkgs is None:
+            graph.pkgs = pkgs
+
+
 def main():
     p = argparse.ArgumentParser()
     p.add_argument('--suite', required=True)
@@ -50,15 +181,29 @@ def main():
     p.add_argument('--top', type=int, default=10)
     p.add_argument('--outdir', default='/tmp/topograms')
     p.add_argument('--depth', type=int, default=2)
+    p.add_argument('--format', choices=bdt.OUTPUT_FORMATS, default='csv',
+                   help='Write {source}.topogram.<format>: plain or compressed CSV, or the compact binary format (default: csv)')
     p.add_argument('--no-recommends', action='store_true')
+    p.add_argument('--arch', default='amd64')
+    p.add_argument('--jobs', '-j', type=int, default=1,
+                   help='Number of worker processes (0 = one per CPU; default: 1)')
+    p.add_argument('--closure-cache-size', type=int, default=2_000_000,
+                   help='Max package ids held by the per-worker dependency closure cache (0 disables; default: 2000000)')
+    p.add_argument('--max-nodes', type=int, default=None, help='Per-topogram node budget; expansion stops when reached')
+    p.add_argument('--max-edges', type=int, default=None, help='Per-topogram edge budget; expansion stops when reached')
+    p.add_argument('--previous-packages', default=None,
+                   help='Packages file the existing topograms were built from; only rebuild roots affected by the changes')
+    p.add_argument('--manifest', default=None,
+                   help='Write a JSON manifest of written/removed files here (- for stdout; default: stdout with --previous-packages)')
+    debian_packages.add_source_arguments(p)
     args = p.parse_args()
+    jobs = args.jobs if args.jobs > 0 else (os.cpu_count() or 1)
 
     outdir = Path(args.outdir)
     outdir.mkdir(parents=True, exist_ok=True)
 
     print(f"Fetching Packages for {args.suite}/{args.component}...", file=sys.stderr)
-    packages_text = bdt.fetch_packages_file(suite=args.suite, component=args.component)
-    pkgs = bdt.parse_packages(packages_text)
+    pkgs = debian_packages.load_packages_from_args(args)
     print(f"Parsed {len(pkgs)} packages.", file=sys.stderr)
 
     src_to_bins = build_src_to_bins(pkgs)
@@ -74,17 +219,84 @@ def main():
     srcs = srcs[:args.top]
 
     include_recommends = not args.no_recommends
+    relations = ('Depends', 'Recommends') if include_recommends else ('Depends',)
 
+    affected = old_src_to_bins = None
+    manifest = {'suite': args.suite, 'component': args.component, 'arch': args.arch, 'depth': args.depth,
+                'written': [], 'removed': [], 'failed': [], 'unchanged': 0}
+    if args.previous_packages:
+        old_pkgs = debian_packages.load_packages(suite=args.suite, component=args.component, arch=args.arch,
+                                                 packages_file=args.previous_packages, use_cache=False)
+        changed, summary = diff_snapshots(old_pkgs, pkgs, relations)
+        manifest['packages'] = summary
+        print(f"Snapshot diff: {summary['added']} added, {summary['removed']} removed, "
+              f"{summary['changed']} changed packages", file=sys.stderr)
+        old_graph = bdt.DependencyGraph(old_pkgs)
+        affected = {old_graph.names[i] for i in old_graph.dependents_within(changed, args.depth, relations)}
+        old_src_to_bins = build_src_to_bins(old_pkgs)
+        del old_graph, old_pkgs
+
+    tasks = []
+    skipped = 0
     for src in srcs:
         bins = src_to_bins.get(src)
+        outpath = outdir / f"{src}.topogram.{args.format}"
         if not bins:
+            skipped += 1
             print(f"No binary packages found for source {src}; skipping.", file=sys.stderr)
+            if affected is not None and outpath.exists():
+                outpath.unlink()
+                manifest['removed'].append(str(outpath))
+            continue
+        if affected is not None and outpath.exists() and bins[0] not in affected \
+                and old_src_to_bins.get(src, [None])[0] == bins[0]:
+            manifest['unchanged'] += 1
+            continue
+        tasks.append((src, bins[0], str(outpath), args.depth, include_recommends, args.max_nodes, args.max_edges))
+    if affected is not None:
+        print(f"{len(tasks)} topograms affected, {manifest['unchanged']} unchanged", file=sys.stderr)
+
+    if jobs > 1:
+        print(f"Building {len(tasks)} topograms with {jobs} workers...", file=sys.stderr)
+    failures = []
+    graph = bdt.DependencyGraph(pkgs)
+    print(f"Indexed {len(graph.names)} package names for dependency traversal.", file=sys.stderr)
+    worker_stats = {}
+    builds = iter_builds(tasks, graph, jobs, cache_size=args.closure_cache_size)
+    for i, (src, root_bin, outpath, n_nodes, n_edges, n_truncated, written, error, stats) in enumerate(builds, start=1):
+        if stats:
+            worker_stats[stats[0]] = stats[1:]
+        if error:
+            failures.append((src, error))
+            manifest['failed'].append(outpath)
+            print(f"[{i}/{len(tasks)}] FAILED source {src} (binary {root_bin}): {error}", file=sys.stderr)
             continue
-        root_bin = bins[0]
-        print(f"Building topogram for source {src} using binary {root_bin}...", file=sys.stderr)
-        nodes, edges = bdt.build_graph(root_bin, pkgs, depth=args.depth, include_recommends=include_recommends)
-        outpath = Path(args.outdir) / f"{src}.topogram.csv"
-        bdt.write_topogram_csv(nodes, edges, outpath)
+        if written:
+            manifest['written'].append(outpath)
+        else:
+            manifest['unchanged'] += 1
+        note = f" (budget reached, {n_truncated} truncated)" if n_truncated else ""
+        status = "" if written else " (unchanged)"
+        print(f"[{i}/{len(tasks)}] Built {src} using binary {root_bin}: {n_nodes} nodes, {n_edges} edges{note} -> {outpath}{status}", file=sys.stderr)
+
+    print(f"Done. built={len(tasks) - len(failures)} failed={len(failures)} skipped={skipped} "
+          f"written={len(manifest['written'])} unchanged={manifest['unchanged']} removed={len(manifest['removed'])}",
+          file=sys.stderr)
+    manifest_path = args.manifest or ('-' if args.previous_packages else None)
+    if manifest_path == '-':
+        json.dump(manifest, sys.stdout, indent=2)
+        print()
+    elif manifest_path:
+        with open(manifest_path, 'w') as f:
+            json.dump(manifest, f, indent=2)
+            f.write('\n')
+    if worker_stats:
+        hits, misses, evictions = (sum(col) for col in zip(*worker_stats.values()))
+        lookups = hits + misses
+        ratio = (hits / lookups * 100) if lookups else 0.0
+        print(f"Closure cache: hits={hits} misses={misses} ({ratio:.1f}% hit rate) evictions={evictions}", file=sys.stderr)
+    if failures:
+        sys.exit(1)
 
 
 if __name__ == '__main__':
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+Compare the shared dependency-field tokenizer against the regex helpers it
+replaced, on a real Packages file.
+
+Usage:
+  python3 scripts/benchmarks/bench_dep_tokenizer.py --packages-file Packages.gz [--repeat 3]
+
+Reads Depends/Recommends/Suggests/Pre-Depends from every stanza, then times
+the legacy `extract_dep_names` (lookahead split) and `expand_dep_field`
+(split + version strip) against their tokenizer-based replacements, and
+reports how many fields produce different names.
+"""
+
+import argparse
+import re
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import debian_packages  # noqa: E402
+from build_debian_topogram import expand_dep_field  # noqa: E402
+from compute_reverse_deps import extract_dep_names  # noqa: E402
+
+DEP_FIELDS = ('Depends', 'Pre-Depends', 'Recommends', 'Suggests')
+
+# --- legacy implementations, kept verbatim for comparison ---
+
+LEGACY_DEP_SPLIT_RE = re.compile(r',\s*')
+LEGACY_ALT_SPLIT_RE = re.compile(r'\s*\|\s*')
+LEGACY_VERSION_RE = re.compile(r'\s*\(.*?\)')
+
+
+def legacy_expand_dep_field(field_value):
+    if not field_value:
+        return []
+    parts = LEGACY_DEP_SPLIT_RE.split(field_value)
+    deps = []
+    for p in parts:
+        alts = LEGACY_ALT_SPLIT_RE.split(p)
+        token = LEGACY_VERSION_RE.sub('', alts[0]).strip()
+        if token:
+            deps.append(token)
+    return deps
+
+
+def legacy_extract_dep_names(field_value):
+    if not field_value:
+        return []
+    parts = []
+    for chunk in re.split(r',\s*(?=(?:[^()]*\([^()]*\))*[^()]*$)', field_value):
+        for alt in chunk.split('|'):
+            name = alt.strip()
+            name = re.sub(r"\[.*?\]", '', name).strip()
+            name = re.sub(r"\s*\(.*?\)", '', name).strip()
+            m = re.match(r"^([A-Za-z0-9+\-.]+)", name)
+            if m:
+                parts.append(m.group(1))
+    return parts
+
+
+def load_fields(path):
+    data = Path(path).read_bytes()
+    if data[:2] == b'\x1f\x8b':
+        lines = debian_packages.open_packages(data)
+    else:
+        lines = data.decode('utf-8', errors='replace').splitlines(keepends=True)
+    values = []
+    for meta in debian_packages.iter_packages(lines, fields=DEP_FIELDS, multiline=False):
+        values.extend(meta[f] for f in DEP_FIELDS if meta.get(f))
+    return values
+
+
+def best_of(fn, values, repeat):
+    best = None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        for v in values:
+            fn(v)
+        elapsed = time.perf_counter() - t0
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main():
+    p = argparse.ArgumentParser()
+    p.add_argument('--packages-file', required=True, help='Packages or Packages.gz file')
+    p.add_argument('--repeat', type=int, default=3)
+    args = p.parse_args()
+
+    values = load_fields(args.packages_file)
+    total_chars = sum(len(v) for v in values)
+    longest = max((len(v) for v in values), default=0)
+    print(f'{len(values)} dependency fields, {total_chars} chars, longest {longest} chars')
+
+    pairs = [
+        ('extract_dep_names', legacy_extract_dep_names, extract_dep_names),
+        ('expand_dep_field', legacy_expand_dep_field, expand_dep_field),
+    ]
+    for label, legacy, current in pairs:
+        t_legacy = best_of(legacy, values, args.repeat)
+        t_current = best_of(current, values, args.repeat)
+        diffs = sum(1 for v in values if legacy(v) != current(v))
+        speedup = t_legacy / t_current if t_current else float('inf')
+        print(f'{label:18s} legacy {t_legacy:8.3f}s  tokenizer {t_current:8.3f}s  '
+              f'speedup {speedup:5.2f}x  differing fields {diffs}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,268 @@
+#!/usr/bin/env python3
+"""
+Benchmark the Python topogram pipeline end to end, fully offline, and write
+the timings as JSON so runs can be compared.
+
+Usage:
+  python3 scripts/benchmarks/bench_pipeline.py [--sizes 10k,100k] [--depths 1,2,3] [--roots 200]
+      [--repeat 3] [--packages-file Packages.gz] [--output results.json] [--compare previous.json]
+
+For each archive (synthetic ones from gen_synthetic_packages.py at every
+--sizes entry, plus --packages-file if given) it times:
+
+  parse_packages        full stanzas, and only the index fields the loader keeps
+  expand_dep_field      over every Depends/Pre-Depends/Recommends/Suggests value
+  extract_dep_names     same values, compute_reverse_deps.py's helper
+  dependency_graph      building the integer adjacency index
+  build_graph           --roots roots at each --depths, through the index and
+                        through the plain mapping
+  write_topogram        the deepest graphs, in each --formats (write_topogram_csv for csv)
+  parse_topogram        reading those files back with the importer
+  import_payload        node/edge documents and NDJSON chunk lines the importer sends
+
+Half the roots are the first binaries of the top sources in
+samples/trixie_top5000.csv (which also names and weights the synthetic
+sources), the other half are spread evenly over the archive. The importer is also timed
+on the samples/topograms/debian fixture (parse_topogram_csv and import_payload).
+
+Each result is the best of --repeat runs, with an item count and rate. With
+--compare, results are matched by name and params against an earlier JSON
+file and the ratio is printed; --fail-above R exits 1 when any benchmark got
+more than R times slower.
+"""
+
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+from itertools import chain
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import debian_packages  # noqa: E402
+import build_debian_topogram as bdt  # noqa: E402
+import import_topograms_folder as itf  # noqa: E402
+from batch_build_topograms import build_src_to_bins  # noqa: E402
+from compute_reverse_deps import extract_dep_names  # noqa: E402
+import gen_synthetic_packages  # noqa: E402
+
+REPO_ROOT = Path(__file__).resolve().parents[2]
+DEFAULT_FIXTURE_DIR = REPO_ROOT / 'samples' / 'topograms' / 'debian'
+DEFAULT_SOURCES = REPO_ROOT / 'samples' / 'trixie_top5000.csv'
+RESULTS_VERSION = 1
+
+DEP_FIELDS = ('Depends', 'Pre-Depends', 'Recommends', 'Suggests')
+RELATIONS = ('Depends', 'Recommends')
+
+
+def parse_size(text):
+    text = text.strip().lower()
+    scale = {'k': 1000, 'm': 1000000}.get(text[-1:], 1)
+    return int(float(text[:-1] if scale > 1 else text) * scale)
+
+
+def best_of(fn, repeat):
+    """Run `fn` `repeat` times; return (best seconds, result of the last run)."""
+    best = result = None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        result = fn()
+        elapsed = time.perf_counter() - t0
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+class Results:
+    def __init__(self, repeat):
+        self.repeat = repeat
+        self.entries = []
+
+    def run(self, name, fn, items, unit, **params):
+        """Time `fn`; `items(result)` counts what it processed. Returns the result."""
+        seconds, result = best_of(fn, self.repeat)
+        count = items(result)
+        entry = {'name': name, 'params': params, 'seconds': round(seconds, 6), 'items': count, 'unit': unit,
+                 'per_second': round(count / seconds, 1) if seconds else None}
+        self.entries.append(entry)
+        desc = ' '.join(f'{k}={v}' for k, v in params.items())
+        rate = f'{entry["per_second"]:>12,.0f} {unit}/s' if seconds else ''
+        print(f'{name:18s} {desc:52s} {seconds:9.4f}s {rate}', file=sys.stderr)
+        return result
+
+
+def result_key(entry):
+    return entry['name'] + ' ' + json.dumps(entry['params'], sort_keys=True)
+
+
+def dep_values(pkgs):
+    return [meta[f] for meta in pkgs.values() for f in DEP_FIELDS if meta.get(f)]
+
+
+def pick_roots(pkgs, sources, count):
+    """Half popular roots, half spread over the archive.
+
+    The first binaries of the most popular listed sources are what
+    batch_build_topograms.py builds, but they sit low in the dependency stack
+    and have small closures; packages picked at even steps through the
+    archive add the larger, leaf-side graphs.
+    """
+    src_to_bins = build_src_to_bins(pkgs)
+    roots = [src_to_bins[src][0] for src, _ in sources if src in src_to_bins][:(count + 1) // 2]
+    chosen = set(roots)
+    names = [name for name in pkgs if name not in chosen]
+    step = max(1, len(names) // max(1, count - len(roots)))
+    roots.extend(names[step - 1::step][:count - len(roots)])
+    return roots
+
+
+def payload_bytes(records):
+    """Build the importer's documents and chunk lines for one topogram; return their size."""
+    docs = (('nodes', itf.node_doc(rec)) if type(rec) is itf.TopogramNode else ('edges', itf.edge_doc(rec))
+            for rec in records)
+    return sum(len(line) for line in itf.iter_chunk_lines(docs))
+
+
+def bench_archive(results, label, text, sources, args):
+    size = {'archive': label}
+    pkgs = results.run('parse_packages', lambda: debian_packages.parse_packages(text), len, 'packages',
+                       fields='all', **size)
+    results.run('parse_packages', lambda: debian_packages.parse_packages(text, fields=debian_packages.INDEX_FIELDS),
+                len, 'packages', fields='index', **size)
+    values = dep_values(pkgs)
+    results.run('expand_dep_field', lambda: [bdt.expand_dep_field(v) for v in values], len, 'fields', **size)
+    results.run('extract_dep_names', lambda: [extract_dep_names(v) for v in values], len, 'fields', **size)
+    graph = results.run('dependency_graph', lambda: bdt.DependencyGraph(pkgs), lambda g: len(g.names), 'names', **size)
+
+    roots = pick_roots(pkgs, sources, args.roots)
+    graph_size = lambda built: sum(len(n) + len(e) for n, e in built)  # noqa: E731
+    built = []
+    for depth in args.depths:
+        built = results.run('build_graph', lambda: [graph.build(r, depth=depth, relations=RELATIONS) for r in roots],
+                            graph_size, 'elements', depth=depth, index='graph', **size)
+        results.run('build_graph', lambda: [bdt.build_graph(r, pkgs, depth=depth, include_recommends=True) for r in roots],
+                    graph_size, 'elements', depth=depth, index='mapping', **size)
+    rows = graph_size(built)
+    depth = args.depths[-1]
+
+    with tempfile.TemporaryDirectory(prefix='topogram-bench-') as tmp:
+        for fmt in args.formats:
+            paths = [os.path.join(tmp, f'{i}.topogram.{fmt}') for i in range(len(built))]
+
+            def write():
+                for (nodes, edges), path in zip(built, paths):
+                    if fmt == 'csv':
+                        bdt.write_topogram_csv(nodes, edges, path, quiet=True)
+                    else:
+                        bdt.write_topogram(nodes, edges, path, fmt=fmt, quiet=True)
+                return sum(os.path.getsize(p) for p in paths)
+
+            written = results.run('write_topogram', write, lambda _: rows, 'rows', depth=depth, format=fmt, **size)
+            results.entries[-1]['bytes'] = written
+            parsed = results.run('parse_topogram', lambda: [list(itf.iter_topogram_file(p)) for p in paths],
+                                 lambda out: sum(map(len, out)), 'records', depth=depth, format=fmt, **size)
+            results.run('import_payload', lambda: sum(payload_bytes(recs) for recs in parsed),
+                        lambda _: sum(map(len, parsed)), 'docs', depth=depth, format=fmt, **size)
+
+
+def bench_fixture(results, fixture_dir):
+    files = itf.find_topogram_files(fixture_dir)
+    label = {'fixture': os.path.relpath(fixture_dir, REPO_ROOT) if str(fixture_dir).startswith(str(REPO_ROOT)) else str(fixture_dir)}
+    parsed = results.run('parse_topogram_csv', lambda: [itf.parse_topogram_csv(f) for f in files],
+                         lambda out: sum(len(n) + len(e) for n, e in out), 'records', files=len(files), **label)
+    results.run('import_payload', lambda: sum(payload_bytes(chain(n, e)) for n, e in parsed),
+                lambda _: sum(len(n) + len(e) for n, e in parsed), 'docs', files=len(files), **label)
+
+
+def compare(entries, previous_path, fail_above):
+    previous = {result_key(e): e for e in json.loads(Path(previous_path).read_text()).get('results', [])}
+    worst = 0.0
+    print(f'\nCompared with {previous_path}:', file=sys.stderr)
+    for entry in entries:
+        old = previous.get(result_key(entry))
+        if not old or not old['seconds']:
+            continue
+        ratio = entry['seconds'] / old['seconds']
+        worst = max(worst, ratio)
+        flag = ' SLOWER' if fail_above and ratio > fail_above else ''
+        desc = ' '.join(f'{k}={v}' for k, v in entry['params'].items())
+        print(f'{entry["name"]:18s} {desc:52s} {old["seconds"]:9.4f}s -> {entry["seconds"]:9.4f}s  x{ratio:5.2f}{flag}',
+              file=sys.stderr)
+    return worst
+
+
+def main():
+    p = argparse.ArgumentParser()
+    p.add_argument('--sizes', default='10k,100k',
+                   help='Synthetic archive sizes in packages, e.g. 10k,100k,1m ("" for none; default: 10k,100k)')
+    p.add_argument('--seed', type=int, default=1, help='Synthetic archive seed (default: 1)')
+    p.add_argument('--packages-file', default=None, help='Also benchmark a real Packages or Packages.gz file')
+    p.add_argument('--depths', default='1,2,3', help='build_graph depths (default: 1,2,3)')
+    p.add_argument('--roots', type=int, default=200, help='Roots per build_graph run (default: 200)')
+    p.add_argument('--formats', default='csv,csv.gz,bin', help=f'Topogram formats to write and read back (of {",".join(bdt.OUTPUT_FORMATS)})')
+    p.add_argument('--repeat', type=int, default=3)
+    p.add_argument('--sources-csv', default=str(DEFAULT_SOURCES), help='source_package,count CSV for roots and synthetic sources')
+    p.add_argument('--fixture-dir', default=str(DEFAULT_FIXTURE_DIR), help='Topogram folder for the importer benchmarks ("" to skip)')
+    p.add_argument('--output', '-o', default='-', help='JSON results path (default: stdout)')
+    p.add_argument('--compare', default=None, help='Earlier results JSON to compare against')
+    p.add_argument('--fail-above', type=float, default=None, help='With --compare, exit 1 if any benchmark is this many times slower')
+    args = p.parse_args()
+    args.depths = sorted(int(d) for d in args.depths.split(',') if d.strip())
+    args.formats = [f.strip() for f in args.formats.split(',') if f.strip()]
+    unknown = [f for f in args.formats if f not in bdt.OUTPUT_FORMATS]
+    if unknown or not args.depths:
+        p.error(f'unknown formats {unknown}' if unknown else '--depths needs at least one depth')
+
+    sources = gen_synthetic_packages.load_sources(args.sources_csv)
+    results = Results(max(1, args.repeat))
+    archives = []
+    for size in [parse_size(s) for s in args.sizes.split(',') if s.strip()]:
+        t0 = time.perf_counter()
+        text = gen_synthetic_packages.generate_packages_text(size, seed=args.seed, sources=sources)
+        label = f'synthetic-{size}'
+        archives.append({'archive': label, 'packages': size, 'bytes': len(text), 'seed': args.seed,
+                         'generate_seconds': round(time.perf_counter() - t0, 3)})
+        print(f'# {label}: {len(text) / 1e6:.1f} MB generated in {archives[-1]["generate_seconds"]}s', file=sys.stderr)
+        bench_archive(results, label, text, sources, args)
+        del text
+    if args.packages_file:
+        data = Path(args.packages_file).read_bytes()
+        text = debian_packages.decompress_packages(data)
+        label = f'file:{Path(args.packages_file).name}'
+        archives.append({'archive': label, 'bytes': len(text)})
+        print(f'# {label}: {len(text) / 1e6:.1f} MB', file=sys.stderr)
+        bench_archive(results, label, text, sources, args)
+        del text, data
+    if args.fixture_dir:
+        print(f'# fixture {args.fixture_dir}', file=sys.stderr)
+        bench_fixture(results, args.fixture_dir)
+
+    report = {
+        'version': RESULTS_VERSION,
+        'created': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+        'repeat': results.repeat,
+        'depths': args.depths,
+        'roots': args.roots,
+        'archives': archives,
+        'results': results.entries,
+    }
+    text = json.dumps(report, indent=1) + '\n'
+    if args.output == '-':
+        sys.stdout.write(text)
+    else:
+        Path(args.output).write_text(text)
+        print(f'Wrote {len(results.entries)} results to {args.output}', file=sys.stderr)
+    if args.compare:
+        worst = compare(results.entries, args.compare, args.fail_above)
+        if args.fail_above and worst > args.fail_above:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+"""
+Generate a synthetic Debian Packages file for benchmarks, fully offline.
+
+Usage:
+  python3 scripts/benchmarks/gen_synthetic_packages.py --packages 100000 -o /tmp/Packages.gz [--seed 1]
+
+Source package names and their popularity come from samples/trixie_top5000.csv
+(`source_package,count`); past its end, sources are named `src<N>` with a
+Zipf tail. Each source gets one or more binaries (`foo`, `libfoo1`, `foo-dev`,
+`foo-data`, ...). Dependency targets are drawn by popularity among the
+packages ranked above the dependent one (with a small share from anywhere, so
+some cycles exist), which gives the layered shape of a real archive: a few
+libc6-like packages are depended on by most of it and depend on little. Fields mix
+in what real archives contain: alternatives, version constraints, `:any`
+qualifiers, virtual packages with no stanza, Pre-Depends, Recommends and
+Suggests, and multi-line descriptions.
+
+The output is deterministic for a given --seed, --packages and sources file.
+It is written stanza by stanza, so 1M packages never sit in memory; a `.gz`
+or `.xz` suffix compresses it.
+"""
+
+import argparse
+import csv
+import gzip
+import lzma
+import random
+import sys
+from bisect import bisect_right
+from contextlib import contextmanager
+from itertools import accumulate
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parents[2]
+DEFAULT_SOURCES = REPO_ROOT / 'samples' / 'trixie_top5000.csv'
+
+SECTIONS = ('libs', 'utils', 'devel', 'admin', 'net', 'python', 'perl', 'web', 'x11', 'doc', 'misc', 'text')
+BINARY_SUFFIXES = ('-common', '-data', '-dev', '-doc', '-utils', '-tools', '-bin')
+VERSION_OPS = ('>=', '>=', '>=', '<<', '=', '>>', '<=')
+WORDS = ('library', 'tool', 'support', 'runtime', 'files', 'interface', 'daemon', 'module', 'bindings',
+         'documentation', 'shared', 'client', 'server', 'plugin', 'data', 'utilities', 'development')
+
+
+def load_sources(path):
+    """(name, count) pairs from a `source_package,count` CSV, most popular first."""
+    with open(path, newline='') as f:
+        reader = csv.reader(f)
+        next(reader, None)
+        return [(row[0], max(1, int(row[1]))) for row in reader if len(row) >= 2 and row[1].isdigit()]
+
+
+def _version(rng):
+    return f'{rng.randint(0, 9)}.{rng.randint(0, 30)}.{rng.randint(0, 9)}-{rng.randint(1, 5)}'
+
+
+def _binary_names(rng, src, count):
+    names = [src]
+    for k in range(1, count):
+        if k == 1 and not src.startswith('lib'):
+            names.append(f'lib{src}' + ('-' if src[-1].isdigit() else '') + str(rng.randint(0, 9)))
+        else:
+            names.append(src + BINARY_SUFFIXES[(k - 1) % len(BINARY_SUFFIXES)] + ('' if k <= len(BINARY_SUFFIXES) else str(k)))
+    return names
+
+
+def plan_archive(packages, seed, sources):
+    """Return [(binary, source, source version, weight)] for `packages` binaries."""
+    rng = random.Random(seed)
+    plan = []
+    seen = set()
+    tail = sources[-1][1] if sources else 1000
+    rank = 0
+    while len(plan) < packages:
+        if rank < len(sources):
+            src, weight = sources[rank]
+        else:
+            src, weight = f'src{rank}', tail * len(sources) / (rank + 1) if sources else 1000 / (rank + 1)
+        rank += 1
+        n_bins = min(1 + int(rng.expovariate(0.8)), 12)
+        version = _version(rng)
+        for i, name in enumerate(_binary_names(rng, src, n_bins)):
+            if name in seen or len(plan) >= packages:
+                continue
+            seen.add(name)
+            # the first binary of a source carries most of its reverse dependencies
+            plan.append((name, src, version, weight if i == 0 else weight / (4 * i)))
+    return plan
+
+
+def _relation(rng, name):
+    if rng.random() < 0.03:
+        name += ':any'
+    if rng.random() < 0.35:
+        name += f' ({rng.choice(VERSION_OPS)} {_version(rng)})'
+    return name
+
+
+def _dep_field(rng, pick, count, limit, self_name):
+    groups = []
+    for target in pick(count, limit):
+        if target == self_name:
+            continue
+        if rng.random() < 0.02:
+            target = f'virtual-{target}'
+        group = [_relation(rng, target)]
+        if rng.random() < 0.10:
+            group.extend(_relation(rng, alt) for alt in pick(rng.randint(1, 2), limit) if alt != target)
+        groups.append(' | '.join(group))
+    return ', '.join(groups)
+
+
+def iter_stanzas(packages, seed=1, sources=()):
+    """Yield Packages stanzas (text ending in a blank line) for `packages` binaries."""
+    plan = plan_archive(packages, seed, list(sources))
+    names = [entry[0] for entry in plan]
+    cum_weights = list(accumulate(entry[3] for entry in plan))
+    rng = random.Random(seed + 1)
+    random_ = rng.random
+
+    def pick(k, limit):
+        # weighted draw among the first `limit` packages (the whole archive 2% of the time)
+        if random_() < 0.02:
+            limit = len(names)
+        if limit <= 0:
+            return []
+        total = cum_weights[limit - 1]
+        return [names[min(bisect_right(cum_weights, random_() * total, 0, limit), limit - 1)] for _ in range(k)]
+
+    for pos, (name, src, version, _) in enumerate(plan):
+        lines = [f'Package: {name}']
+        if name != src:
+            lines.append(f'Source: {src}' + (f' ({version})' if rng.random() < 0.2 else ''))
+        lines.append(f'Version: {version}')
+        lines.append(f'Installed-Size: {rng.randint(8, 80000)}')
+        lines.append('Maintainer: Debian Synthetic Team <synthetic@example.org>')
+        lines.append('Architecture: ' + ('all' if name.endswith(('-data', '-doc', '-common')) else 'amd64'))
+        if rng.random() < 0.15:
+            lines.append('Multi-Arch: ' + rng.choice(('same', 'foreign', 'allowed')))
+        relations = (
+            ('Pre-Depends', 1 if rng.random() < 0.05 else 0),
+            ('Depends', min(int(rng.lognormvariate(1.2, 0.8)), 60)),
+            ('Recommends', rng.randint(1, 4) if rng.random() < 0.4 else 0),
+            ('Suggests', rng.randint(1, 4) if rng.random() < 0.3 else 0),
+        )
+        for field, count in relations:
+            value = _dep_field(rng, pick, count, pos, name) if count else ''
+            if value:
+                lines.append(f'{field}: {value}')
+        words = rng.sample(WORDS, 3)
+        lines.append(f'Description: {name} {words[0]} - {words[1]} {words[2]}')
+        for _ in range(rng.randint(1, 4)):
+            lines.append(' ' + ' '.join(rng.choices(WORDS, k=rng.randint(6, 12))) + '.')
+        lines.append(' .')
+        lines.append(f' This package provides the {words[0]} part of {src}.')
+        lines.append(f'Section: {rng.choice(SECTIONS)}')
+        lines.append('Priority: optional')
+        lines.append(f'Filename: pool/main/{src[:4] if src.startswith("lib") else src[0]}/{src}/{name}_{version}_amd64.deb')
+        lines.append(f'Size: {rng.randint(1000, 5000000)}')
+        lines.append(f'SHA256: {rng.getrandbits(256):064x}')
+        yield '\n'.join(lines) + '\n\n'
+
+
+def generate_packages_text(packages, seed=1, sources=()):
+    """The whole synthetic Packages file as one string (what `parse_packages` takes)."""
+    return ''.join(iter_stanzas(packages, seed, sources))
+
+
+@contextmanager
+def _open_output(path):
+    if path == '-':
+        yield sys.stdout
+    elif path.endswith('.gz'):
+        with gzip.open(path, 'wt', encoding='utf-8', compresslevel=6) as f:
+            yield f
+    elif path.endswith('.xz'):
+        with lzma.open(path, 'wt', encoding='utf-8') as f:
+            yield f
+    else:
+        with open(path, 'w', encoding='utf-8') as f:
+            yield f
+
+
+def main():
+    p = argparse.ArgumentParser()
+    p.add_argument('--packages', '-n', type=int, default=100000, help='Number of binary packages (default: 100000)')
+    p.add_argument('--seed', type=int, default=1)
+    p.add_argument('--sources-csv', default=str(DEFAULT_SOURCES),
+                   help='source_package,count CSV used for source names and popularity (default: samples/trixie_top5000.csv)')
+    p.add_argument('-o', '--out', default='-', help='Output Packages path (.gz/.xz compress; default: stdout)')
+    args = p.parse_args()
+
+    sources = load_sources(args.sources_csv) if args.sources_csv else []
+    with _open_output(args.out) as f:
+        for stanza in iter_stanzas(args.packages, args.seed, sources):
+            f.write(stanza)
+    if args.out != '-':
+        print(f'Wrote {args.packages} synthetic packages to {args.out}', file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
@@ -9,167 +9,422 @@ and edges (Depends/Recommends). The script performs a BFS up to a configurable d
 Usage:
   ./scripts/build_debian_topogram.py PACKAGENAME [-d DEPTH] [-o OUT.csv] [--suite stable] [--component main] [--include-recommends]
 
+Parsed Packages metadata is cached as a memory-mapped index (see
+`debian_packages.py`), so repeated runs against the same archive skip parsing.
+The downloaded Packages.gz is refreshed with conditional requests and pdiffs;
+use `--mirror-dir DIR` or `--packages-file FILE` to work fully offline.
+
 The output CSV follows the samples/node_edge.csv header used in the repository and
-is importable into Topogram.
+is importable into Topogram. A `.csv.gz`, `.csv.bz2` or `.csv.xz` output path writes it
+compressed (see `topogram_codecs.py`). When `-o` ends in `.bin` (e.g. `bash.topogram.bin`) the
+same fields are written in the compact columnar format of `topogram_binary.py`
+instead, which `import_topograms_folder.py` also reads; CSV stays the default for
+anything meant to be read by people.
 
 Note: This script performs simple parsing of Debian Packages files and strips
-version constraints from dependency expressions. It does not resolve virtual
+version constraints and multiarch qualifiers (`:any`) from dependency expressions. It does not resolve virtual
 packages to concrete providers.
 
 """
 
 import argparse
-import gzip
-import io
-import json
-import re
-import requests
-from collections import deque
+import csv
+from array import array
+from collections import OrderedDict, deque
+from itertools import chain
 
-PACKAGES_URL_TEMPLATE = 'http://ftp.debian.org/debian/dists/{suite}/{component}/binary-amd64/Packages.gz'
+import debian_packages
+import topogram_binary
+import topogram_codecs
 
 HEADER = 'id,name,label,description,color,fillColor,weight,rawWeight,lat,lng,emoji,notes,source,target,edgeLabel,edgeColor,edgeWeight,relationship,enlightement,extra'
 
-# simple regex to split dependency lists and strip version constraints and alternatives
-DEP_SPLIT_RE = re.compile(r',\s*')
-ALT_SPLIT_RE = re.compile(r'\s*\|\s*')
-VERSION_RE = re.compile(r'\s*\(.*?\)')
-
-
-def fetch_packages_file(suite='stable', component='main'):
-    url = PACKAGES_URL_TEMPLATE.format(suite=suite, component=component)
-    print(f'Fetching Packages.gz from {url} ...')
-    r = requests.get(url, timeout=30)
-    r.raise_for_status()
-    data = gzip.decompress(r.content).decode('utf-8', errors='replace')
-    return data
-
-
-def parse_packages(packages_text):
-    """Parse a Debian Packages file into a dict: pkgname -> metadata dict"""
-    pkgs = {}
-    current = {}
-    for line in packages_text.splitlines():
-        if not line.strip():
-            if 'Package' in current:
-                pkgs[current['Package']] = current
-            current = {}
-            continue
-        if ':' not in line:
-            # continuation field (e.g., multiline Description)
-            # append to last key's value
-            if current:
-                last = list(current.keys())[-1]
-                current[last] += '\n' + line
-            continue
-        key, val = line.split(':', 1)
-        current[key] = val.strip()
-    if 'Package' in current:
-        pkgs[current['Package']] = current
-    return pkgs
+
+def expand_dep_field(field_value):
+    # field_value like: "libc6 (>= 2.28), libgcc1 (>= 1:3.0), debconf (>= 0.5) | debconf-2.0"
+    # keep the first alternative of each group (naive), without version or arch qualifier
+    return debian_packages.dep_names(field_value, first_alternative=True)
 
 
-def normalize_dep_token(token):
-    # remove version constraints
-    token = VERSION_RE.sub('', token).strip()
-    return token
+RELATIONS = ('Depends', 'Recommends', 'Suggests')
 
 
-def expand_dep_field(field_value):
-    # field_value like: "libc6 (>= 2.28), libgcc1 (>= 1:3.0), debconf (>= 0.5) | debconf-2.0"
-    if not field_value:
-        return []
-    parts = DEP_SPLIT_RE.split(field_value)
-    deps = []
-    for p in parts:
-        # take the first alternative (naive)
-        alts = ALT_SPLIT_RE.split(p)
-        token = normalize_dep_token(alts[0])
-        if token:
-            deps.append(token)
-    return deps
-
-
-def build_graph(root_pkg, pkgs, depth=2, include_recommends=False, include_suggests=False):
-    nodes = {}
+def make_node(pkg, meta):
+    if not meta:
+        # unknown package: create a stub node
+        return {
+            'id': pkg,
+            'name': pkg,
+            'label': pkg,
+            'description': 'unknown',
+            'notes': 'missing in Packages file'
+        }
+    return {
+        'id': pkg,
+        'name': meta.get('Package', pkg),
+        'label': meta.get('Package', pkg),
+        'description': meta.get('Description', '').split('\n',1)[0],
+        'notes': f"Section={meta.get('Section','')}; Version={meta.get('Version','')}"
+    }
+
+
+class DependencyGraph:
+    """Integer-id adjacency index over a package mapping.
+
+    Package names (including dependency targets missing from the Packages
+    file) are interned to ints, and each relation in RELATIONS is stored as a
+    compressed sparse row pair: the targets of package `i` are
+    `indices[indptr[i]:indptr[i + 1]]`. Dependency fields are expanded once
+    with `expand_dep_field`, so BFS walks array slices instead of re-parsing
+    strings at every visit. Build it once and reuse it for many roots.
+    """
+
+    def __init__(self, pkgs):
+        self.pkgs = pkgs
+        indexed = isinstance(pkgs, debian_packages.PackageIndex)
+        self.names = list(pkgs)
+        self.ids = {name: i for i, name in enumerate(self.names)}
+        self.known = len(self.names)
+        self.adjacency = {}
+        self._nodes = {}
+        rows = {rel: [] for rel in RELATIONS}
+        for i, name in enumerate(self.names[:self.known]):
+            meta = None if indexed else pkgs[name]
+            for rel in RELATIONS:
+                value = pkgs.field(i, rel) if indexed else meta.get(rel, '')
+                rows[rel].append([self.intern(dep) for dep in expand_dep_field(value)])
+        for rel in RELATIONS:
+            indptr = array('I', [0])
+            indices = array('I')
+            for row in rows[rel]:
+                indices.extend(row)
+                indptr.append(len(indices))
+            # unknown targets have no outgoing edges
+            indptr.extend([len(indices)] * (len(self.names) - self.known))
+            self.adjacency[rel] = (indptr, indices)
+
+    def intern(self, name):
+        i = self.ids.get(name)
+        if i is None:
+            i = self.ids[name] = len(self.names)
+            self.names.append(name)
+        return i
+
+    def meta(self, i):
+        if i >= self.known:
+            return None
+        if isinstance(self.pkgs, debian_packages.PackageIndex):
+            return self.pkgs.meta(i)
+        return self.pkgs[self.names[i]]
+
+    def node(self, i):
+        # node dicts are memoized per id; callers get a private copy
+        cached = self._nodes.get(i)
+        if cached is None:
+            cached = self._nodes[i] = make_node(self.names[i], self.meta(i))
+        return dict(cached)
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['_nodes'] = {}
+        return state
+
+    def closure(self, i, depth, relations, cache):
+        """Return the depth-limited closure of `i` as a tuple of BFS levels.
+
+        Level k holds the ids first reached at distance k, in BFS discovery
+        order. A closure is assembled from its children's (cached) closures:
+        level k is the concatenation of the children's level k-1 minus
+        everything already seen, which reproduces the BFS order exactly.
+        """
+        if depth == 0 or i >= self.known:
+            return ((i,),)
+        key = (i, depth, relations)
+        levels = cache.get(key)
+        if levels is not None:
+            return levels
+        children = []
+        for rel in relations:
+            indptr, indices = self.adjacency[rel]
+            children.extend(indices[indptr[i]:indptr[i + 1]])
+        subs = [self.closure(j, depth - 1, relations, cache) for j in dict.fromkeys(children)]
+        seen = {i}
+        levels = [(i,)]
+        for k in range(depth):
+            merged = dict.fromkeys(chain.from_iterable(sub[k] for sub in subs if k < len(sub)))
+            level = tuple(x for x in merged if x not in seen)
+            if not level:
+                break
+            seen.update(level)
+            levels.append(level)
+        levels = tuple(levels)
+        cache.put(key, levels)
+        return levels
+
+    def build(self, root_pkg, depth=2, relations=('Depends',), cache=None, max_nodes=None, max_edges=None):
+        """Same traversal as `build_graph`, over integer ids.
+
+        With a `ClosureCache` the graph is assembled from memoized closures
+        instead of running the BFS. The result is identical; when the closure
+        would exceed a node/edge budget the budgeted BFS runs instead so the
+        truncation point matches.
+        """
+        names = self.names
+        rels = [(rel,) + self.adjacency[rel] for rel in relations]
+        root = self.ids.get(root_pkg)
+        if root is None:
+            return {root_pkg: make_node(root_pkg, None)}, []
+
+        def expand(i):
+            return [(j, rel) for rel, indptr, indices in rels for j in indices[indptr[i]:indptr[i + 1]]]
+
+        result = None
+        if cache is not None:
+            result = self._from_closure(root, depth, relations, cache, expand, max_nodes, max_edges)
+        if result is None:
+            result = walk_dependencies(root, depth, expand, max_nodes=max_nodes, max_edges=max_edges)
+        order, id_edges, truncated = result
+        nodes = {names[i]: self.node(i) for i in order}
+        for i in truncated:
+            mark_truncated(nodes[names[i]])
+        edges = [(names[i], names[j], rel) for i, j, rel in id_edges]
+        return nodes, edges
+
+    def _from_closure(self, root, depth, relations, cache, expand, max_nodes, max_edges):
+        levels = self.closure(root, depth, tuple(relations), cache)
+        order = [i for level in levels for i in level]
+        if max_nodes and len(order) > max_nodes:
+            return None
+        edges = []
+        seen_pairs = set()
+        for level in levels[:depth]:
+            for i in level:
+                for j, rel in expand(i):
+                    if (i, j) not in seen_pairs:
+                        seen_pairs.add((i, j))
+                        edges.append((i, j, rel))
+        if max_edges and len(edges) > max_edges:
+            return None
+        return order, edges, []
+
+    def dependents_within(self, names, depth, relations=('Depends',)):
+        """Return the ids of every package whose depth-limited closure contains one of `names`.
+
+        A reverse BFS over the selected relations: package `r` is returned
+        when some name is at most `depth` hops away from it, i.e. exactly the
+        roots whose topogram lists that name as a node. Names unknown to
+        this graph are ignored.
+        """
+        reverse = [[] for _ in self.names]
+        for rel in relations:
+            indptr, indices = self.adjacency[rel]
+            for i in range(self.known):
+                for j in indices[indptr[i]:indptr[i + 1]]:
+                    reverse[j].append(i)
+        frontier = {self.ids[name] for name in names if name in self.ids}
+        seen = set(frontier)
+        for _ in range(depth):
+            frontier = {p for j in frontier for p in reverse[j]} - seen
+            if not frontier:
+                break
+            seen |= frontier
+        return seen
+
+
+class ClosureCache:
+    """Size-bounded LRU cache of `DependencyGraph.closure` results.
+
+    Entries are keyed by (package id, remaining depth, relation tuple). The
+    bound is the total number of ids held across all cached levels, which
+    tracks memory better than an entry count since closures vary wildly in
+    size. Trivial closures (depth 0, unknown packages) are never stored.
+    """
+
+    def __init__(self, max_ids=2_000_000):
+        self.max_ids = max_ids
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+
+    @staticmethod
+    def _cost(levels):
+        return sum(len(level) for level in levels)
+
+    def get(self, key):
+        levels = self._entries.get(key)
+        if levels is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._entries.move_to_end(key)
+        return levels
+
+    def put(self, key, levels):
+        cost = self._cost(levels)
+        if cost > self.max_ids:
+            return
+        self._entries[key] = levels
+        self.size += cost
+        while self.size > self.max_ids:
+            _, old = self._entries.popitem(last=False)
+            self.size -= self._cost(old)
+            self.evictions += 1
+
+    def __len__(self):
+        return len(self._entries)
+
+
+def walk_dependencies(root, depth, expand, max_nodes=None, max_edges=None):
+    """Budgeted breadth-first walk shared by `build_graph` and `DependencyGraph`.
+
+    `expand(pkg)` returns the (dependency, relation) pairs of a package, or an
+    empty list for unknown ones. Packages are deduplicated when enqueued and
+    each parent->child pair yields a single edge (the first relation seen, so
+    Depends wins over Recommends/Suggests). Once `max_nodes` or `max_edges`
+    would be exceeded expansion stops; the partially expanded node and every
+    queued node that still had dependencies are reported as truncated.
+
+    Returns (nodes in discovery order, edges, truncated nodes).
+    """
+    order = [root]
+    discovered = {root}
     edges = []
+    seen_pairs = set()
+    truncated = []
+    exhausted = False
     q = deque()
-    q.append((root_pkg, 0))
-    visited = set()
+    q.append((root, 0))
     while q:
         pkg, d = q.popleft()
-        if pkg in visited:
+        if d >= depth:
             continue
-        visited.add(pkg)
-        meta = pkgs.get(pkg)
-        if not meta:
-            # unknown package: create a stub node
-            nodes[pkg] = {
-                'id': pkg,
-                'name': pkg,
-                'label': pkg,
-                'description': 'unknown',
-                'notes': 'missing in Packages file'
-            }
+        deps = expand(pkg)
+        if not deps:
             continue
-        nodes[pkg] = {
-            'id': pkg,
-            'name': meta.get('Package', pkg),
-            'label': meta.get('Package', pkg),
-            'description': meta.get('Description', '').split('\n',1)[0],
-            'notes': f"Section={meta.get('Section','')}; Version={meta.get('Version','')}"
-        }
-        if d < depth:
-            deps = expand_dep_field(meta.get('Depends',''))
-            for dep in deps:
-                edges.append((pkg, dep, 'Depends'))
+        if exhausted:
+            truncated.append(pkg)
+            continue
+        for dep, rel in deps:
+            if (pkg, dep) in seen_pairs:
+                continue
+            if max_edges and len(edges) >= max_edges:
+                exhausted = True
+                break
+            if dep not in discovered:
+                if max_nodes and len(order) >= max_nodes:
+                    exhausted = True
+                    break
+                discovered.add(dep)
+                order.append(dep)
                 q.append((dep, d+1))
-            if include_recommends:
-                recs = expand_dep_field(meta.get('Recommends',''))
-                for r in recs:
-                    edges.append((pkg, r, 'Recommends'))
-                    q.append((r, d+1))
-            if include_suggests:
-                sugs = expand_dep_field(meta.get('Suggests',''))
-                for s in sugs:
-                    edges.append((pkg, s, 'Suggests'))
-                    q.append((s, d+1))
+            seen_pairs.add((pkg, dep))
+            edges.append((pkg, dep, rel))
+        if exhausted:
+            truncated.append(pkg)
+    return order, edges, truncated
+
+
+def mark_truncated(node):
+    node['truncated'] = True
+    node['notes'] = (node.get('notes', '') + '; Truncated=yes').lstrip('; ')
+
+
+def build_graph(root_pkg, pkgs, depth=2, include_recommends=False, include_suggests=False, graph=None, cache=None,
+                max_nodes=None, max_edges=None):
+    relations = ['Depends']
+    if include_recommends:
+        relations.append('Recommends')
+    if include_suggests:
+        relations.append('Suggests')
+    if graph is not None:
+        return graph.build(root_pkg, depth=depth, relations=relations, cache=cache,
+                           max_nodes=max_nodes, max_edges=max_edges)
+
+    def expand(pkg):
+        meta = pkgs.get(pkg)
+        if not meta:
+            return []
+        return [(dep, rel) for rel in relations for dep in expand_dep_field(meta.get(rel, ''))]
+
+    order, edges, truncated = walk_dependencies(root_pkg, depth, expand, max_nodes=max_nodes, max_edges=max_edges)
+    nodes = {pkg: make_node(pkg, pkgs.get(pkg)) for pkg in order}
+    for pkg in truncated:
+        mark_truncated(nodes[pkg])
     return nodes, edges
 
 
-def write_topogram_csv(nodes, edges, outpath):
-    with open(outpath, 'w', encoding='utf-8') as f:
+def write_topogram_csv(nodes, edges, outpath, quiet=False, codec=None):
+    """Write a topogram CSV, compressed when `codec` (default: from the `outpath` suffix) is set."""
+    with topogram_codecs.open_csv(outpath, 'w', codec=codec) as f:
         f.write(HEADER + '\n')
-        # write nodes
-        for nid, n in nodes.items():
-            # id,name,label,description,color,fillColor,weight,rawWeight,lat,lng,emoji,notes,source,target,edgeLabel,edgeColor,edgeWeight,relationship,enlightement,extra
-            row = [n['id'], n['name'], n['label'], n['description'], '', '', '1', '1', '', '', '', n.get('notes',''), '', '', '', '', '', '', '', '']
-            f.write(','.join('"{}"'.format(s.replace('"','""')) for s in row) + '\n')
+        # every field quoted, as the importer and older tooling expect
+        writer = csv.writer(f, quoting=csv.QUOTE_ALL, lineterminator='\n')
+        # id,name,label,description,color,fillColor,weight,rawWeight,lat,lng,emoji,notes,source,target,edgeLabel,edgeColor,edgeWeight,relationship,enlightement,extra
+        writer.writerows((n['id'], n['name'], n['label'], n['description'], '', '', '1', '1', '', '', '', n.get('notes', ''),
+                          '', '', '', '', '', '', '', '') for n in nodes.values())
         # write edges as rows where source/target fields are filled
         # edges are tuples (dependent, dependency, rel) so we write source=dependent, target=dependency
-        for src, tgt, rel in edges:
-            row = ['', '', '', '', '', '', '', '', '', '', '', '', src, tgt, rel, '#333', '1', rel, 'arrow', '{}']
-            f.write(','.join('"{}"'.format(s.replace('"','""')) for s in row) + '\n')
-    print(f'Wrote CSV to {outpath}')
+        writer.writerows(('', '', '', '', '', '', '', '', '', '', '', '', src, tgt, rel, '#333', '1', rel, 'arrow', '{}')
+                         for src, tgt, rel in edges)
+    if not quiet:
+        print(f'Wrote CSV to {outpath}')
+
+
+def write_topogram_binary(nodes, edges, outpath, quiet=False):
+    """Write the same rows as `write_topogram_csv` in the `topogram_binary` format."""
+    node_rows = ((n['id'], n['name'], n['label'], n['description'], '', '', '1', '1', '', '', '', n.get('notes', ''))
+                 for n in nodes.values())
+    edge_rows = ((src, tgt, rel, '#333', '1', rel, 'arrow', '{}') for src, tgt, rel in edges)
+    topogram_binary.write_topogram(outpath, node_rows, edge_rows)
+    if not quiet:
+        print(f'Wrote binary topogram to {outpath}')
+
+
+OUTPUT_FORMATS = ('csv',) + tuple('csv' + suffix for suffix, *_ in topogram_codecs.CODECS.values()) + ('bin',)
+
+
+def output_format(path):
+    """The OUTPUT_FORMATS entry named by the suffix of `path` ('csv' when none matches)."""
+    name = str(path).lower()
+    return next((fmt for fmt in OUTPUT_FORMATS if name.endswith('.' + fmt)), 'csv')
+
+
+def write_topogram(nodes, edges, outpath, fmt=None, quiet=False):
+    """Write in one of OUTPUT_FORMATS (by default the one named by the `outpath` suffix)."""
+    fmt = fmt or output_format(outpath)
+    if fmt == 'bin':
+        write_topogram_binary(nodes, edges, outpath, quiet=quiet)
+    else:
+        write_topogram_csv(nodes, edges, outpath, quiet=quiet, codec=topogram_codecs.codec_for_path(fmt))
 
 
 def main():
     p = argparse.ArgumentParser()
     p.add_argument('package', help='Debian package name to build graph from')
     p.add_argument('-d', '--depth', type=int, default=2, help='BFS depth (default: 2)')
-    p.add_argument('-o', '--out', default='samples/debian_package_topogram.csv', help='Output CSV path')
+    p.add_argument('-o', '--out', default='samples/debian_package_topogram.csv',
+                   help='Output path; .csv.gz/.csv.bz2/.csv.xz compress the CSV, .bin writes the binary topogram format')
     p.add_argument('--suite', default='stable', help='Debian suite (stable, testing, etc.)')
     p.add_argument('--component', default='main', help='Component (main, contrib, non-free)')
     p.add_argument('--include-recommends', action='store_true')
     p.add_argument('--include-suggests', action='store_true')
+    p.add_argument('--max-nodes', type=int, default=None, help='Stop expanding once the graph has this many nodes')
+    p.add_argument('--max-edges', type=int, default=None, help='Stop expanding once the graph has this many edges')
+    p.add_argument('--arch', default='amd64', help='Architecture (default: amd64)')
+    debian_packages.add_source_arguments(p)
     args = p.parse_args()
 
-    packages_text = fetch_packages_file(suite=args.suite, component=args.component)
-    pkgs = parse_packages(packages_text)
+    pkgs = debian_packages.load_packages_from_args(args)
     print(f'Parsed {len(pkgs)} packages from {args.suite}/{args.component}')
-    nodes, edges = build_graph(args.package, pkgs, depth=args.depth, include_recommends=args.include_recommends, include_suggests=args.include_suggests)
+    nodes, edges = build_graph(args.package, pkgs, depth=args.depth, include_recommends=args.include_recommends, include_suggests=args.include_suggests,
+                               max_nodes=args.max_nodes, max_edges=args.max_edges)
     print(f'Collected {len(nodes)} nodes and {len(edges)} edges')
-    write_topogram_csv(nodes, edges, args.out)
+    truncated = sum(1 for n in nodes.values() if n.get('truncated'))
+    if truncated:
+        print(f'Budget reached: {truncated} frontier nodes marked as truncated')
+    write_topogram(nodes, edges, args.out)
 
 
 if __name__ == '__main__':
@@ -5,65 +5,151 @@ Compute reverse-dependency counts for Debian Packages.gz and map binary packages
 Usage: python3 scripts/compute_reverse_deps.py --suite trixie --component main --arch amd64 --top 5000
 
 Produces CSV to stdout: source_package, count
+
+With --transitive an extra `transitive_count` column holds, for each source,
+the number of distinct binary packages (outside that source) whose
+Depends/Recommends closure reaches one of its binaries. It is computed in one
+pass over the dependency graph with strongly connected components collapsed,
+propagating ancestor bitsets (Python ints) in topological order, rather than
+running a BFS per package.
+
+Parsed Packages metadata is shared with the topogram builders through the
+memory-mapped index cache in `debian_packages.py`.
 """
 import argparse
-import gzip
-import io
-import re
 import sys
-from urllib.request import urlopen
-
-
-def fetch_packages_gz(suite, component, arch):
-    url = f"http://ftp.debian.org/debian/dists/{suite}/{component}/binary-{arch}/Packages.gz"
-    print(f"Fetching {url}...", file=sys.stderr)
-    resp = urlopen(url)
-    data = resp.read()
-    return gzip.decompress(data).decode('utf-8', errors='replace')
-
-
-def parse_packages(text):
-    entries = []
-    cur = {}
-    last_field = None
-    for line in text.splitlines():
-        if line.strip() == '':
-            if cur:
-                entries.append(cur)
-                cur = {}
-                last_field = None
-            continue
-        if line[0].isspace() and last_field:
-            # continuation
-            cur[last_field] += '\n' + line.strip()
-            continue
-        if ':' in line:
-            k, v = line.split(':', 1)
-            cur[k.strip()] = v.strip()
-            last_field = k.strip()
-    if cur:
-        entries.append(cur)
-    return entries
+
+import debian_packages
+
+REVDEP_FIELDS = ('Package', 'Source', 'Depends', 'Recommends')
 
 
 def extract_dep_names(field_value):
-    if not field_value:
-        return []
-    parts = []
-    # split on commas at top level
-    for chunk in re.split(r',\s*(?=(?:[^()]*\([^()]*\))*[^()]*$)', field_value):
-        # split alternatives
-        for alt in chunk.split('|'):
-            name = alt.strip()
-            # remove arch qualifiers [amd64]
-            name = re.sub(r"\[.*?\]", '', name).strip()
-            # strip version constraints e.g. (>= 1.2)
-            name = re.sub(r"\s*\(.*?\)", '', name).strip()
-            # extract token at start that's a valid package name
-            m = re.match(r"^([A-Za-z0-9+\-.]+)", name)
-            if m:
-                parts.append(m.group(1))
-    return parts
+    # every alternative counts; version constraints and arch qualifiers are dropped
+    return debian_packages.dep_names(field_value)
+
+
+def strongly_connected_components(adj):
+    """Iterative Tarjan over adjacency lists of ints.
+
+    Returns (comp, ncomp) where comp[v] is the component of node v. Components
+    are numbered in reverse topological order: every edge goes from a
+    component to one with a smaller or equal number.
+    """
+    n = len(adj)
+    index = [-1] * n
+    low = [0] * n
+    on_stack = [False] * n
+    comp = [-1] * n
+    stack = []
+    ncomp = 0
+    counter = 0
+    for root in range(n):
+        if index[root] != -1:
+            continue
+        work = [(root, 0)]
+        index[root] = low[root] = counter
+        counter += 1
+        stack.append(root)
+        on_stack[root] = True
+        while work:
+            v, pos = work[-1]
+            succ = adj[v]
+            if pos < len(succ):
+                work[-1] = (v, pos + 1)
+                w = succ[pos]
+                if index[w] == -1:
+                    index[w] = low[w] = counter
+                    counter += 1
+                    stack.append(w)
+                    on_stack[w] = True
+                    work.append((w, 0))
+                elif on_stack[w] and index[w] < low[v]:
+                    low[v] = index[w]
+                continue
+            work.pop()
+            if work:
+                parent = work[-1][0]
+                if low[v] < low[parent]:
+                    low[parent] = low[v]
+            if low[v] == index[v]:
+                while True:
+                    w = stack.pop()
+                    on_stack[w] = False
+                    comp[w] = ncomp
+                    if w == v:
+                        break
+                ncomp += 1
+    return comp, ncomp
+
+
+def transitive_reverse_counts(deps, bin2src):
+    """Count, per source, the binaries that depend on it directly or indirectly.
+
+    `deps` maps each binary package to the names it depends on. Names that are
+    not binaries themselves (virtual packages) become leaf nodes attributed
+    to a source of the same name, matching the direct counts.
+    """
+    ids = {}
+    names = []
+    adj = []
+
+    def intern(name):
+        i = ids.get(name)
+        if i is None:
+            i = ids[name] = len(names)
+            names.append(name)
+            adj.append(())
+        return i
+
+    for pkg in deps:
+        intern(pkg)
+    for pkg, targets in deps.items():
+        adj[ids[pkg]] = tuple({intern(t): None for t in targets})
+
+    comp, ncomp = strongly_connected_components(adj)
+    members = [[] for _ in range(ncomp)]
+    for v, c in enumerate(comp):
+        members[c].append(v)
+
+    # Bits are handed out in processing order (dependents first), so a node's
+    # ancestor set only ever uses low bits and stays as small as possible.
+    bit = [0] * len(names)
+    nextbit = 0
+    for c in range(ncomp - 1, -1, -1):
+        for v in members[c]:
+            bit[v] = nextbit
+            nextbit += 1
+
+    srcs = [bin2src.get(name, name) for name in names]
+    remaining = {}
+    own_mask = {}
+    for v, src in enumerate(srcs):
+        remaining[src] = remaining.get(src, 0) + 1
+        own_mask[src] = own_mask.get(src, 0) | (1 << bit[v])
+
+    pending = {}
+    src_acc = {}
+    result = {}
+    for c in range(ncomp - 1, -1, -1):
+        ancestors = pending.pop(c, 0)
+        group = members[c]
+        mbits = 0
+        for v in group:
+            mbits |= 1 << bit[v]
+        cyclic = len(group) > 1 or group[0] in adj[group[0]]
+        reach = ancestors | mbits if cyclic else ancestors
+        for v in group:
+            src = srcs[v]
+            src_acc[src] = src_acc.get(src, 0) | reach
+            remaining[src] -= 1
+            if not remaining[src]:
+                result[src] = (src_acc.pop(src) & ~own_mask.pop(src)).bit_count()
+        push = ancestors | mbits
+        for d in {comp[w] for v in group for w in adj[v]}:
+            if d != c:
+                pending[d] = pending.get(d, 0) | push
+    return result
 
 
 def main():
@@ -72,15 +158,17 @@ def main():
     p.add_argument('--component', default='main')
     p.add_argument('--arch', default='amd64')
     p.add_argument('--top', type=int, default=5000)
+    p.add_argument('--transitive', action='store_true',
+                   help='Add a transitive_count column (direct + indirect reverse dependencies)')
+    debian_packages.add_source_arguments(p)
     args = p.parse_args()
 
-    text = fetch_packages_gz(args.suite, args.component, args.arch)
-    entries = parse_packages(text)
-    print(f"Parsed {len(entries)} binary package entries", file=sys.stderr)
+    pkgs = debian_packages.load_packages_from_args(args, fields=REVDEP_FIELDS)
+    print(f"Parsed {len(pkgs)} binary package entries", file=sys.stderr)
 
     # map binary package -> source package
     bin2src = {}
-    for e in entries:
+    for e in pkgs.values():
         pkg = e.get('Package')
         src = e.get('Source')
         if src:
@@ -92,8 +180,9 @@ def main():
         bin2src[pkg] = srcname
 
     counts = {}
+    deps = {}
 
-    for e in entries:
+    for e in pkgs.values():
         pkg = e.get('Package')
         # consider Depends and Recommends
         for field in ('Depends', 'Recommends'):
@@ -102,11 +191,19 @@ def main():
             for name in names:
                 src = bin2src.get(name, name)
                 counts[src] = counts.get(src, 0) + 1
+            if args.transitive:
+                deps.setdefault(pkg, []).extend(names)
 
     # sort
     items = sorted(counts.items(), key=lambda x: (-x[1], x[0]))
 
     topn = args.top if args.top and args.top > 0 else len(items)
+    if args.transitive:
+        trans = transitive_reverse_counts(deps, bin2src)
+        print('source_package,count,transitive_count')
+        for src, c in items[:topn]:
+            print(f"{src},{c},{trans.get(src, 0)}")
+        return
     print('source_package,count')
     for src, c in items[:topn]:
         print(f"{src},{c}")
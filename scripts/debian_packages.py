@@ -0,0 +1,639 @@
+#!/usr/bin/env python3
+"""
+scripts/debian_packages.py
+
+Shared Debian Packages helpers used by `build_debian_topogram.py`,
+`batch_build_topograms.py` and `compute_reverse_deps.py`: fetching and
+parsing Packages.gz, tokenizing dependency fields, and a persistent index.
+
+Fetching keeps a local copy of each Packages.gz together with its ETag,
+Last-Modified and content hash. Later runs send a conditional request (no
+body is transferred when nothing changed) and, when the archive publishes
+Packages.diff/Index, bring the local copy up to date with the pdiff ed
+patches instead of downloading the whole file. `--mirror` points at any
+HTTP mirror (or a local stand-in), while `--mirror-dir` and
+`--packages-file` read from disk and never touch the network.
+
+Besides fetching and parsing Packages.gz, this module maintains a persistent
+on-disk index of the parsed metadata. The index is keyed by
+suite/component/arch and the SHA-256 of the downloaded Packages.gz, so a
+second run against an unchanged archive skips decompression and parsing and
+simply memory-maps the previous result.
+
+Index layout (little-endian):
+
+  header   magic, version, package count, field count, field-name length, blob length
+  fields   field names joined by '\\n' (padded to 8 bytes)
+  offsets  uint32[packages * fields + 1] start offsets into the blob
+  order    uint32[packages] package ids sorted by name, for binary search
+  blob     UTF-8 field values, package-major, in Packages file order
+
+Package names are stored once and addressed by their position in the file,
+which doubles as the interned integer id of the package.
+"""
+
+import gzip
+import hashlib
+import io
+import json
+import lzma
+import mmap
+import os
+import re
+import struct
+import sys
+from array import array
+from collections import namedtuple
+from collections.abc import Mapping
+from pathlib import Path
+from urllib.error import HTTPError, URLError
+from urllib.request import Request, urlopen
+
+DEFAULT_MIRROR = 'http://ftp.debian.org/debian'
+PACKAGES_URL_TEMPLATE = '{mirror}/dists/{suite}/{component}/binary-{arch}/Packages.gz'
+MIRROR_PACKAGES_NAMES = ('Packages.gz', 'Packages.xz', 'Packages')
+
+# Fields kept in the index. Description only keeps its first (synopsis) line.
+INDEX_FIELDS = ('Package', 'Source', 'Version', 'Section', 'Description', 'Depends', 'Recommends', 'Suggests')
+INDEX_MAGIC = b'TPGPKIDX'
+INDEX_VERSION = 1
+
+_HEADER = struct.Struct('<8sIIIIQ')
+
+# One relation of a dependency field, e.g. "libfoo:any (>= 1.2) [amd64] <!nocheck> |".
+# Matched left to right with finditer, so each field is scanned exactly once.
+_DEP_TOKEN_RE = re.compile(r"""
+    \s*(?P<name>[^\s,|()\[\]<>:]+)
+    (?::(?P<arch>[^\s,|()\[\]<>]+))?
+    \s*(?:\(\s*(?P<op><<|<=|>=|>>|=|<|>)?\s*(?P<version>[^)]*?)\s*\))?
+    \s*(?:\[[^\]]*\])?
+    (?:\s*<[^>]*>)*
+    \s*(?P<sep>[,|]|$)
+""", re.VERBOSE)
+
+DepToken = namedtuple('DepToken', 'name arch version group')
+DepToken.__doc__ = """One relation from a dependency field.
+
+name     package name
+arch     multiarch qualifier ('any', 'native', ...) or '' when absent
+version  (operator, version) tuple, or None when unconstrained
+group    index of the comma-separated group; alternatives share a group
+"""
+
+
+def default_cache_dir():
+    base = os.environ.get('TOPOGRAM_CACHE_DIR')
+    if base:
+        return Path(base) / 'debian-index'
+    xdg = os.environ.get('XDG_CACHE_HOME') or str(Path.home() / '.cache')
+    return Path(xdg) / 'topogram' / 'debian-index'
+
+
+def packages_url(suite, component, arch, mirror=None):
+    return PACKAGES_URL_TEMPLATE.format(mirror=(mirror or DEFAULT_MIRROR).rstrip('/'),
+                                        suite=suite, component=component, arch=arch)
+
+
+def _http_get(url, headers=None):
+    return urlopen(Request(url, headers=headers or {}), timeout=30)
+
+
+def _parse_control_fields(text):
+    """Parse a single deb822 paragraph (e.g. Packages.diff/Index) into a dict."""
+    fields = {}
+    last = None
+    for line in text.splitlines():
+        if line[:1] in (' ', '\t'):
+            if last:
+                fields[last] += '\n' + line.strip()
+            continue
+        key, sep, val = line.partition(':')
+        if sep:
+            last = key.strip()
+            fields[last] = val.strip()
+    return fields
+
+
+def _hash_entries(value):
+    """Split a 'SHA256-History'-style field into (sha, size, name) tuples."""
+    out = []
+    for line in (value or '').splitlines():
+        parts = line.split()
+        if len(parts) == 3:
+            out.append((parts[0], int(parts[1]), parts[2]))
+    return out
+
+
+_ED_COMMAND_RE = re.compile(r'^(\d+)(?:,(\d+))?([acd])$')
+
+
+def apply_ed_patch(lines, patch_lines):
+    """Apply an ed-style script (as published in Packages.diff) to a list of lines in place.
+
+    Commands are expected in the descending order `diff --ed` produces, so
+    earlier edits never shift the line numbers of later ones.
+    """
+    it = iter(patch_lines)
+    for raw in it:
+        cmd = raw.rstrip('\n')
+        if not cmd or cmd == 'w':
+            continue
+        m = _ED_COMMAND_RE.match(cmd)
+        if not m:
+            raise ValueError(f'unsupported ed command: {cmd!r}')
+        start = int(m.group(1))
+        end = int(m.group(2) or start)
+        op = m.group(3)
+        text = []
+        if op in 'ac':
+            for line in it:
+                if line.rstrip('\n') == '.':
+                    break
+                text.append(line)
+        if op == 'a':
+            lines[start:start] = text
+        elif op == 'c':
+            lines[start - 1:end] = text
+        else:
+            del lines[start - 1:end]
+    return lines
+
+
+class FetchCache:
+    """Local copy of one Packages.gz plus the validators needed to refresh it."""
+
+    def __init__(self, root, url):
+        key = hashlib.sha1(url.encode('utf-8')).hexdigest()[:12]
+        self.dir = Path(root) / key
+        self.url = url
+        self.data_path = self.dir / 'Packages.gz'
+        self.meta_path = self.dir / 'meta.json'
+
+    def load(self):
+        try:
+            meta = json.loads(self.meta_path.read_text())
+            return self.data_path.read_bytes(), meta
+        except (OSError, ValueError):
+            return None, {}
+
+    def store(self, data, meta):
+        self.dir.mkdir(parents=True, exist_ok=True)
+        tmp = self.data_path.with_name(f'Packages.gz.tmp{os.getpid()}')
+        tmp.write_bytes(data)
+        os.replace(tmp, self.data_path)
+        meta = dict(meta, url=self.url)
+        self.meta_path.write_text(json.dumps(meta, indent=2, sort_keys=True))
+
+
+def _try_pdiff(base_url, data, meta):
+    """Bring cached Packages.gz bytes up to date with Packages.diff patches.
+
+    Returns (new_gz_bytes, new_meta) or None when pdiffs are unavailable, do
+    not cover the cached state, or fail verification.
+    """
+    diff_base = base_url.rsplit('/', 1)[0] + '/Packages.diff'
+    try:
+        with _http_get(diff_base + '/Index') as resp:
+            index = _parse_control_fields(resp.read().decode('utf-8', errors='replace'))
+    except (HTTPError, URLError, OSError):
+        return None
+    current = (index.get('SHA256-Current') or '').split()
+    ours = meta.get('sha256_uncompressed')
+    if not current or not ours:
+        return None
+    if current[0] == ours:
+        return data, meta
+    history = _hash_entries(index.get('SHA256-History'))
+    patches = _hash_entries(index.get('SHA256-Patches'))
+    downloads = {name: sha for sha, _, name in _hash_entries(index.get('SHA256-Download'))}
+    names = [name for sha, _, name in history if sha == ours]
+    if not names:
+        return None
+    if index.get('X-Patch-Precedence') == 'merged':
+        todo = names[-1:]
+    else:
+        order = [name for _, _, name in patches]
+        if names[0] not in order:
+            return None
+        todo = order[order.index(names[0]):]
+    expected = {name: sha for sha, _, name in patches}
+    lines = gzip.decompress(data).decode('utf-8', errors='surrogateescape').splitlines(keepends=True)
+    moved = 0
+    try:
+        for name in todo:
+            with _http_get(f'{diff_base}/{name}.gz') as resp:
+                raw = resp.read()
+            moved += len(raw)
+            if name in downloads and hashlib.sha256(raw).hexdigest() != downloads[name]:
+                return None
+            patch = gzip.decompress(raw)
+            if name in expected and hashlib.sha256(patch).hexdigest() != expected[name]:
+                return None
+            apply_ed_patch(lines, patch.decode('utf-8', errors='surrogateescape').splitlines(keepends=True))
+    except (HTTPError, URLError, OSError, ValueError) as exc:
+        print(f'[WARN] pdiff update failed, falling back to full download: {exc}', file=sys.stderr)
+        return None
+    content = ''.join(lines).encode('utf-8', errors='surrogateescape')
+    if hashlib.sha256(content).hexdigest() != current[0]:
+        print('[WARN] pdiff result does not match SHA256-Current, falling back to full download', file=sys.stderr)
+        return None
+    print(f'Applied {len(todo)} pdiff patch(es) ({moved} bytes)', file=sys.stderr)
+    new_meta = {'sha256_uncompressed': current[0]}
+    return gzip.compress(content, mtime=0), new_meta
+
+
+def fetch_packages_gz(suite='stable', component='main', arch='amd64', mirror=None, cache_dir=None, pdiff=True):
+    """Download Packages.gz and return the compressed bytes.
+
+    With `cache_dir` the last download is kept on disk and refreshed with a
+    conditional request (ETag / If-Modified-Since) and, when possible,
+    Packages.diff patches; an unchanged archive transfers no body at all.
+    """
+    url = packages_url(suite, component, arch, mirror)
+    if cache_dir is None:
+        print(f'Fetching Packages.gz from {url} ...', file=sys.stderr)
+        with _http_get(url) as resp:
+            return resp.read()
+
+    cache = FetchCache(cache_dir, url)
+    cached, meta = cache.load()
+    headers = {}
+    if cached is not None:
+        if meta.get('etag'):
+            headers['If-None-Match'] = meta['etag']
+        if meta.get('last_modified'):
+            headers['If-Modified-Since'] = meta['last_modified']
+    print(f'Fetching Packages.gz from {url} ...', file=sys.stderr)
+    try:
+        resp = _http_get(url, headers)
+    except HTTPError as exc:
+        if exc.code == 304 and cached is not None:
+            print('Packages.gz not modified; using cached copy', file=sys.stderr)
+            return cached
+        raise
+    with resp:
+        validators = {'etag': resp.headers.get('ETag'), 'last_modified': resp.headers.get('Last-Modified')}
+        if cached is not None and pdiff:
+            # the body has not been read yet; try the (much smaller) patches first
+            updated = _try_pdiff(url, cached, meta)
+            if updated is not None:
+                data, new_meta = updated
+                cache.store(data, dict(new_meta, **validators))
+                return data
+        data = resp.read()
+    print(f'Downloaded {len(data)} bytes', file=sys.stderr)
+    cache.store(data, dict(validators, sha256_uncompressed=hashlib.sha256(gzip.decompress(data)).hexdigest()))
+    return data
+
+
+def read_packages_file(path):
+    """Read a local Packages, Packages.gz or Packages.xz file."""
+    print(f'Reading Packages from {path}', file=sys.stderr)
+    return Path(path).read_bytes()
+
+
+def find_mirror_packages(mirror_dir, suite, component, arch):
+    """Locate the Packages file for suite/component/arch in a local mirror tree."""
+    base = Path(mirror_dir) / 'dists' / suite / component / f'binary-{arch}'
+    for name in MIRROR_PACKAGES_NAMES:
+        if (base / name).exists():
+            return base / name
+    raise SystemExit(f'No Packages file under {base} (looked for {", ".join(MIRROR_PACKAGES_NAMES)})')
+
+
+def _decompressor(data):
+    if data[:2] == b'\x1f\x8b':
+        return gzip.GzipFile(fileobj=io.BytesIO(data))
+    if data[:6] == b'\xfd7zXZ\x00':
+        return lzma.LZMAFile(io.BytesIO(data))
+    return io.BytesIO(data)
+
+
+def decompress_packages(data):
+    """Return the decoded text of a (gzip, xz or uncompressed) Packages payload."""
+    with _decompressor(data) as fh:
+        return fh.read().decode('utf-8', errors='replace')
+
+
+def open_packages(data):
+    """Return a text line stream over Packages bytes (gzip, xz or uncompressed).
+
+    Lines are decompressed and decoded incrementally, so only the compressed
+    payload and the current read buffer are held in memory.
+    """
+    return io.TextIOWrapper(_decompressor(data), encoding='utf-8', errors='replace')
+
+
+def iter_packages(lines, fields=None, multiline=True):
+    """Yield one metadata dict per Packages stanza from an iterable of lines.
+
+    Only the keys listed in `fields` are materialized (`Package` is always
+    kept); everything else, including long Description continuation blocks,
+    is skipped without building strings. With `multiline=False` continuation
+    lines are dropped for every field, which keeps just the synopsis of
+    Description.
+    """
+    wanted = None if fields is None else frozenset(fields) | {'Package'}
+    current = {}
+    last = None
+    for line in lines:
+        if line[:1] in (' ', '\t') and line.strip():
+            # continuation field (e.g., multiline Description)
+            if last is not None:
+                current[last] += '\n' + line.rstrip('\r\n')
+            continue
+        key, sep, val = line.partition(':')
+        if not sep:
+            if not line.strip():
+                if 'Package' in current:
+                    yield current
+                current = {}
+            last = None
+            continue
+        if wanted is None or key in wanted:
+            current[key] = val.strip()
+            last = key if multiline else None
+        else:
+            last = None
+    if 'Package' in current:
+        yield current
+
+
+def parse_packages(packages_text, fields=None, multiline=True):
+    """Parse a Debian Packages file into a dict: pkgname -> metadata dict
+
+    `packages_text` may be the decoded file contents or any iterable of lines
+    (for example the stream returned by `open_packages`).
+    """
+    lines = io.StringIO(packages_text) if isinstance(packages_text, str) else packages_text
+    return {meta['Package']: meta for meta in iter_packages(lines, fields=fields, multiline=multiline)}
+
+
+def tokenize_dep_field(field_value):
+    """Yield a DepToken per relation in a Depends-style field, in order.
+
+    Architecture restriction lists (``[amd64]``) and build profiles
+    (``<!nocheck>``) are recognized and skipped.
+    """
+    if not field_value:
+        return
+    group = 0
+    for m in _DEP_TOKEN_RE.finditer(field_value):
+        version = m.group('version')
+        if version is not None:
+            version = (m.group('op') or '=', version)
+        yield DepToken(m.group('name'), m.group('arch') or '', version, group)
+        if m.group('sep') == ',':
+            group += 1
+
+
+def dep_names(field_value, first_alternative=False):
+    """Return the package names of a dependency field (same scan as `tokenize_dep_field`).
+
+    With `first_alternative=True` only the first name of each `a | b` group
+    is kept. This is the hot path for graph building, so it uses findall
+    instead of materializing DepTokens.
+    """
+    if not field_value:
+        return []
+    if not first_alternative:
+        return [tok[0] for tok in _DEP_TOKEN_RE.findall(field_value)]
+    names = []
+    new_group = True
+    for name, _arch, _op, _version, sep in _DEP_TOKEN_RE.findall(field_value):
+        if new_group:
+            names.append(name)
+        new_group = sep != '|'
+    return names
+
+
+def write_index(pkgs, path):
+    """Serialize a name -> metadata mapping to the binary index format at `path`.
+
+    The file is written to a temporary sibling first and renamed into place so
+    concurrent readers never observe a partial index.
+    """
+    path = Path(path)
+    names = list(pkgs)
+    order = array('I', sorted(range(len(names)), key=lambda i: names[i].encode('utf-8')))
+    offsets = array('I', [0])
+    blob = bytearray()
+    for name in names:
+        meta = pkgs[name]
+        for field in INDEX_FIELDS:
+            if field == 'Package':
+                value = name
+            else:
+                value = meta.get(field) or ''
+                if field == 'Description':
+                    value = value.split('\n', 1)[0]
+            blob += value.encode('utf-8')
+            if len(blob) > 0xFFFFFFFF:
+                raise ValueError('Packages metadata too large for index format')
+            offsets.append(len(blob))
+    if sys.byteorder != 'little':
+        offsets.byteswap()
+        order.byteswap()
+    field_bytes = '\n'.join(INDEX_FIELDS).encode('ascii')
+    field_pad = b'\0' * (-len(field_bytes) % 8)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(path.name + f'.tmp{os.getpid()}')
+    with open(tmp, 'wb') as fh:
+        fh.write(_HEADER.pack(INDEX_MAGIC, INDEX_VERSION, len(names), len(INDEX_FIELDS), len(field_bytes), len(blob)))
+        fh.write(field_bytes + field_pad)
+        fh.write(offsets.tobytes())
+        fh.write(order.tobytes())
+        fh.write(blob)
+    os.replace(tmp, path)
+    return path
+
+
+class PackageIndex(Mapping):
+    """Read-only, memory-mapped view of a Packages index.
+
+    Behaves like the `pkgname -> metadata dict` mapping returned by
+    `parse_packages`, so callers such as `build_graph` can use either. Integer
+    ids (`lookup`, `name`, `field`) are stable for the lifetime of the file.
+    """
+
+    def __init__(self, buf, path=None):
+        self.path = path
+        self._buf = buf
+        magic, version, count, nfields, flen, blen = _HEADER.unpack_from(buf, 0)
+        if magic != INDEX_MAGIC or version != INDEX_VERSION:
+            raise ValueError(f'Not a topogram package index (or stale version): {path}')
+        pos = _HEADER.size
+        fields = tuple(bytes(buf[pos:pos + flen]).decode('ascii').split('\n'))
+        if fields != INDEX_FIELDS:
+            raise ValueError(f'Package index field layout mismatch: {path}')
+        pos += flen + (-flen % 8)
+        olen = (count * nfields + 1) * 4
+        self._offsets = self._uint32_view(buf, pos, olen)
+        pos += olen
+        self._order = self._uint32_view(buf, pos, count * 4)
+        pos += count * 4
+        if pos + blen > len(buf):
+            raise ValueError(f'Truncated package index: {path}')
+        self._base = pos
+        self._count = count
+        self._nfields = nfields
+        self._field_pos = {f: i for i, f in enumerate(fields)}
+
+    @staticmethod
+    def _uint32_view(buf, pos, length):
+        if sys.byteorder == 'little':
+            return memoryview(buf)[pos:pos + length].cast('I')
+        arr = array('I', bytes(buf[pos:pos + length]))
+        arr.byteswap()
+        return arr
+
+    @classmethod
+    def open(cls, path):
+        with open(path, 'rb') as fh:
+            buf = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            return cls(buf, path=str(path))
+        except Exception:
+            buf.close()
+            raise
+
+    def close(self):
+        for view in (self._offsets, self._order):
+            if isinstance(view, memoryview):
+                view.release()
+        if isinstance(self._buf, mmap.mmap):
+            self._buf.close()
+
+    def _raw(self, idx, fpos):
+        k = idx * self._nfields + fpos
+        return self._buf[self._base + self._offsets[k]:self._base + self._offsets[k + 1]]
+
+    def name(self, idx):
+        return self._raw(idx, 0).decode('utf-8')
+
+    def field(self, idx, field):
+        return self._raw(idx, self._field_pos[field]).decode('utf-8')
+
+    def lookup(self, name):
+        """Return the integer id of `name`, or -1 when it is not in the index."""
+        key = name.encode('utf-8')
+        lo, hi = 0, self._count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            idx = self._order[mid]
+            cur = self._raw(idx, 0)
+            if cur < key:
+                lo = mid + 1
+            elif cur > key:
+                hi = mid
+            else:
+                return idx
+        return -1
+
+    def meta(self, idx):
+        out = {}
+        for fpos, field in enumerate(INDEX_FIELDS):
+            raw = self._raw(idx, fpos)
+            if raw:
+                out[field] = raw.decode('utf-8')
+        return out
+
+    def __getitem__(self, name):
+        idx = self.lookup(name)
+        if idx < 0:
+            raise KeyError(name)
+        return self.meta(idx)
+
+    def __contains__(self, name):
+        return isinstance(name, str) and self.lookup(name) >= 0
+
+    def __iter__(self):
+        for idx in range(self._count):
+            yield self.name(idx)
+
+    def __len__(self):
+        return self._count
+
+    def items(self):
+        for idx in range(self._count):
+            yield self.name(idx), self.meta(idx)
+
+    def values(self):
+        for idx in range(self._count):
+            yield self.meta(idx)
+
+
+def index_path(cache_dir, suite, component, arch, digest):
+    return Path(cache_dir) / f'{suite}_{component}_{arch}_{digest[:16]}.pkgidx'
+
+
+def _prune_stale_indexes(keep):
+    prefix = keep.name.rsplit('_', 1)[0] + '_'
+    for other in keep.parent.glob(prefix + '*.pkgidx'):
+        if other != keep:
+            try:
+                other.unlink()
+            except OSError:
+                pass
+
+
+def load_packages(suite='stable', component='main', arch='amd64', cache_dir=None, use_cache=True, fields=INDEX_FIELDS,
+                  mirror=None, mirror_dir=None, packages_file=None, fetch_cache=True, pdiff=True):
+    """Fetch Packages.gz and return its package mapping, reusing the on-disk index when possible.
+
+    The payload comes from `packages_file`, else from the `mirror_dir` tree,
+    else from `mirror` over HTTP (cached under `cache_dir`/downloads unless
+    `fetch_cache` is False). Returns a `PackageIndex` when caching is
+    enabled, or the plain dict from `parse_packages` (projected to `fields`)
+    when `use_cache` is False.
+    """
+    cache_dir = Path(cache_dir) if cache_dir else default_cache_dir()
+    if packages_file:
+        data = read_packages_file(packages_file)
+    elif mirror_dir:
+        data = read_packages_file(find_mirror_packages(mirror_dir, suite, component, arch))
+    else:
+        data = fetch_packages_gz(suite=suite, component=component, arch=arch, mirror=mirror,
+                                 cache_dir=(cache_dir / 'downloads') if fetch_cache else None, pdiff=pdiff)
+    if not use_cache:
+        return parse_packages(open_packages(data), fields=fields, multiline=False)
+    digest = hashlib.sha256(data).hexdigest()
+    path = index_path(cache_dir, suite, component, arch, digest)
+    if path.exists():
+        try:
+            index = PackageIndex.open(path)
+            print(f'Loaded package index {path}', file=sys.stderr)
+            return index
+        except (OSError, ValueError) as exc:
+            print(f'[WARN] ignoring unreadable package index {path}: {exc}', file=sys.stderr)
+    pkgs = parse_packages(open_packages(data), fields=INDEX_FIELDS, multiline=False)
+    del data
+    try:
+        write_index(pkgs, path)
+        _prune_stale_indexes(path)
+    except OSError as exc:
+        print(f'[WARN] could not write package index {path}: {exc}', file=sys.stderr)
+        return pkgs
+    print(f'Wrote package index {path}', file=sys.stderr)
+    return PackageIndex.open(path)
+
+
+def add_source_arguments(parser):
+    """Add the Packages source / caching options shared by the Debian scripts."""
+    g = parser.add_argument_group('Packages source and caching')
+    g.add_argument('--mirror', default=DEFAULT_MIRROR, help=f'Debian mirror base URL (default: {DEFAULT_MIRROR})')
+    g.add_argument('--mirror-dir', default=None, help='Read Packages from a local mirror tree (offline)')
+    g.add_argument('--packages-file', default=None, help='Read this Packages[.gz|.xz] file instead of fetching (offline)')
+    g.add_argument('--cache-dir', default=None,
+                   help='Cache directory for downloads and the package index (default: ~/.cache/topogram/debian-index)')
+    g.add_argument('--no-index-cache', action='store_true', help='Always re-parse Packages.gz instead of using the cached index')
+    g.add_argument('--no-fetch-cache', action='store_true', help='Always download Packages.gz in full')
+    g.add_argument('--no-pdiff', action='store_true', help='Do not use Packages.diff patches to update the cached download')
+    return g
+
+
+def load_packages_from_args(args, fields=INDEX_FIELDS):
+    return load_packages(suite=args.suite, component=args.component, arch=args.arch,
+                         cache_dir=args.cache_dir, use_cache=not args.no_index_cache, fields=fields,
+                         mirror=args.mirror, mirror_dir=args.mirror_dir, packages_file=args.packages_file,
+                         fetch_cache=not args.no_fetch_cache, pdiff=not args.no_pdiff)
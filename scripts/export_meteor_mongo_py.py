@@ -1,12 +1,71 @@
 #!/usr/bin/env python3
 """
-Export Meteor local MongoDB (meteor DB) collections into gzipped JSONL files and package as tar.gz.
+Export Meteor local MongoDB (meteor DB) collections into compressed JSONL files and package as tar.gz.
 
-Usage: python3 scripts/export_meteor_mongo_py.py
+Usage: python3 scripts/export_meteor_mongo_py.py [--jobs 4] [--codec gzip] [--level 6] [--slice-docs 250000]
+       python3 scripts/export_meteor_mongo_py.py --incremental   # nightly: base once, then deltas
+
+Collections are exported concurrently by up to `--jobs` mongosh processes,
+each piping its documents into its own compressor. A collection with more than
+`--slice-docs` documents (in practice nodes and edges) is split into `_id`-range
+slices that are exported in parallel and then concatenated in `_id` order into a
+single `<collection>.jsonl.<ext>` file. Multi-member gzip/bz2/xz files decompress
+as one stream, so the archive layout is the same as with a single process.
+
+With --incremental the first run writes a full base export and records, per
+collection, a watermark: the newest `createdAt`/`updatedAt` and ObjectId `_id`.
+Later runs export only documents past those watermarks into a
+`meteor_mongo_delta_*.tar.gz`. Every archive carries a MANIFEST.json naming its
+base and parent, and the state file (`<out-dir>/export-state.json`) keeps the
+chain. Deletions are not captured, and collections with neither field (e.g.
+string `_id`s without `createdAt`) are exported in full every time. So is a
+collection that mixes ObjectId `_id`s with string (Meteor) `_id`s lacking both
+dates: those documents never pass an `_id` watermark, and a warning names the
+collection. Documents without dates in a collection tracked only by dates
+are not detected and only reach a full export.
+
+With --layout sharded, nodes and edges are exported sorted by `topogramId` and
+each topogram's documents are compressed as an independent member. INDEX.json
+maps every topogramId to the [offset, length, docs] of its members within the
+collection file (a topogram has several when its documents store topogramId
+both as an ObjectId and as a string, which sort apart), and the archive is an uncompressed `.tar`, so one topogram can be read with a
+seek (`--extract ARCHIVE TOPOGRAM_ID`, `iter_topogram_lines`). The collection
+files still decompress as a whole, like in the default layout.
 
 Requires: mongosh present in PATH and reachable to the local mongod.
 """
-import subprocess, json, shutil, os, sys, tempfile, tarfile, datetime
+import argparse
+import bz2
+import datetime
+import gzip
+import json
+import lzma
+import os
+import shutil
+import subprocess
+import sys
+import tarfile
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+# codec -> (file suffix, opener(fileobj, level), decompress(bytes)); levels are each
+# codec's own scale. Openers leave `fileobj` open when closed, so several members
+# can be written back to back into one file.
+CODECS = {
+    'gzip': ('.gz', lambda fh, level: gzip.GzipFile(fileobj=fh, mode='wb', compresslevel=level, mtime=0),
+             gzip.decompress),
+    'bz2': ('.bz2', lambda fh, level: bz2.BZ2File(fh, mode='wb', compresslevel=max(1, level)), bz2.decompress),
+    'xz': ('.xz', lambda fh, level: lzma.LZMAFile(fh, mode='wb', preset=level), lzma.decompress),
+    'none': ('', None, bytes),
+}
+READ_SIZE = 1 << 20
+MANIFEST_NAME = 'MANIFEST.json'
+MANIFEST_VERSION = 1
+INDEX_NAME = 'INDEX.json'
+INDEX_VERSION = 2
+
 
 # detect mongod port: try ss/netstat, otherwise read .meteor/local/db/METEOR-PORT +1 or 3002
 def detect_mongod_port():
@@ -37,67 +96,480 @@ def detect_mongod_port():
         pass
     return 3002
 
-port = detect_mongod_port()
-print('Using mongod port:', port)
-
-if shutil.which('mongosh') is None:
-    print('mongosh not found in PATH; please install mongosh and retry', file=sys.stderr)
-    sys.exit(1)
-
-# get collection names from meteor DB
-cmd = ['mongosh','--port',str(port),'--quiet','--eval',"JSON.stringify(db.getSiblingDB('meteor').getCollectionNames())"]
-try:
-    out = subprocess.check_output(cmd, text=True)
-except subprocess.CalledProcessError as e:
-    print('mongosh failed:', e, file=sys.stderr)
-    sys.exit(1)
-
-try:
-    cols = json.loads(out)
-except Exception:
-    # try to strip surrounding whitespace
-    s = out.strip()
+
+def mongosh_eval(port, js):
+    """Run a mongosh --eval and return its stdout; raises CalledProcessError on failure."""
+    return subprocess.check_output(['mongosh', '--port', str(port), '--quiet', '--eval', js], text=True)
+
+
+def list_collections(port, dbname):
+    """[(name, estimated document count)] for every collection of the database."""
+    js = (f"const d = db.getSiblingDB({json.dumps(dbname)}); "
+          "print(JSON.stringify(d.getCollectionNames().map(n => [n, d.getCollection(n).estimatedDocumentCount()])))")
+    out = mongosh_eval(port, js)
+    return [tuple(c) for c in json.loads(out.strip().splitlines()[-1])]
+
+
+# Slice bounds come from the server: $bucketAuto splits each value type of FIELD
+# into buckets of about SLICE documents, and a bucket never splits equal values
+# (so a topogram stays in one slice). Nothing is read into mongosh. Slices never
+# mix value types: range operators only match values of the bound's type, so
+# the last slice of each type is open-ended ({$gte: lo}) and still stops at that
+# type. Prints null when some value has a type that cannot be bounded this way
+# (including a missing field). The $type queries use the FIELD index if any.
+PLAN_SLICES_JS = """
+const c = db.getSiblingDB(DB).getCollection(NAME);
+const TYPES = ['number', 'string', 'objectId'];
+if (c.find({ [FIELD]: { $not: { $type: TYPES } } }, { _id: 1 }).limit(1).toArray().length) {
+  print('null');
+} else {
+  const filters = [];
+  TYPES.forEach(t => {
+    const n = c.countDocuments({ [FIELD]: { $type: t } });
+    if (!n) return;
+    const buckets = c.aggregate([{ $match: { [FIELD]: { $type: t } } },
+                                 { $bucketAuto: { groupBy: '$' + FIELD, buckets: Math.ceil(n / SLICE) } }],
+                                { allowDiskUse: true }).toArray();
+    buckets.forEach((b, i) => {
+      const hi = i + 1 < buckets.length ? buckets[i + 1]._id.min : undefined;
+      filters.push({ [FIELD]: hi !== undefined ? { $gte: b._id.min, $lt: hi } : { $gte: b._id.min } });
+    });
+  });
+  print(EJSON.stringify(filters, { relaxed: false }));
+}
+"""
+
+
+def plan_slices(port, dbname, coll, slice_docs, field='_id'):
+    """EJSON filters covering the collection in `field` order, or None to export it in one piece."""
+    js = (f"const DB = {json.dumps(dbname)}; const NAME = {json.dumps(coll)}; const SLICE = {int(slice_docs)}; "
+          f"const FIELD = {json.dumps(field)};" + PLAN_SLICES_JS)
+    out = mongosh_eval(port, js).strip().splitlines()[-1]
+    filters = json.loads(out)
+    if not filters or len(filters) < 2:
+        return None
+    return [json.dumps(f) for f in filters]
+
+
+def export_js(dbname, coll, filter_ejson=None, shard_key=None):
+    # Documents are relaxed Extended JSON, so ObjectIds and dates survive a restore
+    # (mongoimport reads it too). One print per batch: mongosh's print is slow
+    # compared to stringifying. With a shard key, documents come sorted by it and
+    # a `#"<key>"` line precedes each group (documents always start with `{`).
+    query = f'EJSON.parse({json.dumps(filter_ejson)})' if filter_ejson else '{}'
+    cursor = f"db.getSiblingDB({json.dumps(dbname)}).getCollection({json.dumps(coll)}).find({query})"
+    marker = ''
+    if shard_key:
+        cursor += f".sort({{ {json.dumps(shard_key)}: 1 }}).allowDiskUse()"
+        marker = (f"const v = doc[{json.dumps(shard_key)}]; const k = v === undefined || v === null ? '' : String(v); "
+                  "if (k !== key) { out.push('#' + JSON.stringify(k)); key = k; } ")
+    return (f"const out = []; let key = null; {cursor}.forEach(doc => {{ {marker}"
+            "out.push(EJSON.stringify(doc, { relaxed: true })); "
+            "if (out.length >= 1000) { print(out.join('\\n')); out.length = 0; } }); "
+            "if (out.length) print(out.join('\\n'));")
+
+
+def _write_shards(stream, fh, opener, level):
+    """Compress each marked group of lines into its own member; returns {key: [[offset, length, docs], ...]}.
+
+    Keys are stringified, so an ObjectId and a string topogramId with the same
+    hex share one key; their groups are sorted apart and each keeps its member.
+    """
+    index = {}
+    key = None
+    lines = []
+    start = fh.tell()
+
+    def flush():
+        if key is None:
+            return
+        out = opener(fh, level) if opener else fh
+        out.write(b''.join(lines))
+        if out is not fh:
+            out.close()
+        index.setdefault(key, []).append([start, fh.tell() - start, len(lines)])
+
+    for line in stream:
+        if line[:1] == b'#':
+            flush()
+            key = json.loads(line[1:])
+            lines = []
+            start = fh.tell()
+        else:
+            lines.append(line)
+    flush()
+    return index
+
+
+def export_slice(port, dbname, coll, filter_ejson, outpath, codec, level, shard_key=None):
+    """Stream one collection (slice) from mongosh into a compressed file.
+
+    With `shard_key` every group of documents sharing that key is compressed as
+    an independent member. Returns (docs, compressed bytes, seconds, error or
+    None, shard index or None).
+    """
+    t0 = time.perf_counter()
+    docs = 0
+    index = None
+    opener = CODECS[codec][1]
+    with tempfile.TemporaryFile() as errfh, open(outpath, 'wb') as fh:
+        cmd = ['mongosh', '--port', str(port), '--quiet', '--eval', export_js(dbname, coll, filter_ejson, shard_key)]
+        with subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=errfh) as proc:
+            if shard_key:
+                index = _write_shards(proc.stdout, fh, opener, level)
+                docs = sum(member[2] for members in index.values() for member in members)
+            else:
+                out = opener(fh, level) if opener else fh
+                try:
+                    # raw blocks, no per-line work: the compressor releases the GIL, so jobs run in parallel
+                    while True:
+                        block = proc.stdout.read(READ_SIZE)
+                        if not block:
+                            break
+                        docs += block.count(b'\n')
+                        out.write(block)
+                finally:
+                    if out is not fh:
+                        out.close()
+            ret = proc.wait()
+        errfh.seek(0)
+        stderr = errfh.read().decode('utf-8', errors='replace').strip()
+    error = None if ret == 0 else f'mongosh exited with status {ret}: {stderr}'
+    return docs, os.path.getsize(outpath), time.perf_counter() - t0, error, index
+
+
+def concat_parts(parts, outpath, indexes=None):
+    """Concatenate compressed slice files, in order, into one multi-member file.
+
+    `indexes` are the slices' shard indexes; returns them merged, with offsets
+    relative to the combined file.
+    """
+    merged = {} if indexes is not None else None
+    offset = 0
+    with open(outpath, 'wb') as out:
+        for i, part in enumerate(parts):
+            with open(part, 'rb') as fh:
+                shutil.copyfileobj(fh, out, READ_SIZE)
+            if indexes is not None:
+                for key, members in (indexes[i] or {}).items():
+                    # a topogram split across slices keeps the members of each
+                    merged.setdefault(key, []).extend([offset + start, length, docs] for start, length, docs in members)
+            offset = out.tell()
+            os.remove(part)
+    return merged
+
+
+def read_index(archive):
+    """The INDEX.json of a sharded export archive."""
+    with tarfile.open(archive, 'r:') as tf:
+        return json.load(tf.extractfile(INDEX_NAME))
+
+
+def iter_topogram_lines(archive, topogram_id, collections=None):
+    """Yield (collection, JSON line) for one topogram of a sharded export archive.
+
+    Only the topogram's own members are read: the tar is uncompressed, so each
+    one is a seek to the file's data offset plus its offset from INDEX.json.
+    """
+    with tarfile.open(archive, 'r:') as tf, open(archive, 'rb') as raw:
+        index = json.load(tf.extractfile(INDEX_NAME))
+        if index.get('version') != INDEX_VERSION:
+            raise ValueError(f"{archive}: unsupported {INDEX_NAME} version {index.get('version')}")
+        decompress = CODECS[index['codec']][2]
+        for coll, entry in index['collections'].items():
+            if collections and coll not in collections:
+                continue
+            base = tf.getmember(entry['file']).offset_data
+            for start, length, _ in entry['shards'].get(topogram_id, ()):
+                raw.seek(base + start)
+                for line in decompress(raw.read(length)).splitlines():
+                    yield coll, line.decode('utf-8')
+
+
+STATE_VERSION = 1
+
+# Per collection: the newest createdAt / updatedAt dates and the newest ObjectId
+# _id (whose leading bytes are its creation time). Printed as canonical EJSON so
+# the values round-trip exactly through the state file into the next filter.
+# Collections with non-ObjectId _ids carrying neither date are `untracked`: no
+# watermark can see those documents, so they get none (the _id index serves the
+# $type query).
+WATERMARKS_JS = """
+const d = db.getSiblingDB(DB);
+const out = {};
+const untracked = [];
+NAMES.forEach(n => {
+  const c = d.getCollection(n);
+  const wm = {};
+  ['createdAt', 'updatedAt'].forEach(f => {
+    const top = c.find({ [f]: { $type: 'date' } }, { [f]: 1 }).sort({ [f]: -1 }).limit(1).toArray();
+    if (top.length) wm[f] = top[0][f];
+  });
+  const id = c.find({ _id: { $type: 'objectId' } }, { _id: 1 }).sort({ _id: -1 }).limit(1).toArray();
+  if (id.length) wm._id = id[0]._id;
+  if (id.length && c.find({ _id: { $not: { $type: 'objectId' } }, createdAt: { $not: { $type: 'date' } },
+                            updatedAt: { $not: { $type: 'date' } } }, { _id: 1 }).limit(1).toArray().length) {
+    untracked.push(n);
+    out[n] = {};
+    return;
+  }
+  out[n] = wm;
+});
+print(EJSON.stringify({ watermarks: out, untracked: untracked }, { relaxed: false }));
+"""
+
+
+def collection_watermarks(port, dbname, names):
+    """({collection: {field: EJSON value}}, [untracked collections]) with the current high-water marks.
+
+    Untracked collections hold documents no watermark can see; they get no
+    watermark, so they are always exported in full.
+    """
+    js = f"const DB = {json.dumps(dbname)}; const NAMES = {json.dumps(list(names))};" + WATERMARKS_JS
+    out = json.loads(mongosh_eval(port, js).strip().splitlines()[-1])
+    return out['watermarks'], out['untracked']
+
+
+def delta_filter(since, until):
+    """EJSON filter for documents created or updated after `since`, up to `until`.
+
+    Fields missing from `since` (first seen in this run) are bounded above only.
+    Returns None when the collection has nothing to track, i.e. it must be
+    exported in full.
+    """
+    clauses = []
+    for field, high in until.items():
+        bounds = {'$lte': high}
+        if field in since:
+            bounds['$gt'] = since[field]
+        clauses.append({field: bounds})
+    return json.dumps({'$or': clauses}) if clauses else None
+
+
+def load_state(path, dbname):
+    """Incremental export state (chain and watermarks) for this database, or None."""
     try:
-        cols = json.loads(s)
-    except Exception:
-        print('Failed to parse collection list from mongosh output:', out, file=sys.stderr)
+        with open(path, encoding='utf-8') as fh:
+            state = json.load(fh)
+    except (OSError, ValueError):
+        return None
+    if state.get('version') != STATE_VERSION or state.get('db') != dbname or not state.get('base'):
+        return None
+    return state
+
+
+def save_state(path, state):
+    tmp = path + '.tmp'
+    with open(tmp, 'w', encoding='utf-8') as fh:
+        json.dump(state, fh, indent=2, sort_keys=True)
+    os.replace(tmp, path)
+
+
+def main():
+    p = argparse.ArgumentParser()
+    p.add_argument('--port', type=int, default=None, help='mongod port (default: detected)')
+    p.add_argument('--db', default='meteor', help='Database to export (default: meteor)')
+    p.add_argument('--collections', nargs='+', default=None, help='Export only these collections')
+    p.add_argument('--out-dir', default='exports', help='Where the archive is written (default: exports)')
+    p.add_argument('--jobs', type=int, default=min(4, os.cpu_count() or 1),
+                   help='Concurrent mongosh exports (default: min(4, CPUs))')
+    p.add_argument('--codec', choices=sorted(CODECS), default='gzip', help='Compression of the JSONL files (default: gzip)')
+    p.add_argument('--level', type=int, default=9,
+                   help='Compression level: 1-9 for gzip/bz2, 0-9 for the xz preset (default: 9)')
+    p.add_argument('--slice-docs', type=int, default=250000,
+                   help='Split collections with more documents than this into _id-range slices (0 = never)')
+    p.add_argument('--incremental', action='store_true',
+                   help='Export only documents created or updated since the last run (a full base on the first run)')
+    p.add_argument('--full', action='store_true', help='With --incremental: start a new chain with a full base export')
+    p.add_argument('--state', default=None,
+                   help='Incremental state file with the watermarks and archive chain (default: <out-dir>/export-state.json)')
+    p.add_argument('--layout', choices=('collections', 'sharded'), default='collections',
+                   help='sharded: compress each topogram of --shard-collections as its own member and write an '
+                        'offset index into an uncompressed .tar, for random access (default: collections)')
+    p.add_argument('--shard-collections', nargs='+', default=['nodes', 'edges'],
+                   help='Collections grouped by topogramId in the sharded layout (default: nodes edges)')
+    p.add_argument('--extract', nargs=2, metavar=('ARCHIVE', 'TOPOGRAM_ID'),
+                   help="Print one topogram's documents from a sharded archive as JSONL and exit")
+    args = p.parse_args()
+
+    if args.extract:
+        for _, line in iter_topogram_lines(*args.extract):
+            print(line)
+        return
+
+    port = args.port or detect_mongod_port()
+    print('Using mongod port:', port)
+
+    if shutil.which('mongosh') is None:
+        print('mongosh not found in PATH; please install mongosh and retry', file=sys.stderr)
+        sys.exit(1)
+
+    # get collection names (and sizes, to schedule the biggest work first)
+    try:
+        cols = list_collections(port, args.db)
+    except subprocess.CalledProcessError as e:
+        print('mongosh failed:', e, file=sys.stderr)
+        sys.exit(1)
+    except ValueError as e:
+        print('Failed to parse collection list from mongosh output:', e, file=sys.stderr)
+        sys.exit(1)
+    if args.collections:
+        wanted = set(args.collections)
+        cols = [c for c in cols if c[0] in wanted]
+
+    if not cols:
+        print(f'No collections found in {args.db} DB', file=sys.stderr)
+        sys.exit(1)
+
+    print('Collections to export:', [name for name, _ in cols])
+
+    # create temporary export dir inside repo to avoid tmp auto-clean
+    stamp = datetime.datetime.utcnow()
+    export_tmp = os.path.abspath(os.path.join(args.out_dir, 'tmp_export_' + stamp.strftime('%Y%m%d%H%M%S')))
+    os.makedirs(export_tmp, exist_ok=True)
+    suffix = '.jsonl' + CODECS[args.codec][0]
+    sharded = set(args.shard_collections) if args.layout == 'sharded' else set()
+    jobs = max(1, args.jobs)
+    started = time.perf_counter()
+
+    # Watermarks are read before exporting, so anything written while the export
+    # runs is at or past them and lands in the next delta (restores upsert by _id).
+    state_path = args.state or os.path.join(args.out_dir, 'export-state.json')
+    state = None
+    watermarks = {}
+    deltas = {}  # collection -> filter, for collections exported as a delta
+    if args.incremental:
+        watermarks, untracked = collection_watermarks(port, args.db, [name for name, _ in cols])
+        for name in untracked:
+            print(f'[WARN] {name} mixes ObjectId _ids with string _ids that have no createdAt/updatedAt; '
+                  'deltas cannot see those documents, so it is exported in full', file=sys.stderr)
+        state = None if args.full else load_state(state_path, args.db)
+    if state:
+        for name, _ in cols:
+            prev = state['collections'].get(name)
+            filt = delta_filter(prev['watermark'], watermarks[name]) if prev else None
+            if filt:
+                deltas[name] = filt
+        print(f"Delta export after {state['head']} ({len(deltas)} tracked collections, "
+              f'{len(cols) - len(deltas)} exported in full)')
+    elif args.incremental:
+        print('No previous base export for this database; writing a full base export')
+
+    with ThreadPoolExecutor(max_workers=jobs) as pool:
+        slices = {}
+        big = [name for name, count in cols if args.slice_docs > 0 and count > args.slice_docs and name not in deltas]
+        # sharded collections are sliced on topogram boundaries, the others by _id
+        planned = {pool.submit(plan_slices, port, args.db, name, args.slice_docs,
+                               'topogramId' if name in sharded else '_id'): name for name in big}
+        for fut in as_completed(planned):
+            name = planned[fut]
+            try:
+                slices[name] = fut.result()
+            except Exception as e:
+                print(f'Slicing {name} failed, exporting it in one piece: {e}', file=sys.stderr)
+            if slices.get(name):
+                print(f"Splitting {name} into {len(slices[name])} {'topogramId' if name in sharded else '_id'}-range slices")
+
+        tasks = []  # (estimated docs, collection, slice index, filter, path)
+        counts = dict(cols)
+        for name, count in cols:
+            filters = slices.get(name)
+            if not filters:
+                tasks.append((count, name, None, deltas.get(name), os.path.join(export_tmp, name + suffix)))
+                continue
+            for i, f in enumerate(filters):
+                part = os.path.join(export_tmp, f'{name}.part{i:05d}{suffix}')
+                tasks.append((count / len(filters), name, i, f, part))
+        # biggest first so a large collection does not start last and set the wall time
+        tasks.sort(key=lambda t: -t[0])
+
+        lock = threading.Lock()
+        failed = []
+        totals = {}
+        indexes = {}  # (collection, slice index) -> shard index
+
+        def run(task):
+            _, name, idx, filt, path = task
+            shard_key = 'topogramId' if name in sharded else None
+            docs, size, seconds, error, index = export_slice(port, args.db, name, filt, path, args.codec, args.level,
+                                                             shard_key=shard_key)
+            what = name if idx is None else f'{name} [slice {idx + 1}/{len(slices[name])}]'
+            with lock:
+                indexes[name, idx] = index
+                totals[name] = totals.get(name, 0) + docs
+                if error:
+                    failed.append(name)
+                    print('mongosh export failed for', what, 'stderr:', error, file=sys.stderr)
+                else:
+                    print(f'Exported {what}: {docs} docs, {size / 1e6:.1f} MB in {seconds:.1f}s')
+
+        for fut in [pool.submit(run, t) for t in tasks]:
+            fut.result()
+
+    for name, filters in slices.items():
+        if filters:
+            parts = [os.path.join(export_tmp, f'{name}.part{i:05d}{suffix}') for i in range(len(filters))]
+            part_indexes = [indexes.pop((name, i), None) for i in range(len(filters))] if name in sharded else None
+            indexes[name, None] = concat_parts(parts, os.path.join(export_tmp, name + suffix), part_indexes)
+    if sharded:
+        shard_index = {'version': INDEX_VERSION, 'codec': args.codec, 'collections': {
+            name: {'file': name + suffix, 'shards': indexes.get((name, None)) or {}}
+            for name, _ in cols if name in sharded}}
+        with open(os.path.join(export_tmp, INDEX_NAME), 'w', encoding='utf-8') as fh:
+            json.dump(shard_index, fh, sort_keys=True)
+    elapsed = time.perf_counter() - started
+    exported = sum(totals.values())
+    print(f'Exported {exported} docs from {len(cols)} collections in {elapsed:.1f}s '
+          f'({exported / max(elapsed, 1e-9):.0f} docs/s, jobs={jobs}, codec={args.codec} level={args.level})')
+    for name, count in cols:
+        if name in totals and name not in deltas and totals[name] != counts[name]:
+            print(f'  note: {name} has {totals[name]} docs exported, {counts[name]} estimated', file=sys.stderr)
+
+    # The manifest chains a delta to the base it applies to and the archive just
+    # before it; restoring means the base, then every delta of the chain in order.
+    kind = 'delta' if state else 'full'
+    outname = f"meteor_mongo_{'delta' if state else 'export'}_{stamp.strftime('%Y%m%d-%H%M%S')}"
+    outname += '.tar' if sharded else '.tar.gz'
+    manifest = {
+        'version': MANIFEST_VERSION, 'kind': kind, 'archive': outname, 'db': args.db,
+        'created': stamp.strftime('%Y-%m-%dT%H:%M:%SZ'), 'codec': args.codec, 'layout': args.layout,
+        'base': state['base'] if state else outname, 'parent': state['head'] if state else None,
+        'collections': {},
+    }
+    for name, _ in cols:
+        entry = {'file': name + suffix, 'docs': totals.get(name, 0), 'mode': 'delta' if name in deltas else 'full'}
+        if name in deltas:
+            entry['since'] = state['collections'][name]['watermark']
+        if args.incremental:
+            entry['until'] = watermarks[name]
+        manifest['collections'][name] = entry
+    with open(os.path.join(export_tmp, MANIFEST_NAME), 'w', encoding='utf-8') as fh:
+        json.dump(manifest, fh, indent=2, sort_keys=True)
+
+    # package into tar.gz; members are already compressed, so the outer gzip uses the
+    # fastest level. The sharded layout skips it so member offsets stay seekable.
+    outpath = os.path.abspath(os.path.join(args.out_dir, outname))
+    with (tarfile.open(outpath, 'w') if sharded else tarfile.open(outpath, 'w:gz', compresslevel=1)) as tf:
+        for f in sorted(os.listdir(export_tmp)):
+            tf.add(os.path.join(export_tmp, f), arcname=f)
+
+    print('Created export:', outpath)
+    if args.incremental and not failed:
+        collections = dict(state['collections']) if state else {}
+        collections.update({name: {'watermark': watermarks[name]} for name, _ in cols})
+        chain = (state['chain'] if state else []) + [outname]
+        save_state(state_path, {
+            'version': STATE_VERSION, 'db': args.db, 'base': manifest['base'], 'head': outname,
+            'chain': chain, 'collections': collections,
+        })
+        print(f'Updated {state_path}: chain of {len(chain)} archives since {chain[0]}')
+    print(f'Tip: restore with python3 scripts/restore_meteor_mongo_py.py {outpath} --port <port> --commit')
+    if args.codec == 'gzip':
+        print('     or import each <collection>.jsonl.gz using mongoimport --gzip --uri mongodb://host:port/meteor --collection <name> --drop --file -')
+    if failed:
+        print('Export incomplete; failed collections:', sorted(set(failed)), file=sys.stderr)
         sys.exit(1)
 
-if not cols:
-    print('No collections found in meteor DB', file=sys.stderr)
-    sys.exit(1)
-
-print('Collections to export:', cols)
-
-# create temporary export dir inside repo to avoid tmp auto-clean
-export_tmp = os.path.abspath('exports/tmp_export_' + datetime.datetime.utcnow().strftime('%Y%m%d%H%M%S'))
-os.makedirs(export_tmp, exist_ok=True)
-
-for coll in cols:
-    outpath = os.path.join(export_tmp, f"{coll}.jsonl.gz")
-    print('Exporting', coll, '->', outpath)
-    # spawn mongosh and gzip the stdout
-    eval_js = f"db.getSiblingDB('meteor').getCollection(\"{coll}\").find().forEach(doc => {{ print(JSON.stringify(doc)) }})"
-    with subprocess.Popen(['mongosh','--port',str(port),'--quiet','--eval',eval_js], stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True) as proc:
-        with open(outpath, 'wb') as fh:
-            import gzip
-            with gzip.GzipFile(fileobj=fh, mode='wb', compresslevel=9) as gz:
-                for line in proc.stdout:
-                    gz.write(line.encode('utf-8'))
-        stderr = proc.stderr.read()
-        ret = proc.wait()
-        if ret != 0:
-            print('mongosh export failed for', coll, 'stderr:', stderr, file=sys.stderr)
-            # continue to next collection
-
-# package into tar.gz
-outname = f"meteor_mongo_export_{datetime.datetime.utcnow().strftime('%Y%m%d-%H%M%S')}.tar.gz"
-outpath = os.path.abspath(os.path.join('exports', outname))
-with tarfile.open(outpath, 'w:gz') as tf:
-    for f in sorted(os.listdir(export_tmp)):
-        tf.add(os.path.join(export_tmp,f), arcname=f)
-
-print('Created export:', outpath)
-print('Tip: import each <collection>.jsonl.gz using mongoimport --gzip --uri mongodb://host:port/meteor --collection <name> --drop --file -')
-
-# done
+
+if __name__ == '__main__':
+    main()
@@ -3,98 +3,174 @@
 Swap source/target columns in Topogram CSV files under a directory.
 
 Usage:
-  scripts/fix_topograms_swap_edges.py --dir samples/topograms/debian --commit
+  scripts/fix_topograms_swap_edges.py --dir samples/topograms/debian --commit [--jobs 0]
 
 The script will:
-- Back up the directory to /tmp/debian_topograms_backup.tar.gz
-- For each .topogram.csv file, read the CSV, and for rows where the `id` column is empty
-  and either `source` or `target` is non-empty, swap the values in the `source` and `target`
-  columns (columns 12 and 13, 0-based indexing).
-- Overwrite the file in-place.
+- Stream each .topogram.csv file (or .topogram.csv.gz/.bz2/.xz, see topogram_codecs.py) row by row, in a
+  single pass, into a temporary file next to the original,
+  compressed with the original's codec, swapping the values in the `source` and `target` columns (columns 12 and 13, 0-based
+  indexing) for rows where the `id` column is empty and either `source` or `target`
+  is non-empty.
+- Back up the original of every file that changes to
+  /tmp/<dir>_topograms_backup_<timestamp>.tar.gz, flushed to disk, then atomically
+  rename the temporary file over it. Files without swapped rows are left untouched.
+
+Files are processed by `--jobs` worker processes. A failure never leaves a half-written
+CSV: each file is either its original or its fully rewritten version.
 
 This operation is reversible by unpacking the backup archive.
 """
 
 import argparse
 import csv
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import os
 from pathlib import Path
+import shutil
 import tarfile
+import tempfile
 import time
 import sys
+import zlib
+
+import topogram_codecs
 
 HEADER_FIELDS = ['id','name','label','description','color','fillColor','weight','rawWeight','lat','lng','emoji','notes','source','target','edgeLabel','edgeColor','edgeWeight','relationship','extra']
 SRC_IDX = 12
 TGT_IDX = 13
 
+def process_file(p: Path):
+    """Rewrite `p` with edge rows swapped into a temp file in the same directory.
 
-def backup_dir(dpath: Path) -> Path:
-    timestamp = time.strftime('%Y%m%d-%H%M%S')
-    dest = Path('/tmp') / f'debian_topograms_backup_{timestamp}.tar.gz'
-    with tarfile.open(dest, 'w:gz') as tf:
-        tf.add(str(dpath), arcname=dpath.name)
-    return dest
+    Returns (path, rows swapped, temp path). The temp path is None when nothing
+    changed; otherwise the caller backs up `p` and renames the temp file over it.
+    """
+    changed = 0
+    fd, tmp = tempfile.mkstemp(prefix=f'.{p.name}.', suffix='.tmp', dir=p.parent)
+    os.close(fd)
+    try:
+        with topogram_codecs.open_csv(p) as src, \
+                topogram_codecs.open_csv(tmp, 'w', codec=topogram_codecs.codec_for_path(p)) as dst:
+            reader = csv.reader(src)
+            writer = csv.writer(dst, quoting=csv.QUOTE_MINIMAL)
+            header = next(reader, None)
+            # validate header roughly
+            if header is None or len(header) < max(SRC_IDX, TGT_IDX)+1:
+                if header is not None:
+                    print(f'Skipping {p}: unexpected header columns ({len(header)})', file=sys.stderr)
+                os.unlink(tmp)
+                return p, 0, None
+            writer.writerow(header)
+            width = len(header)
+            for row in reader:
+                # ensure row has enough columns
+                if len(row) < width:
+                    # pad
+                    row += ['']*(width-len(row))
+                if (not row[0].strip()) and (row[SRC_IDX].strip() or row[TGT_IDX].strip()):
+                    # edge row: swap source/target
+                    row[SRC_IDX], row[TGT_IDX] = row[TGT_IDX], row[SRC_IDX]
+                    changed += 1
+                writer.writerow(row)
+        if not changed:
+            os.unlink(tmp)
+            return p, 0, None
+        shutil.copymode(p, tmp)
+        return p, changed, tmp
+    except BaseException:
+        try:
+            os.unlink(tmp)
+        except FileNotFoundError:
+            pass
+        raise
 
 
-def process_file(p: Path) -> int:
-    changed = 0
-    # read rows preserving quoting
-    with p.open(newline='') as f:
-        reader = csv.reader(f)
-        rows = list(reader)
-    if not rows:
-        return 0
-    header = rows[0]
-    # validate header roughly
-    if len(header) < max(SRC_IDX, TGT_IDX)+1:
-        print(f'Skipping {p}: unexpected header columns ({len(header)})', file=sys.stderr)
-        return 0
-    out_rows = [header]
-    for row in rows[1:]:
-        # ensure row has enough columns
-        if len(row) < len(header):
-            # pad
-            row = row + ['']*(len(header)-len(row))
-        if (not row[0].strip()) and (row[SRC_IDX].strip() or row[TGT_IDX].strip()):
-            # edge row: swap source/target
-            row[SRC_IDX], row[TGT_IDX] = row[TGT_IDX], row[SRC_IDX]
-            changed += 1
-        out_rows.append(row)
-    if changed:
-        # write back
-        with p.open('w', newline='') as f:
-            writer = csv.writer(f, quoting=csv.QUOTE_MINIMAL)
-            writer.writerows(out_rows)
-    return changed
+class SelectiveBackup:
+    """tar.gz of the original files that are about to be replaced, created on first use.
+
+    Every `add` is flushed and fsynced before it returns, so an original is on
+    disk before the caller replaces it; after a crash the archive lacks only
+    its end marker (`tar` still extracts it, with a warning).
+    """
+
+    def __init__(self, dpath: Path):
+        self.dpath = dpath
+        timestamp = time.strftime('%Y%m%d-%H%M%S')
+        self.path = Path('/tmp') / f'{dpath.name}_topograms_backup_{timestamp}.tar.gz'
+        self.count = 0
+        self._tar = None
+
+    def add(self, p: Path):
+        if self._tar is None:
+            self._tar = tarfile.open(self.path, 'w:gz')
+        self._tar.add(str(p), arcname=str(Path(self.dpath.name) / p.relative_to(self.dpath)))
+        gz = self._tar.fileobj
+        gz.flush(zlib.Z_SYNC_FLUSH)
+        os.fsync(gz.fileobj.fileno())
+        self.count += 1
+
+    def close(self):
+        if self._tar is not None:
+            self._tar.close()
 
 
 def main():
     p = argparse.ArgumentParser()
     p.add_argument('--dir', required=True)
     p.add_argument('--commit', action='store_true', help='Actually write changes (default: write).')
+    p.add_argument('--jobs', '-j', type=int, default=1,
+                   help='Number of worker processes (0 = one per CPU; default: 1)')
     args = p.parse_args()
+    jobs = args.jobs if args.jobs > 0 else (os.cpu_count() or 1)
 
     d = Path(args.dir)
     if not d.exists() or not d.is_dir():
         print('Directory not found:', d, file=sys.stderr)
         sys.exit(2)
 
-    print('Backing up', d, 'to /tmp...', file=sys.stderr)
-    backup = backup_dir(d)
-    print('Backup created at', backup, file=sys.stderr)
-
-    total_changed = 0
-    files = list(d.rglob('*.topogram.csv'))
+    files = sorted(f for pattern in topogram_codecs.TOPOGRAM_CSV_PATTERNS for f in d.rglob(pattern))
     print(f'Found {len(files)} files to process', file=sys.stderr)
-    for i, fpath in enumerate(files, start=1):
-        changed = process_file(fpath)
-        if changed:
-            print(f'[{i}/{len(files)}] Updated {fpath} ({changed} rows swapped)', file=sys.stderr)
-        else:
-            # print progress occasionally
-            if i % 100 == 0:
-                print(f'[{i}/{len(files)}] {fpath} (no change)', file=sys.stderr)
-        total_changed += changed
-    print(f'Done. Total rows swapped across files: {total_changed}', file=sys.stderr)
+    backup = SelectiveBackup(d)
+    total_changed = updated = skipped = failed = 0
+    futures = {}
+    try:
+        with ProcessPoolExecutor(max_workers=jobs) as pool:
+            futures = {pool.submit(process_file, fpath): fpath for fpath in files}
+            for i, fut in enumerate(as_completed(futures), start=1):
+                try:
+                    fpath, changed, tmp = fut.result()
+                except Exception as e:
+                    failed += 1
+                    print(f'[{i}/{len(files)}] ERROR {futures[fut]}: {e}', file=sys.stderr)
+                    continue
+                if tmp:
+                    # the original goes into the backup before it is replaced
+                    backup.add(fpath)
+                    os.replace(tmp, fpath)
+                    updated += 1
+                    total_changed += changed
+                    print(f'[{i}/{len(files)}] Updated {fpath} ({changed} rows swapped)', file=sys.stderr)
+                else:
+                    skipped += 1
+                    # print progress occasionally
+                    if i % 100 == 0:
+                        print(f'[{i}/{len(files)}] {fpath} (no change)', file=sys.stderr)
+    except BaseException:
+        # the pool has drained by now; results not yet renamed must not linger
+        for fut in futures:
+            if fut.done() and not fut.cancelled() and fut.exception() is None:
+                tmp = fut.result()[2]
+                if tmp and os.path.exists(tmp):
+                    os.unlink(tmp)
+        raise
+    finally:
+        backup.close()
+    if backup.count:
+        print(f'Backup of {backup.count} changed files created at {backup.path}', file=sys.stderr)
+    print(f'Done. Total rows swapped across files: {total_changed} '
+          f'({updated} files updated, {skipped} unchanged, {failed} failed)', file=sys.stderr)
+    if failed:
+        sys.exit(1)
 
 if __name__ == '__main__':
     main()
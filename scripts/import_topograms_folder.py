@@ -9,27 +9,57 @@ By default the script runs in dry-run mode and prints counts. Use --commit to wr
 It detects Meteor's port from .meteor/local/db/METEOR-PORT or falls back to 3001, or you can
 pass an explicit --mongo-url connection string.
 
-This script shells out to `mongosh --port <port> --eval <js>` to perform inserts so it
-doesn't require extra Python MongoDB deps and works with the Meteor local DB.
+This script shells out to `mongosh` to perform inserts so it doesn't require extra
+Python MongoDB deps and works with the Meteor local DB. Topograms are streamed as
+one JSON line each into a long-running mongosh session (see IMPORT_DRIVER_JS), so
+a folder of hundreds of files pays for process startup and connection setup once
+per `--batch-size` files instead of once per file.
 
 The script understands both the historic Topogram CSV format (node rows beginning with
 an id and edge rows with blank first column) and header-based exports that include
 `id`, `title`, `source`, `target`, `relationship`, `enlightement`, and similar fields.
 It creates a Topogram document per file, then inserts nodes and edges with `topogramId`
-referencing the created _id.
+referencing the created _id. Spreadsheets (`.topogram.xlsx`, `.topogram.ods`) and the
+compact binary `.topogram.bin` format of `topogram_binary.py` are imported too.
 
-Safety: this script will not overwrite existing Topogram documents with the same id.
-It generates new ids using ObjectId() in Mongo where needed.
+Parsing and writing are pipelined: `--parse-jobs` processes parse files while
+`--write-jobs` threads, each with its own mongosh session, insert the results.
+A bounded queue (`--queue-size`) between the two stages applies backpressure so
+only a handful of parsed topograms are held in memory at once.
+
+A manifest (by default under ~/.cache/topogram/import-manifests, one per folder,
+label and database) records each file's content hash and the _id of the topogram
+it was imported as. Re-imports skip unchanged files, replace changed files in place
+(same topogram _id, new nodes and edges) and delete the documents of files that
+disappeared from the folder. Use --force to re-import everything or --no-manifest
+to always insert new topograms.
+
+Safety: apart from topograms recorded in its own manifest, this script will not
+overwrite existing Topogram documents. It generates new ids using ObjectId() in
+Mongo where needed.
 """
 
 import argparse
 import csv
+import hashlib
 import json
 import os
+import queue
 import subprocess
 import sys
 import tempfile
+import threading
+import time
+import zipfile
+from collections import deque, namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from itertools import chain, islice, repeat
 from pathlib import Path
+from xml.etree import ElementTree
+from xml.parsers import expat
+
+import topogram_binary
+import topogram_codecs
 
 
 def detect_meteor_port():
@@ -46,244 +76,794 @@ def find_topogram_files(root):
     rootp = Path(root)
     if not rootp.exists():
         raise SystemExit(f"Folder not found: {root}")
-    patterns = ['*.topogram.csv', '*.topogram.xlsx', '*.topogram.ods']
+    patterns = [*topogram_codecs.TOPOGRAM_CSV_PATTERNS, '*.topogram.xlsx', '*.topogram.ods', '*' + topogram_binary.SUFFIX]
     out = []
     for pat in patterns:
         out.extend([str(p) for p in rootp.rglob(pat)])
     return sorted(out)
 
 
-def parse_topogram_csv(path):
-    nodes = []
-    edges = []
-    with open(path, newline='', encoding='utf-8') as fh:
+# Compact parsed rows. Optional fields are '' when absent; `raw` is the original
+# CSV row or spreadsheet cells, or None when the parser runs with keep_raw=False.
+TopogramNode = namedtuple('TopogramNode', 'id title label emoji color weight raw')
+TopogramEdge = namedtuple('TopogramEdge', 'source target name color weight relationship relationshipEmoji enlightement raw')
+
+# column name aliases, in lookup order, for each field of the header-based format
+NODE_COLUMNS = {
+    'id': ('id',), 'title': ('title', 'name'), 'label': ('label',), 'emoji': ('emoji',),
+    'color': ('color', 'fillcolor', 'fill color'), 'weight': ('weight', 'rawweight', 'raw weight'),
+}
+EDGE_COLUMNS = {
+    'source': ('source',), 'target': ('target',), 'name': ('edgelabel', 'edge label'),
+    'color': ('edgecolor', 'edge color'), 'weight': ('edgeweight', 'edge weight'),
+    'relationship': ('relationship',), 'relationshipEmoji': ('relationshipemoji', 'relationship emoji'),
+    'enlightement': ('enlightement', 'enlightenment', 'edgeenlightement', 'edge enlightenment'),
+}
+
+
+def _column_indices(header_map, names, fallback_idx=None):
+    """Candidate column indices for a field: matching header columns first, then the positional fallback."""
+    idxs = [header_map[n] for n in names if n in header_map]
+    if fallback_idx is not None:
+        idxs.append(fallback_idx)
+    return tuple(idxs)
+
+
+def _cell(row, idxs):
+    # first candidate column present in this (possibly short) row
+    n = len(row)
+    for i in idxs:
+        if i < n:
+            return row[i].strip()
+    return ''
+
+
+def iter_topogram_csv(path, keep_raw=True):
+    """Yield TopogramNode / TopogramEdge records from a topogram CSV, in file order.
+
+    Rows are read one at a time and the header is resolved once into column
+    indices, so memory does not grow with the file. Understands both the
+    header-based format and the historic positional one (node rows start with
+    an id, edge rows with an empty first cell or `edge`). Compressed
+    `.csv.gz`/`.csv.bz2`/`.csv.xz` files are decompressed while reading.
+    """
+    with topogram_codecs.open_csv(path) as fh:
         reader = csv.reader(fh)
-        header = None
-        rows = list(reader)
-        if not rows:
-            return nodes, edges
-
-        def sanitize(cell):
-            if cell is None:
-                return ''
-            if isinstance(cell, str):
-                return cell.strip()
-            return str(cell).strip()
-
-        header_map = {}
-        if any(isinstance(c, str) and (c.lower() == 'id' or c.lower() == 'title') for c in rows[0]):
-            header = [sanitize(c) for c in rows[0]]
-            header_map = {}
-            for idx, c in enumerate(rows[0]):
-                key = sanitize(c)
-                if key:
-                    header_map[key.lower()] = idx
-            body = rows[1:]
+        first = next(reader, None)
+        if first is None:
+            return
+        if any(c.lower() == 'id' or c.lower() == 'title' for c in first):
+            header_map = _header_map(first)
+            rows = reader
         else:
-            body = rows
+            header_map = {}
+            rows = chain((first,), reader)
 
-        def get_cell(row, *names, fallback_idx=None):
-            if header_map:
-                for name in names:
-                    if not name:
-                        continue
-                    idx = header_map.get(name.lower())
-                    if idx is not None and idx < len(row):
-                        return sanitize(row[idx])
-            if fallback_idx is not None and fallback_idx < len(row):
-                return sanitize(row[fallback_idx])
-            return ''
-
-        for r in body:
-            if not any(sanitize(cell) for cell in r):
+        edge_cols = {f: _column_indices(header_map, names) for f, names in EDGE_COLUMNS.items()}
+        e_src, e_tgt = edge_cols['source'], edge_cols['target']
+        e_rest = [edge_cols[f] for f in ('name', 'color', 'weight', 'relationship', 'relationshipEmoji', 'enlightement')]
+        p_src = _column_indices(header_map, ('source',), 4)
+        p_tgt = _column_indices(header_map, ('target',), 5)
+        n_id = _column_indices(header_map, NODE_COLUMNS['id'], 0)
+        n_title = _column_indices(header_map, NODE_COLUMNS['title'], 1)
+        n_label = _column_indices(header_map, NODE_COLUMNS['label'], 2)
+        n_rest = [_column_indices(header_map, NODE_COLUMNS[f]) for f in ('emoji', 'color', 'weight')]
+
+        for r in rows:
+            if not any(cell.strip() for cell in r):
                 continue
+            raw = r if keep_raw else None
 
             if header_map:
-                src = get_cell(r, 'source')
-                tgt = get_cell(r, 'target')
+                src = _cell(r, e_src)
+                tgt = _cell(r, e_tgt)
                 if src or tgt:
-                    edge = {'source': src, 'target': tgt, 'raw': r}
-                    name = get_cell(r, 'edgelabel', 'edge label')
-                    if name:
-                        edge['name'] = name
-                    color = get_cell(r, 'edgecolor', 'edge color')
-                    if color:
-                        edge['color'] = color
-                    weight = get_cell(r, 'edgeweight', 'edge weight')
-                    if weight:
-                        edge['weight'] = weight
-                    relationship = get_cell(r, 'relationship')
-                    if relationship:
-                        edge['relationship'] = relationship
-                    rel_emoji = get_cell(r, 'relationshipemoji', 'relationship emoji')
-                    if rel_emoji:
-                        edge['relationshipEmoji'] = rel_emoji
-                    enlightement = get_cell(r, 'enlightement', 'enlightenment', 'edgeenlightement', 'edge enlightenment')
-                    if enlightement:
-                        edge['enlightement'] = enlightement
-                    edges.append(edge)
+                    yield TopogramEdge(src, tgt, *[_cell(r, idxs) for idxs in e_rest], raw)
                     continue
 
-            is_edge_row = False
-            if len(r) > 0:
-                first_cell = sanitize(r[0])
-                is_edge_row = (first_cell == '' or first_cell.lower() == 'edge')
-            if is_edge_row:
-                src = get_cell(r, 'source', fallback_idx=4)
-                tgt = get_cell(r, 'target', fallback_idx=5)
+            first_cell = r[0].strip()
+            if first_cell == '' or first_cell.lower() == 'edge':
+                src = _cell(r, p_src)
+                tgt = _cell(r, p_tgt)
                 if not src and len(r) > 1:
-                    src = get_cell(r, None, fallback_idx=1)
+                    src = r[1].strip()
                 if not tgt and len(r) > 2:
-                    tgt = get_cell(r, None, fallback_idx=2)
-                edges.append({'source': src, 'target': tgt, 'raw': r})
+                    tgt = r[2].strip()
+                yield TopogramEdge(src, tgt, '', '', '', '', '', '', raw)
                 continue
 
-            nid = get_cell(r, 'id', fallback_idx=0)
-            title = get_cell(r, 'title', 'name', fallback_idx=1) or nid
-            label = get_cell(r, 'label', fallback_idx=2) or title
-            node = {'id': nid, 'title': title, 'label': label, 'raw': r}
-            emoji = get_cell(r, 'emoji')
-            if emoji:
-                node['emoji'] = emoji
-            color = get_cell(r, 'color', 'fillcolor', 'fill color')
-            if color:
-                node['color'] = color
-            weight = get_cell(r, 'weight', 'rawweight', 'raw weight')
-            if weight:
-                node['weight'] = weight
-            nodes.append(node)
+            nid = _cell(r, n_id)
+            title = _cell(r, n_title) or nid
+            label = _cell(r, n_label) or title
+            yield TopogramNode(nid, title, label, *[_cell(r, idxs) for idxs in n_rest], raw)
+
+
+def parse_topogram_csv(path, keep_raw=True):
+    """Return (nodes, edges) lists of TopogramNode / TopogramEdge records."""
+    nodes = []
+    edges = []
+    for rec in iter_topogram_csv(path, keep_raw=keep_raw):
+        (nodes if type(rec) is TopogramNode else edges).append(rec)
     return nodes, edges
 
 
-def parse_topogram_spreadsheet(path):
+# In spreadsheets `from`/`to` also name the edge endpoints, and in a dedicated
+# Edges sheet the plain column names describe the edge itself.
+SHEET_EDGE_COLUMNS = dict(EDGE_COLUMNS, source=('source', 'from'), target=('target', 'to'))
+EDGES_SHEET_COLUMNS = dict(
+    SHEET_EDGE_COLUMNS, name=('name',) + EDGE_COLUMNS['name'] + ('label',),
+    color=('color',) + EDGE_COLUMNS['color'], weight=('weight',) + EDGE_COLUMNS['weight'])
+
+
+def _header_map(cells):
+    """Lowercased header name -> column index; later duplicates win, blank names are dropped."""
+    header_map = {}
+    for idx, c in enumerate(cells):
+        key = c.strip()
+        if key:
+            header_map[key.lower()] = idx
+    return header_map
+
+
+class SheetLayout:
+    """Column layout of one sheet, resolved once from its header row.
+
+    `kind` is 'nodes' or 'edges' for dedicated Nodes/Edges sheets. A sheet
+    without a kind holds both: rows with a source or target are edges, the
+    others nodes.
+    """
+
+    def __init__(self, header, kind=None):
+        header_map = _header_map(header)
+        self.kind = kind
+        self.columns = tuple(header_map.values())
+        edge_names = EDGES_SHEET_COLUMNS if kind == 'edges' else SHEET_EDGE_COLUMNS
+        self.edge_cols = [_column_indices(header_map, names) for names in edge_names.values()]
+        self.node_cols = [_column_indices(header_map, names) for names in NODE_COLUMNS.values()]
+
+    def record(self, cells, raw=None):
+        """TopogramNode / TopogramEdge for a data row, or None when its named columns are all blank."""
+        n = len(cells)
+        if not any(cells[i].strip() for i in self.columns if i < n):
+            return None
+        kind = self.kind
+        if kind is None:
+            kind = 'edges' if _cell(cells, self.edge_cols[0]) or _cell(cells, self.edge_cols[1]) else 'nodes'
+        if kind == 'edges':
+            return TopogramEdge(*[_cell(cells, idxs) for idxs in self.edge_cols], raw)
+        nid, title, label, emoji, color, weight = [_cell(cells, idxs) for idxs in self.node_cols]
+        title = title or nid
+        return TopogramNode(nid, title, label or title, emoji, color, weight, raw)
+
+
+def pick_sheets(names):
+    """Sheets to import, mapped to their kind: the Nodes/Edges sheets if any, else the first sheet."""
+    lower = [n.lower() for n in names]
+    picked = {names[lower.index(kind)]: kind for kind in ('nodes', 'edges') if kind in lower}
+    if not picked and names:
+        picked[names[0]] = None
+    return picked
+
+
+ODS_TABLE_NS = 'urn:oasis:names:tc:opendocument:xmlns:table:1.0'
+ODS_OFFICE_NS = 'urn:oasis:names:tc:opendocument:xmlns:office:1.0'
+ODS_TEXT_NS = 'urn:oasis:names:tc:opendocument:xmlns:text:1.0'
+ODS_TABLE = f'{{{ODS_TABLE_NS}}}table'
+ODS_TABLE_NAME = f'{{{ODS_TABLE_NS}}}name'
+ODS_ROW = f'{{{ODS_TABLE_NS}}}table-row'
+ODS_CELLS = (f'{{{ODS_TABLE_NS}}}table-cell', f'{{{ODS_TABLE_NS}}}covered-table-cell')
+ODS_ROWS_REPEATED = f'{{{ODS_TABLE_NS}}}number-rows-repeated'
+ODS_COLUMNS_REPEATED = f'{{{ODS_TABLE_NS}}}number-columns-repeated'
+ODS_VALUE_TYPE = f'{{{ODS_OFFICE_NS}}}value-type'
+ODS_VALUE = f'{{{ODS_OFFICE_NS}}}value'
+ODS_P = f'{{{ODS_TEXT_NS}}}p'
+ODS_SPACE = f'{{{ODS_TEXT_NS}}}s'
+ODS_SPACE_COUNT = f'{{{ODS_TEXT_NS}}}c'
+ODS_TAB = f'{{{ODS_TEXT_NS}}}tab'
+ODS_LINE_BREAK = f'{{{ODS_TEXT_NS}}}line-break'
+
+
+def ods_sheet_names(path):
+    """Table names of an .ods file, in order, from a tree-less pass over content.xml."""
+    names = []
+    table_tag = f'{ODS_TABLE_NS} table'
+    name_attr = f'{ODS_TABLE_NS} name'
+
+    def start(tag, attrs):
+        if tag == table_tag:
+            names.append(attrs.get(name_attr, ''))
+
+    parser = expat.ParserCreate(namespace_separator=' ')
+    parser.StartElementHandler = start
+    with zipfile.ZipFile(path) as zf, zf.open('content.xml') as fh:
+        parser.ParseFile(fh)
+    return names
+
+
+def _ods_text(el):
+    # text of a paragraph (or span), with the whitespace elements expanded
+    parts = [el.text or '']
+    for child in el:
+        if child.tag == ODS_SPACE:
+            parts.append(' ' * int(child.get(ODS_SPACE_COUNT, 1)))
+        elif child.tag == ODS_TAB:
+            parts.append('\t')
+        elif child.tag == ODS_LINE_BREAK:
+            parts.append('\n')
+        else:
+            parts.append(_ods_text(child))
+        parts.append(child.tail or '')
+    return ''.join(parts)
+
+
+def _ods_cell_text(cell):
+    if cell.get(ODS_VALUE_TYPE) in ('float', 'percentage', 'currency'):
+        value = cell.get(ODS_VALUE)
+        if value is not None:
+            # the stored value, not the locale-formatted display text
+            number = float(value)
+            return str(int(number)) if number.is_integer() else repr(number)
+    return '\n'.join(_ods_text(p) for p in cell if p.tag == ODS_P)
+
+
+def _ods_row_cells(row):
+    cells = []
+    blanks = 0
+    for cell in row:
+        if cell.tag not in ODS_CELLS:
+            continue
+        repeat = int(cell.get(ODS_COLUMNS_REPEATED, 1))
+        text = _ods_cell_text(cell)
+        if not text:
+            # trailing blank runs are often repeated to the sheet's full width
+            blanks += repeat
+            continue
+        if blanks:
+            cells.extend([''] * blanks)
+            blanks = 0
+        cells.extend([text] * repeat)
+    return cells
+
+
+def iter_ods_rows(path, sheets):
+    """Yield (sheet name, cells) for the rows of the named sheets of an .ods file.
+
+    content.xml is parsed incrementally and each row is removed from its
+    parent (the table, or a row group / header rows inside it) once read, so
+    memory stays flat however large the sheet. Runs of blank rows come out
+    once.
+    """
+    with zipfile.ZipFile(path) as zf, zf.open('content.xml') as fh:
+        stack = []  # open elements, root first
+        name = None
+        for event, el in ElementTree.iterparse(fh, events=('start', 'end')):
+            if event == 'start':
+                stack.append(el)
+                if el.tag == ODS_TABLE:
+                    name = el.get(ODS_TABLE_NAME)
+                continue
+            stack.pop()
+            if el.tag == ODS_ROW:
+                if name in sheets:
+                    cells = _ods_row_cells(el)
+                    repeat = int(el.get(ODS_ROWS_REPEATED, 1)) if cells else 1
+                    for _ in range(repeat):
+                        yield name, cells
+                stack[-1].remove(el)
+            elif el.tag == ODS_TABLE:
+                el.clear()
+                # back to the enclosing sheet when a table was nested in a cell
+                name = next((e.get(ODS_TABLE_NAME) for e in reversed(stack) if e.tag == ODS_TABLE), None)
+
+
+XLSX_RELS_NS = 'http://schemas.openxmlformats.org/officeDocument/2006/relationships'
+
+
+def xlsx_sheet_names(path):
+    """Sheet names of an .xlsx file, in workbook order."""
+    with zipfile.ZipFile(path) as zf:
+        root = ElementTree.fromstring(zf.read('xl/workbook.xml'))
+    return [el.get('name', '') for el in root.iter() if el.tag.rpartition('}')[2] == 'sheet']
+
+
+def _sheet_text(value):
+    if value is None:
+        return ''
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value)
+
+
+def iter_xlsx_rows(path, sheets):
+    """Yield (sheet name, cells) for the rows of the named sheets of an .xlsx file.
+
+    openpyxl's read-only mode streams each worksheet's XML, so as with
+    `iter_ods_rows` only the current row is held in memory.
+    """
+    import openpyxl  # type: ignore
+    wb = openpyxl.load_workbook(path, read_only=True, data_only=True)
+    try:
+        for name in wb.sheetnames:
+            if name in sheets:
+                for row in wb[name].iter_rows(values_only=True):
+                    yield name, [_sheet_text(v) for v in row]
+    finally:
+        wb.close()
+
+
+def iter_topogram_spreadsheet(path, keep_raw=True):
+    """Yield TopogramNode / TopogramEdge records from a `.ods` or `.xlsx` topogram.
+
+    Reads the Nodes and Edges sheets when present, otherwise the first sheet
+    with nodes and edges mixed. Each sheet's header is resolved once into a
+    SheetLayout and rows are streamed through it; `raw` is the row's cells.
+    """
     ext = Path(path).suffix.lower()
-    nodes, edges = [], []
-    # Try to use openpyxl for .xlsx and pyexcel_ods3 for .ods
-    if ext == '.xlsx':
+    if ext == '.ods':
+        names, read_rows = ods_sheet_names(path), iter_ods_rows
+    elif ext == '.xlsx':
         try:
-            import openpyxl  # type: ignore
+            import openpyxl  # type: ignore  # noqa: F401
         except Exception:
             print(f"[WARN] openpyxl not installed; skipping {path} (pip install openpyxl)")
-            return nodes, edges
-        wb = openpyxl.load_workbook(path, read_only=True, data_only=True)
-        names = wb.sheetnames
-        lower = [n.lower() for n in names]
-        def sheet_to_rows(sh):
-            data = []
-            it = sh.iter_rows(values_only=True)
-            try:
-                header = next(it)
-            except StopIteration:
-                return data
-            header = [(str(c).strip() if c is not None else '') for c in header]
-            for row in it:
-                obj = {}
-                for i, h in enumerate(header):
-                    if not h:
-                        continue
-                    val = row[i] if i < len(row) else ''
-                    obj[h] = '' if val is None else val
-                if any(str(v).strip() for v in obj.values()):
-                    data.append(obj)
-            return data
-        if 'nodes' in lower or 'edges' in lower:
-            if 'nodes' in lower:
-                sh = wb[names[lower.index('nodes')]]
-                nodes = sheet_to_rows(sh)
-            if 'edges' in lower:
-                sh = wb[names[lower.index('edges')]]
-                edges = sheet_to_rows(sh)
-        elif names:
-            sh = wb[names[0]]
-            rows = sheet_to_rows(sh)
-            for r in rows:
-                keys = [k.lower() for k in r.keys()]
-                if 'source' in keys or 'target' in keys or 'from' in keys or 'to' in keys:
-                    edges.append(r)
-                else:
-                    nodes.append(r)
-        return nodes, edges
-    elif ext == '.ods':
-        try:
-            from pyexcel_ods3 import get_data  # type: ignore
-        except Exception:
-            print(f"[WARN] pyexcel-ods3 not installed; skipping {path} (pip install pyexcel-ods3)")
-            return nodes, edges
-        data = get_data(path)
-        names = list(data.keys())
-        lower = [n.lower() for n in names]
-        def rows_from_array(arr):
-            rows = []
-            if not arr:
-                return rows
-            header = [(str(c).strip() if c is not None else '') for c in (arr[0] or [])]
-            for r in arr[1:]:
-                obj = {}
-                for i, h in enumerate(header):
-                    if not h:
-                        continue
-                    val = r[i] if i < len(r) else ''
-                    obj[h] = '' if val is None else val
-                if any(str(v).strip() for v in obj.values()):
-                    rows.append(obj)
-            return rows
-        if 'nodes' in lower or 'edges' in lower:
-            if 'nodes' in lower:
-                nodes = rows_from_array(data[names[lower.index('nodes')]])
-            if 'edges' in lower:
-                edges = rows_from_array(data[names[lower.index('edges')]])
-        elif names:
-            rows = rows_from_array(data[names[0]])
-            for r in rows:
-                keys = [k.lower() for k in r.keys()]
-                if 'source' in keys or 'target' in keys or 'from' in keys or 'to' in keys:
-                    edges.append(r)
-                else:
-                    nodes.append(r)
-        return nodes, edges
+            return
+        names, read_rows = xlsx_sheet_names(path), iter_xlsx_rows
     else:
-        return nodes, edges
+        return
+    sheets = pick_sheets(names)
+    current = layout = None
+    for name, cells in read_rows(path, sheets):
+        if name != current:
+            current, layout = name, SheetLayout(cells, sheets[name])
+            continue
+        rec = layout.record(cells, cells if keep_raw else None)
+        if rec is not None:
+            yield rec
 
 
-def mongo_insert(target, js_expr, dry_run=True):
-    cmd = ['mongosh', '--quiet']
-    if target.get('url'):
-        cmd.append(target['url'])
-    else:
-        cmd.extend(['--port', str(target['port'])])
-    if dry_run:
-        if target.get('url'):
-            print('[DRY-RUN] would run mongosh with url', target['url'])
-        else:
-            print('[DRY-RUN] would run mongosh with port', target['port'])
-        return {'ok': True, 'dry': True}
+def parse_topogram_spreadsheet(path, keep_raw=True):
+    """Return (nodes, edges) lists of TopogramNode / TopogramEdge records."""
+    nodes = []
+    edges = []
+    for rec in iter_topogram_spreadsheet(path, keep_raw=keep_raw):
+        (nodes if type(rec) is TopogramNode else edges).append(rec)
+    return nodes, edges
 
-    temp_path = None
-    try:
-        fd, temp_path = tempfile.mkstemp(prefix='topogram-import-', suffix='.js')
+
+# CSV columns of the other record kind, appended to `raw` so binary rows match CSV rows
+BINARY_NODE_PAD = ('',) * len(topogram_binary.EDGE_FIELDS)
+BINARY_EDGE_PAD = ('',) * len(topogram_binary.NODE_FIELDS)
+
+
+def iter_topogram_binary(path, keep_raw=True):
+    """Yield TopogramNode / TopogramEdge records from a `.topogram.bin` file.
+
+    Columns are read straight from the memory-mapped file and each interned
+    string is decoded and stripped once, however many rows use it. Fields
+    map as for a CSV with the same header; `raw` is the equivalent CSV row.
+    """
+    with topogram_binary.TopogramFile.open(path) as tf:
+        cache = [None] * tf.string_count
+
+        def text(sid):
+            value = cache[sid]
+            if value is None:
+                value = cache[sid] = tf.string(sid).strip()
+            return value
+
+        raws = tf.rows('nodes') if keep_raw else repeat(None)
+        try:
+            cols = [tf.column('nodes', f) for f in ('id', 'name', 'label', 'emoji', 'color', 'weight')]
+            for (nid, title, label, emoji, color, weight), raw in zip(zip(*cols), raws):
+                nid = text(nid)
+                title = text(title) or nid
+                yield TopogramNode(nid, title, text(label) or title, text(emoji), text(color), text(weight),
+                                   None if raw is None else [*raw, *BINARY_NODE_PAD])
+        finally:
+            if keep_raw:
+                raws.close()
+
+        raws = tf.rows('edges') if keep_raw else repeat(None)
+        try:
+            cols = [tf.column('edges', f) for f in ('source', 'target', 'edgeLabel', 'edgeColor', 'edgeWeight',
+                                                    'relationship', 'enlightement')]
+            for (src, tgt, name, color, weight, rel, enl), raw in zip(zip(*cols), raws):
+                yield TopogramEdge(text(src), text(tgt), text(name), text(color), text(weight), text(rel), '',
+                                   text(enl), None if raw is None else [*BINARY_EDGE_PAD, *raw])
+        finally:
+            if keep_raw:
+                raws.close()
+
+
+def parse_topogram_binary(path, keep_raw=True):
+    """Return (nodes, edges) lists of TopogramNode / TopogramEdge records."""
+    nodes = []
+    edges = []
+    for rec in iter_topogram_binary(path, keep_raw=keep_raw):
+        (nodes if type(rec) is TopogramNode else edges).append(rec)
+    return nodes, edges
+
+
+def iter_topogram_file(path, keep_raw=True):
+    """Records of any supported topogram file, dispatching on its extension."""
+    if topogram_codecs.is_csv(path):
+        return iter_topogram_csv(path, keep_raw=keep_raw)
+    if path.lower().endswith('.bin'):
+        return iter_topogram_binary(path, keep_raw=keep_raw)
+    return iter_topogram_spreadsheet(path, keep_raw=keep_raw)
+
+
+# mongosh has no line reader for stdin: `nextLine()` returns the next line, or
+# null at end of input. Shared by the drivers that stream commands to mongosh.
+MONGOSH_STDIN_JS = r"""
+const fs = require('fs');
+const { StringDecoder } = require('string_decoder');
+const inbuf = Buffer.alloc(1 << 16);
+const decoder = new StringDecoder('utf8');
+let pending = '';
+let scanFrom = 0;
+
+function nextLine() {
+  for (;;) {
+    const nl = pending.indexOf('\n', scanFrom);
+    if (nl >= 0) {
+      const line = pending.slice(0, nl);
+      pending = pending.slice(nl + 1);
+      scanFrom = 0;
+      return line;
+    }
+    scanFrom = pending.length;
+    let n;
+    try {
+      n = fs.readSync(0, inbuf, 0, inbuf.length, null);
+    } catch (e) {
+      if (e.code === 'EAGAIN') {
+        // stdin is non-blocking and empty: wait a little instead of spinning
+        Atomics.wait(new Int32Array(new SharedArrayBuffer(4)), 0, 0, 5);
+        continue;
+      }
+      if (e.code === 'EOF') n = 0; else throw e;
+    }
+    if (!n) {
+      const rest = pending + decoder.end();
+      pending = '';
+      scanFrom = 0;
+      return rest.length ? rest : null;
+    }
+    pending += decoder.write(inbuf.subarray(0, n));
+  }
+}
+"""
+
+# Runs inside mongosh: reads one JSON command per line from stdin. A topogram is
+# sent as `begin`, any number of `nodes`/`edges` chunks and `end`; only `end`
+# prints a (JSON) result line, so a single process can import many topograms
+# while holding no more than one chunk in memory.
+IMPORT_DRIVER_JS = MONGOSH_STDIN_JS + r"""
+function tag(list, topId) {
+  list.forEach(d => {
+    if (!d._id) d._id = new ObjectId();
+    d.topogramId = topId;
+    d.createdAt = new Date();
+    if (!d.data) d.data = {};
+    d.data.topogramId = topId;
+  });
+  return list;
+}
+
+let current = null;
+
+function idForms(ids) {
+  // nodes/edges may reference their topogram by ObjectId or by its hex string;
+  // topograms created by the app have plain string ids
+  const forms = [];
+  ids.forEach(id => {
+    forms.push(id);
+    if (/^[0-9a-f]{24}$/i.test(id)) forms.push(new ObjectId(id));
+  });
+  return forms;
+}
+
+function contentsFilter(ids) {
+  const forms = idForms(ids);
+  return { $or: [{ topogramId: { $in: forms } }, { 'data.topogramId': { $in: forms } }] };
+}
+
+function deleteContents(ids, chunkSize) {
+  // bounded batches by _id, so no single deleteMany holds the collection for long
+  const filter = contentsFilter(ids);
+  const size = chunkSize || 1000;
+  const result = { deletedNodes: 0, deletedEdges: 0 };
+  [['nodes', 'deletedNodes'], ['edges', 'deletedEdges']].forEach(([name, key]) => {
+    const collection = db.getCollection(name);
+    for (;;) {
+      const batch = collection.find(filter, { _id: 1 }).limit(size).toArray().map(d => d._id);
+      if (!batch.length) break;
+      result[key] += collection.deleteMany({ _id: { $in: batch } }).deletedCount;
+      if (batch.length < size) break;
+    }
+  });
+  return result;
+}
+
+function begin(cmd) {
+  const topograms = db.getCollection('topograms');
+  let top = null;
+  if (cmd.replaceId) {
+    // replace in place: keep the topogram _id, drop its old nodes and edges
+    const oid = new ObjectId(cmd.replaceId);
+    deleteContents([cmd.replaceId], cmd.chunkSize);
+    top = topograms.findOne({ _id: oid });
+    if (top) {
+      top._id = oid;
+      topograms.updateOne({ _id: oid }, { $set: { title: cmd.title, folder: cmd.folder, updatedAt: new Date() } });
+    } else {
+      top = { _id: oid, title: cmd.title, source: 'imported-folder', folder: cmd.folder, createdAt: new Date() };
+      topograms.insertOne(top);
+    }
+  } else {
+    top = { title: cmd.title, source: 'imported-folder', folder: cmd.folder, createdAt: new Date() };
+    top._id = new ObjectId();
+    topograms.insertOne(top);
+  }
+  current = { top: top, nodes: 0, edges: 0, error: null };
+}
+
+function deleteTopograms(ids, chunkSize) {
+  const result = deleteContents(ids, chunkSize);
+  result.deletedTopograms = db.getCollection('topograms').deleteMany({ _id: { $in: idForms(ids) } }).deletedCount;
+  result.ok = true;
+  return result;
+}
+
+function folderTopograms(folder) {
+  const ids = db.getCollection('topograms').find({ folder: folder }, { _id: 1 }).toArray()
+    .map(t => (typeof t._id === 'string' ? t._id : t._id.valueOf()));
+  return { ok: true, ids: ids };
+}
+
+function ensureIndexes(specs) {
+  // createIndex is a no-op for an existing index with the same key; then check it is really there
+  const result = { ok: true, indexes: [] };
+  specs.forEach(spec => {
+    const collection = db.getCollection(spec.collection);
+    const name = collection.createIndex(spec.key);
+    const key = JSON.stringify(spec.key);
+    const found = collection.getIndexes().some(ix => JSON.stringify(ix.key) === key);
+    result.indexes.push({ collection: spec.collection, key: spec.key, name: name, ok: found });
+    if (!found) result.ok = false;
+  });
+  return result;
+}
+
+function insertChunk(collection, docs) {
+  if (!docs.length) return;
+  // unordered: the server applies the whole chunk even if one document fails
+  db.getCollection(collection).insertMany(tag(docs, current.top._id), { ordered: false });
+  current[collection] += docs.length;
+}
+
+function end() {
+  const top = current.top;
+  const insertedId = (top._id && typeof top._id.valueOf === 'function') ? top._id.valueOf() : top._id;
+  const result = current.error
+    ? { ok: false, error: current.error, topogramId: insertedId, nodes: current.nodes, edges: current.edges }
+    : { ok: true, topogramId: insertedId, nodes: current.nodes, edges: current.edges };
+  current = null;
+  return result;
+}
+
+for (let line = nextLine(); line !== null; line = nextLine()) {
+  if (!line.trim()) continue;
+  let cmd = {};
+  try {
+    cmd = JSON.parse(line);
+    if (cmd.op === 'begin') {
+      begin(cmd);
+    } else if (cmd.op === 'delete' || cmd.op === 'folder' || cmd.op === 'indexes') {
+      const result = cmd.op === 'delete' ? deleteTopograms(cmd.ids, cmd.chunkSize)
+        : cmd.op === 'folder' ? folderTopograms(cmd.folder) : ensureIndexes(cmd.indexes);
+      result.seq = cmd.seq;
+      print(JSON.stringify(result));
+    } else if (!current) {
+      if (cmd.op === 'end') print(JSON.stringify({ ok: false, error: 'no topogram in progress', seq: cmd.seq }));
+    } else if (cmd.op === 'nodes' || cmd.op === 'edges') {
+      if (!current.error) insertChunk(cmd.op, cmd.docs);
+    } else if (cmd.op === 'end') {
+      const result = end();
+      result.seq = cmd.seq;
+      print(JSON.stringify(result));
+    }
+  } catch (e) {
+    const error = String(e && e.message || e);
+    if (current && cmd.op !== 'end') {
+      // keep consuming this topogram's chunks; the error is reported at `end`
+      current.error = current.error || error;
+    } else {
+      current = null;
+      print(JSON.stringify({ ok: false, error: error, seq: cmd.seq }));
+    }
+  }
+}
+"""
+
+
+DEFAULT_CHUNK_SIZE = 1000
+# upper bound for one chunk line, well below MongoDB's 48MB insert batch limit
+CHUNK_MAX_BYTES = 4 * 1024 * 1024
+
+
+def iter_chunk_lines(docs, chunk_size=DEFAULT_CHUNK_SIZE, max_bytes=CHUNK_MAX_BYTES):
+    """Turn (op, doc) pairs into `{"op": op, "docs": [...]}` JSON lines.
+
+    `op` is 'nodes' or 'edges'; each op has its own buffer of at most
+    `chunk_size` docs / ~`max_bytes`, and documents are encoded one at a time,
+    so only the current chunks are held in memory however many docs there are.
+    """
+    buffers = {}
+
+    def flush(op):
+        encoded, _ = buffers.pop(op)
+        return '{"op": %s, "docs": [%s]}\n' % (json.dumps(op), ', '.join(encoded))
+
+    for op, doc in docs:
+        text = json.dumps(doc)
+        buf = buffers.get(op)
+        if buf is None:
+            buf = buffers[op] = ([], [0])
+        elif len(buf[0]) >= chunk_size or buf[1][0] + len(text) > max_bytes:
+            yield flush(op)
+            buf = buffers[op] = ([], [0])
+        buf[0].append(text)
+        buf[1][0] += len(text) + 2
+    for op in list(buffers):
+        yield flush(op)
+
+
+# The lookups behind replacing and cleaning topograms: nodes and edges by either
+# form of their topogram reference, topograms by folder.
+IMPORT_INDEXES = (
+    {'collection': 'nodes', 'key': {'topogramId': 1}},
+    {'collection': 'nodes', 'key': {'data.topogramId': 1}},
+    {'collection': 'edges', 'key': {'topogramId': 1}},
+    {'collection': 'edges', 'key': {'data.topogramId': 1}},
+    {'collection': 'topograms', 'key': {'folder': 1}},
+)
+
+
+class MongoSession:
+    """A long-running mongosh process that imports topograms sent as JSON lines.
+
+    Each `import_topogram` call streams one topogram to the driver's stdin in
+    chunks and waits for its result line, so results are still reported per
+    file. If mongosh exits the pending call fails and the next call starts a
+    new process.
+    """
+
+    def __init__(self, target, chunk_size=DEFAULT_CHUNK_SIZE):
+        self.target = target
+        self.chunk_size = chunk_size
+        self.proc = None
+        self.script_path = None
+        self.seq = 0
+        self.imported = 0
+
+    def start(self):
+        fd, self.script_path = tempfile.mkstemp(prefix='topogram-import-', suffix='.js')
         with os.fdopen(fd, 'w', encoding='utf-8') as handle:
-            handle.write(js_expr)
-        cmd.extend(['--file', temp_path])
-        if target.get('url'):
-            print('Running mongosh', target['url'])
+            handle.write(IMPORT_DRIVER_JS)
+        cmd = ['mongosh', '--quiet']
+        if self.target.get('url'):
+            cmd.append(self.target['url'])
+            print(f"Starting mongosh session {self.target['url']}")
         else:
-            print('Running mongosh --port', target['port'])
-        res = subprocess.run(cmd, check=False, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
-    finally:
-        if temp_path and os.path.exists(temp_path):
+            cmd.extend(['--port', str(self.target['port'])])
+            print(f"Starting mongosh session --port {self.target['port']}")
+        cmd.extend(['--file', self.script_path])
+        # stderr is inherited so mongosh warnings can never fill an unread pipe
+        self.proc = subprocess.Popen(cmd, stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                                     text=True, encoding='utf-8', bufsize=1)
+        self.imported = 0
+
+    def import_topogram(self, title, folder, node_docs, edge_docs, replace_id=None):
+        """Import one topogram; `node_docs`/`edge_docs` may be any iterables (e.g. generators).
+
+        With `replace_id` the existing topogram keeps its _id and its nodes and
+        edges are replaced.
+        """
+        docs = chain((('nodes', d) for d in node_docs), (('edges', d) for d in edge_docs))
+        return self.import_docs(title, folder, docs, replace_id=replace_id)
+
+    def import_docs(self, title, folder, docs, replace_id=None):
+        """Import one topogram from ('nodes' | 'edges', doc) pairs in any order."""
+        return self.import_chunk_lines(title, folder, iter_chunk_lines(docs, self.chunk_size), replace_id=replace_id)
+
+    def import_chunk_lines(self, title, folder, lines, replace_id=None):
+        """Import one topogram from `iter_chunk_lines` output (e.g. read back from a spool file)."""
+        def send(write, seq):
+            begin = {'op': 'begin', 'title': title, 'folder': folder}
+            if replace_id:
+                begin['replaceId'] = replace_id
+                begin['chunkSize'] = self.chunk_size
+            write(json.dumps(begin) + '\n')
+            for line in lines:
+                write(line)
+            write(json.dumps({'op': 'end', 'seq': seq}) + '\n')
+
+        res = self._request(send)
+        if res.get('ok'):
+            self.imported += 1
+        return res
+
+    def delete_topograms(self, ids):
+        """Delete topograms (by _id string) and their nodes and edges, `chunk_size` documents per deleteMany."""
+        return self._command({'op': 'delete', 'ids': list(ids), 'chunkSize': self.chunk_size})
+
+    def folder_topograms(self, folder):
+        """`{'ok': True, 'ids': [...]}` with the _id strings of the folder's topograms."""
+        return self._command({'op': 'folder', 'folder': folder})
+
+    def ensure_indexes(self, indexes=IMPORT_INDEXES):
+        """Create the given indexes if missing and report, per index, whether it now exists."""
+        return self._command({'op': 'indexes', 'indexes': list(indexes)})
+
+    def _command(self, cmd):
+        return self._request(lambda write, seq: write(json.dumps(dict(cmd, seq=seq)) + '\n'))
+
+    def _request(self, send):
+        if self.proc is None:
+            self.start()
+        self.seq += 1
+        try:
+            try:
+                send(self.proc.stdin.write, self.seq)
+            except (BrokenPipeError, OSError):
+                raise
+            except Exception as exc:
+                # e.g. a parse error while streaming: drop the half-sent topogram with the process
+                self.close()
+                return {'ok': False, 'error': f'{type(exc).__name__}: {exc}'}
+            self.proc.stdin.flush()
+            # skip anything mongosh prints that is not a result line (e.g. warnings on stdout)
+            for line in self.proc.stdout:
+                line = line.strip()
+                if line.startswith('{'):
+                    try:
+                        res = json.loads(line)
+                    except ValueError:
+                        continue
+                    if res.get('seq') == self.seq:
+                        res.pop('seq')
+                        return res
+        except (BrokenPipeError, OSError) as exc:
+            self.close()
+            return {'ok': False, 'error': f'mongosh session failed: {exc}'}
+        code = self.close()
+        return {'ok': False, 'error': f'mongosh exited with status {code}'}
+
+    def close(self):
+        code = None
+        if self.proc is not None:
             try:
-                os.remove(temp_path)
+                self.proc.stdin.close()
+            except OSError:
+                pass
+            code = self.proc.wait()
+            self.proc.stdout.close()
+            self.proc = None
+        if self.script_path and os.path.exists(self.script_path):
+            try:
+                os.remove(self.script_path)
             except Exception:
                 pass
+        self.script_path = None
+        return code
 
-    if res.returncode != 0:
-        print('mongosh error:', res.stderr.strip())
-        return {'ok': False, 'error': res.stderr.strip(), 'stdout': res.stdout}
-    out = res.stdout.strip()
-    try:
-        return json.loads(out)
-    except Exception:
-        return {'ok': True, 'raw': out}
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
 
 
 def derive_folder_label(dir_path: str) -> str:
@@ -299,108 +879,242 @@ def derive_folder_label(dir_path: str) -> str:
     return ' '.join(word.capitalize() for word in words)
 
 
-def clean_folder(folder_label, mongo_target, dry_run=True):
-    folder_json = json.dumps(folder_label)
-    js = f"""
-(function(){{
-  const folderName = {folder_json};
-  const tops = db.getCollection('topograms').find({{ folder: folderName }}).toArray();
-  if (!tops.length) {{
-    print(JSON.stringify({{ ok: true, folder: folderName, deletedTopograms: 0, deletedNodes: 0, deletedEdges: 0 }}));
-    return;
-  }}
-  const objIds = tops.map(t => t._id).filter(id => id instanceof ObjectId);
-  const strIds = tops.map(t => {{
-    const id = t._id;
-    if (!id) return null;
-    if (typeof id === 'string') return id;
-    if (id instanceof ObjectId) return id.valueOf();
-    if (typeof id._str === 'string') return id._str;
-    if (typeof id.$oid === 'string') return id.$oid;
-    try {{ return String(id); }} catch (e) {{ return null; }}
-  }}).filter(Boolean);
-
-  const clauses = [];
-  if (objIds.length) {{
-    clauses.push({{ topogramId: {{ $in: objIds }} }});
-    clauses.push({{ 'data.topogramId': {{ $in: objIds }} }});
-  }}
-  if (strIds.length) {{
-    clauses.push({{ topogramId: {{ $in: strIds }} }});
-    clauses.push({{ 'data.topogramId': {{ $in: strIds }} }});
-  }}
-
-  let nodesDeleted = 0;
-  let edgesDeleted = 0;
-  if (clauses.length) {{
-    nodesDeleted = db.getCollection('nodes').deleteMany({{ $or: clauses }}).deletedCount;
-    edgesDeleted = db.getCollection('edges').deleteMany({{ $or: clauses }}).deletedCount;
-  }}
-  const topsDeleted = db.getCollection('topograms').deleteMany({{ folder: folderName }}).deletedCount;
-  print(JSON.stringify({{ ok: true, folder: folderName, deletedTopograms: topsDeleted, deletedNodes: nodesDeleted, deletedEdges: edgesDeleted }}));
-}})();
-"""
-    return mongo_insert(mongo_target, js, dry_run=dry_run)
+def clean_folder(folder_label, mongo_target, dry_run=True, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Delete the folder's topograms one at a time, their nodes and edges in chunks of `chunk_size`.
+
+    Prints progress at most once a second; returns the totals.
+    """
+    if dry_run:
+        print(f'[DRY-RUN] would delete the topograms of folder "{folder_label}"')
+        return {'ok': True, 'dry': True}
+    totals = {'ok': True, 'folder': folder_label, 'deletedTopograms': 0, 'deletedNodes': 0, 'deletedEdges': 0}
+    with MongoSession(mongo_target, chunk_size=chunk_size) as session:
+        res = session.folder_topograms(folder_label)
+        if not res.get('ok'):
+            return res
+        ids = res['ids']
+        started = last = time.perf_counter()
+        for i, topogram_id in enumerate(ids, 1):
+            res = session.delete_topograms([topogram_id])
+            if not res.get('ok'):
+                totals.update(ok=False, error=res.get('error'), topogramId=topogram_id)
+                break
+            for key in ('deletedTopograms', 'deletedNodes', 'deletedEdges'):
+                totals[key] += res.get(key, 0)
+            now = time.perf_counter()
+            if now - last >= 1 or i == len(ids):
+                last = now
+                docs = totals['deletedNodes'] + totals['deletedEdges']
+                print(f'  cleaned {i}/{len(ids)} topograms: nodes={totals["deletedNodes"]} '
+                      f'edges={totals["deletedEdges"]} ({docs / max(now - started, 1e-9):.0f} docs/s)')
+    return totals
 
 
-def build_and_insert(topogram_name, nodes, edges, mongo_target, folder_label, dry_run=True):
-    title = os.path.basename(topogram_name)
-    safe_title = json.dumps(title)
-    folder_json = json.dumps(folder_label)
-    node_payload = []
-    for n in nodes:
-        node_data = {'id': n['id'], 'title': n['title'], 'label': n['label']}
-        for key in ('emoji', 'color', 'weight'):
-            if key in n and n[key] not in (None, ''):
-                node_data[key] = n[key]
-        if 'raw' in n:
-            node_data['raw'] = n['raw']
-        node_payload.append({'data': node_data})
-    edge_payload = []
-    for e in edges:
-        edge_data = {'source': e['source'], 'target': e['target']}
-        for key in ('name', 'label', 'color', 'weight', 'relationship', 'relationshipEmoji', 'enlightement'):
-            if key in e and e[key] not in (None, ''):
-                edge_data[key] = e[key]
-        if 'label' not in edge_data and 'name' in edge_data and edge_data['name']:
-            edge_data['label'] = edge_data['name']
-        if 'relationship' in edge_data and edge_data['relationship'] and 'label' not in edge_data:
-            edge_data['label'] = edge_data['relationship']
-        if 'enlightement' not in edge_data or not edge_data['enlightement']:
+def node_doc(n):
+    if type(n) is TopogramNode:
+        node_data = {'id': n.id, 'title': n.title, 'label': n.label}
+        if n.emoji:
+            node_data['emoji'] = n.emoji
+        if n.color:
+            node_data['color'] = n.color
+        if n.weight:
+            node_data['weight'] = n.weight
+        if n.raw is not None:
+            node_data['raw'] = n.raw
+        return {'data': node_data}
+    node_data = {'id': n['id'], 'title': n['title'], 'label': n['label']}
+    for key in ('emoji', 'color', 'weight'):
+        if key in n and n[key] not in (None, ''):
+            node_data[key] = n[key]
+    if 'raw' in n:
+        node_data['raw'] = n['raw']
+    return {'data': node_data}
+
+
+def edge_doc(e):
+    if type(e) is TopogramEdge:
+        edge_data = {'source': e.source, 'target': e.target}
+        for key, value in zip(('name', 'color', 'weight', 'relationship', 'relationshipEmoji', 'enlightement'), e[2:8]):
+            if value:
+                edge_data[key] = value
+        label = e.name or e.relationship
+        if label:
+            edge_data['label'] = label
+        if not e.enlightement:
             edge_data['enlightement'] = 'arrow'
-        if 'raw' in e:
-            edge_data['raw'] = e['raw']
-        edge_payload.append({'data': edge_data})
-    nodes_js = json.dumps(node_payload)
-    edges_js = json.dumps(edge_payload)
-    js = f"""
-(function(){{
-  const top = {{ title: {safe_title}, source: 'imported-folder', folder: {folder_json}, createdAt: new Date() }};
-  top._id = new ObjectId();
-  db.getCollection('topograms').insertOne(top);
-  const nodelist = {nodes_js};
-  nodelist.forEach(n => {{
-    if (!n._id) n._id = new ObjectId();
-    n.topogramId = top._id;
-    n.createdAt = new Date();
-    if (!n.data) n.data = {{}};
-    n.data.topogramId = top._id;
-  }});
-  if (nodelist.length) db.getCollection('nodes').insertMany(nodelist);
-  const edgelist = {edges_js};
-  edgelist.forEach(e => {{
-    if (!e._id) e._id = new ObjectId();
-    e.topogramId = top._id;
-    e.createdAt = new Date();
-    if (!e.data) e.data = {{}};
-    e.data.topogramId = top._id;
-  }});
-  if (edgelist.length) db.getCollection('edges').insertMany(edgelist);
-    const insertedId = (top._id && typeof top._id.valueOf === 'function') ? top._id.valueOf() : top._id;
-    return JSON.stringify({{ ok: true, topogramId: insertedId, nodes: nodelist.length, edges: edgelist.length }});
-}})();
-"""
-    return mongo_insert(mongo_target, js, dry_run=dry_run)
+        if e.raw is not None:
+            edge_data['raw'] = e.raw
+        return {'data': edge_data}
+    edge_data = {'source': e['source'], 'target': e['target']}
+    for key in ('name', 'label', 'color', 'weight', 'relationship', 'relationshipEmoji', 'enlightement'):
+        if key in e and e[key] not in (None, ''):
+            edge_data[key] = e[key]
+    if 'label' not in edge_data and 'name' in edge_data and edge_data['name']:
+        edge_data['label'] = edge_data['name']
+    if 'relationship' in edge_data and edge_data['relationship'] and 'label' not in edge_data:
+        edge_data['label'] = edge_data['relationship']
+    if 'enlightement' not in edge_data or not edge_data['enlightement']:
+        edge_data['enlightement'] = 'arrow'
+    if 'raw' in e:
+        edge_data['raw'] = e['raw']
+    return {'data': edge_data}
+
+
+def build_and_insert(topogram_name, nodes, edges, mongo_target, folder_label, dry_run=True, session=None,
+                     chunk_size=DEFAULT_CHUNK_SIZE, replace_id=None):
+    """Insert one topogram, through `session` if given or a one-off mongosh session otherwise.
+
+    Node and edge documents are built lazily and sent in chunks of
+    `chunk_size`, so no full payload is ever materialized. `replace_id`
+    replaces an existing topogram in place instead of creating a new one.
+    """
+    if dry_run:
+        print('[DRY-RUN] would run mongosh with', f"url {mongo_target['url']}" if mongo_target.get('url')
+              else f"port {mongo_target['port']}")
+        return {'ok': True, 'dry': True}
+    title = os.path.basename(topogram_name)
+    node_docs = (node_doc(n) for n in nodes)
+    edge_docs = (edge_doc(e) for e in edges)
+    if session is not None:
+        return session.import_topogram(title, folder_label, node_docs, edge_docs, replace_id=replace_id)
+    with MongoSession(mongo_target, chunk_size=chunk_size) as one_off:
+        return one_off.import_topogram(title, folder_label, node_docs, edge_docs, replace_id=replace_id)
+
+
+def stream_and_insert(path, session, folder_label, keep_raw=True, replace_id=None):
+    """Import a large topogram file holding only the current chunks in memory.
+
+    The file is parsed into a temporary spool of chunk lines before the
+    topogram is begun, so a parse error fails the file without touching the
+    database (and a replaced topogram keeps its old contents); the spool is
+    then streamed to mongosh.
+    """
+    docs = (('nodes', node_doc(rec)) if type(rec) is TopogramNode else ('edges', edge_doc(rec))
+            for rec in iter_topogram_file(path, keep_raw=keep_raw))
+    with tempfile.TemporaryFile('w+', encoding='utf-8', prefix='topogram-spool-') as spool:
+        spool.writelines(iter_chunk_lines(docs, session.chunk_size))
+        spool.seek(0)
+        return session.import_chunk_lines(os.path.basename(path), folder_label, spool, replace_id=replace_id)
+
+
+MANIFEST_VERSION = 1
+
+
+def default_manifest_path(dir_path, folder_label, connection_desc):
+    """Per (folder, label, database) manifest location under the user cache directory."""
+    base = os.environ.get('TOPOGRAM_CACHE_DIR')
+    if base:
+        root = Path(base)
+    else:
+        root = Path(os.environ.get('XDG_CACHE_HOME') or Path.home() / '.cache') / 'topogram'
+    key = '\0'.join([str(Path(dir_path).resolve()), folder_label, connection_desc])
+    digest = hashlib.sha1(key.encode('utf-8')).hexdigest()[:16]
+    return root / 'import-manifests' / f'{digest}.json'
+
+
+def file_sha256(path):
+    h = hashlib.sha256()
+    with open(path, 'rb') as fh:
+        for block in iter(lambda: fh.read(1 << 20), b''):
+            h.update(block)
+    return h.hexdigest()
+
+
+def load_manifest(path, folder_label, connection_desc, options=None):
+    """Return the manifest's `files` mapping (relative path -> entry), or {} if unusable.
+
+    If the import `options` changed since the manifest was written, every
+    entry is marked stale so its topogram gets replaced.
+    """
+    try:
+        data = json.loads(Path(path).read_text())
+    except FileNotFoundError:
+        return {}
+    except (OSError, ValueError) as exc:
+        print(f'[WARN] ignoring unreadable manifest {path}: {exc}')
+        return {}
+    if data.get('version') != MANIFEST_VERSION or data.get('folder') != folder_label or data.get('target') != connection_desc:
+        print(f'[WARN] manifest {path} belongs to another folder/database; ignoring it')
+        return {}
+    files = data.get('files') or {}
+    if (data.get('options') or {}) != (options or {}):
+        print('Import options changed since the last run; all files will be re-imported')
+        for entry in files.values():
+            entry['sha256'] = None
+    return files
+
+
+def save_manifest(path, files, folder_label, connection_desc, options=None):
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    data = {'version': MANIFEST_VERSION, 'folder': folder_label, 'target': connection_desc,
+            'options': options or {}, 'files': dict(sorted(files.items()))}
+    tmp = path.with_name(path.name + f'.tmp{os.getpid()}')
+    tmp.write_text(json.dumps(data, indent=1) + '\n')
+    os.replace(tmp, path)
+
+
+def parse_file(fp, keep_raw=True):
+    """Parse one topogram file (runs in the parse pool).
+
+    Returns (fp, nodes, edges, seconds, error).
+    """
+    t0 = time.perf_counter()
+    try:
+        if topogram_codecs.is_csv(fp):
+            nodes, edges = parse_topogram_csv(fp, keep_raw=keep_raw)
+        elif fp.lower().endswith('.bin'):
+            nodes, edges = parse_topogram_binary(fp, keep_raw=keep_raw)
+        else:
+            nodes, edges = parse_topogram_spreadsheet(fp, keep_raw=keep_raw)
+        return fp, nodes, edges, time.perf_counter() - t0, None
+    except Exception as exc:
+        return fp, [], [], time.perf_counter() - t0, f'{type(exc).__name__}: {exc}'
+
+
+def iter_parsed(files, jobs, max_pending, keep_raw=True):
+    """Yield `parse_file` results in file order, across `jobs` processes when jobs > 1.
+
+    At most `max_pending` files are submitted ahead of the consumer, so a slow
+    consumer (a full write queue) stalls parsing instead of buffering results.
+    """
+    if jobs <= 1:
+        for fp in files:
+            yield parse_file(fp, keep_raw)
+        return
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        remaining = iter(files)
+        pending = deque(pool.submit(parse_file, fp, keep_raw) for fp in islice(remaining, max(max_pending, jobs)))
+        while pending:
+            result = pending.popleft().result()
+            nxt = next(remaining, None)
+            if nxt is not None:
+                pending.append(pool.submit(parse_file, nxt, keep_raw))
+            yield result
+
+
+class StageStats:
+    """Thread-safe file/document counters and busy time for one pipeline stage."""
+
+    def __init__(self, name, workers):
+        self.name = name
+        self.workers = workers
+        self.files = 0
+        self.docs = 0
+        self.busy = 0.0
+        self._lock = threading.Lock()
+
+    def add(self, docs, seconds):
+        with self._lock:
+            self.files += 1
+            self.docs += docs
+            self.busy += seconds
+
+    def report(self, wall):
+        rate = self.docs / wall if wall > 0 else 0.0
+        per_worker = self.docs / self.busy if self.busy > 0 else 0.0
+        return (f'{self.name}: files={self.files} docs={self.docs} workers={self.workers} '
+                f'busy={self.busy:.2f}s throughput={rate:.0f} docs/s (per busy worker {per_worker:.0f} docs/s)')
 
 
 def main():
@@ -412,6 +1126,25 @@ def main():
     p.add_argument('--limit', type=int, default=None, help='Process only the first N CSV files (testing helper)')
     p.add_argument('--folder', default=None, help='Folder label to assign to imported topograms (defaults to directory name)')
     p.add_argument('--clean-folder', action='store_true', help='Remove existing documents for the folder before import (requires --commit)')
+    p.add_argument('--ensure-indexes', action='store_true',
+                   help='Create and verify the indexes used to replace and clean topograms (requires --commit)')
+    p.add_argument('--batch-size', type=int, default=0,
+                   help='Topograms imported per mongosh process before it is restarted (0 = one process for the whole run)')
+    p.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE,
+                   help=f'Nodes/edges per unordered insertMany or per deleteMany when replacing and cleaning '
+                        f'(default: {DEFAULT_CHUNK_SIZE})')
+    p.add_argument('--parse-jobs', type=int, default=1, help='Parser processes (0 = one per CPU; default: 1)')
+    p.add_argument('--write-jobs', type=int, default=1, help='Writer threads, each with its own mongosh session (default: 1)')
+    p.add_argument('--queue-size', type=int, default=8,
+                   help='Parsed topograms buffered between the parse and write stages (default: 8)')
+    p.add_argument('--manifest', default=None,
+                   help='Import manifest path (default: per folder/database file under ~/.cache/topogram/import-manifests)')
+    p.add_argument('--no-manifest', action='store_true', help='Import every file as a new topogram and keep no manifest')
+    p.add_argument('--force', action='store_true', help='Re-import files even if their content hash is unchanged')
+    p.add_argument('--no-raw', action='store_true', help='Do not store the original CSV row as data.raw on nodes and edges')
+    p.add_argument('--stream-threshold-mb', type=float, default=64,
+                   help='Files at least this large are parsed by a writer into a temporary spool file and then '
+                        'inserted, instead of in the parse pool (constant memory; default: 64)')
     args = p.parse_args()
 
     if args.mongo_url and args.port:
@@ -427,6 +1160,7 @@ def main():
     if not files:
         print('No .topogram.csv files found in', args.dir)
         return
+    all_files = files
 
     if args.limit is not None and args.limit >= 0:
         original_count = len(files)
@@ -439,29 +1173,165 @@ def main():
     connection_desc = mongo_target.get('url') or f"port {mongo_target['port']}"
     print(f'Found {len(files)} files in {args.dir}; mongo={connection_desc}; commit={args.commit}')
 
+    if args.ensure_indexes:
+        if not args.commit:
+            print('Skipping --ensure-indexes because --commit was not provided (dry-run).')
+        else:
+            with MongoSession(mongo_target) as session:
+                index_res = session.ensure_indexes()
+            for index in index_res.get('indexes', []):
+                status = 'ok' if index['ok'] else 'MISSING'
+                print(f"  index {index['collection']} {json.dumps(index['key'])}: {status}")
+            if not index_res.get('ok'):
+                raise SystemExit(f"Index verification failed: {index_res.get('error') or 'missing indexes'}")
+
     if args.clean_folder:
         if not args.commit:
             print('Skipping --clean-folder because --commit was not provided (dry-run).')
         else:
             print(f'Cleaning existing documents for folder "{folder_label}" before import...')
-            clean_res = clean_folder(folder_label, mongo_target, dry_run=False)
+            clean_res = clean_folder(folder_label, mongo_target, dry_run=False, chunk_size=args.chunk_size)
             print('  cleanup result:', clean_res)
 
-    total_nodes = 0
-    total_edges = 0
-    for fp in files:
-        print('Parsing', fp)
-        if fp.lower().endswith('.csv'):
-            nodes, edges = parse_topogram_csv(fp)
+    # Manifest: relative path -> {sha256, topogramId, nodes, edges} of the last import.
+    manifest_path = None if args.no_manifest else (args.manifest or default_manifest_path(args.dir, folder_label, connection_desc))
+    keep_raw = not args.no_raw
+    options = {'raw': keep_raw}
+    entries = load_manifest(manifest_path, folder_label, connection_desc, options) if manifest_path else {}
+    if args.clean_folder and args.commit:
+        entries = {}
+    if entries and args.commit:
+        # the database may have been reset or restored, or topograms deleted in the UI since the last run
+        with MongoSession(mongo_target) as session:
+            res = session.folder_topograms(folder_label)
+        if res.get('ok'):
+            existing = set(res['ids'])
+            missing = [rel for rel, entry in entries.items() if entry.get('topogramId') not in existing]
+            if missing:
+                print(f'{len(missing)} manifest entries point to topograms missing from the database; '
+                      f're-importing those files')
+                for rel in missing:
+                    del entries[rel]
         else:
-            nodes, edges = parse_topogram_spreadsheet(fp)
-        print(f'  parsed nodes={len(nodes)}, edges={len(edges)}')
-        total_nodes += len(nodes)
-        total_edges += len(edges)
-        if args.commit:
-            res = build_and_insert(fp, nodes, edges, mongo_target, folder_label, dry_run=False)
-            print('  insert result:', res)
-    print('Summary: files=', len(files), 'nodes=', total_nodes, 'edges=', total_edges)
+            print(f"[WARN] could not list the folder's topograms, trusting the manifest: {res.get('error')}")
+    root = Path(args.dir)
+    relpaths = {fp: Path(fp).relative_to(root).as_posix() for fp in all_files}
+    plan = {}
+    unchanged = 0
+    for fp in files:
+        digest = file_sha256(fp) if manifest_path else None
+        entry = entries.get(relpaths[fp]) or {}
+        if not args.force and digest and entry.get('sha256') == digest and entry.get('topogramId'):
+            unchanged += 1
+            continue
+        plan[fp] = (digest, entry.get('topogramId'))
+    present = set(relpaths.values())
+    removed = {rel: entry for rel, entry in entries.items() if rel not in present}
+    if manifest_path:
+        replaced = sum(1 for _, old_id in plan.values() if old_id)
+        print(f'Manifest {manifest_path}: {unchanged} unchanged, {len(plan) - replaced} new, '
+              f'{replaced} changed, {len(removed)} removed')
+    files = [fp for fp in files if fp in plan]
+
+    if removed and args.commit:
+        ids = [entry['topogramId'] for entry in removed.values() if entry.get('topogramId')]
+        with MongoSession(mongo_target, chunk_size=args.chunk_size) as session:
+            res = session.delete_topograms(ids) if ids else {'ok': True}
+        print(f'Deleted documents of {len(removed)} removed files:', res)
+        if res.get('ok'):
+            for rel in removed:
+                entries.pop(rel, None)
+
+    parse_jobs = args.parse_jobs if args.parse_jobs > 0 else (os.cpu_count() or 1)
+    write_jobs = max(1, args.write_jobs) if args.commit else 0
+    parse_stats = StageStats('parse', parse_jobs)
+    write_stats = StageStats('write', write_jobs)
+    totals = {'nodes': 0, 'edges': 0, 'failed': 0}
+    lock = threading.Lock()
+    work = queue.Queue(maxsize=max(1, args.queue_size))
+
+    def writer():
+        session = MongoSession(mongo_target, chunk_size=args.chunk_size)
+        try:
+            while True:
+                item = work.get()
+                if item is None:
+                    return
+                fp, nodes, edges = item
+                digest, replace_id = plan[fp]
+                t0 = time.perf_counter()
+                try:
+                    if args.batch_size > 0 and session.imported >= args.batch_size:
+                        session.close()
+                    if nodes is None:
+                        res = stream_and_insert(fp, session, folder_label, keep_raw=keep_raw, replace_id=replace_id)
+                    else:
+                        res = build_and_insert(fp, nodes, edges, mongo_target, folder_label, dry_run=False,
+                                               session=session, replace_id=replace_id)
+                except Exception as exc:
+                    res = {'ok': False, 'error': f'{type(exc).__name__}: {exc}'}
+                if nodes is None:
+                    write_stats.add((res.get('nodes') or 0) + (res.get('edges') or 0), time.perf_counter() - t0)
+                else:
+                    write_stats.add(len(nodes) + len(edges), time.perf_counter() - t0)
+                with lock:
+                    if nodes is None:
+                        totals['nodes'] += res.get('nodes') or 0
+                        totals['edges'] += res.get('edges') or 0
+                    topogram_id = res.get('topogramId') or replace_id
+                    if res.get('ok'):
+                        entries[relpaths[fp]] = {'sha256': digest, 'topogramId': topogram_id,
+                                                 'nodes': res.get('nodes'), 'edges': res.get('edges')}
+                    else:
+                        totals['failed'] += 1
+                        if topogram_id:
+                            # keep the id so the next run replaces the partial import
+                            entries[relpaths[fp]] = {'sha256': None, 'topogramId': topogram_id}
+                    print(f'  insert result for {fp}:', res)
+        finally:
+            session.close()
+
+    started = time.perf_counter()
+    writers = [threading.Thread(target=writer, name=f'writer-{i}', daemon=True) for i in range(write_jobs)]
+    for t in writers:
+        t.start()
+    # big files skip the parse pool: a writer parses them while inserting (writes only)
+    threshold = args.stream_threshold_mb * 1024 * 1024
+    streamed = [fp for fp in files if writers and os.path.getsize(fp) >= threshold]
+    streamed_set = frozenset(streamed)
+    pooled = [fp for fp in files if fp not in streamed_set]
+    try:
+        for fp, nodes, edges, seconds, error in iter_parsed(pooled, parse_jobs, max_pending=2 * parse_jobs, keep_raw=keep_raw):
+            parse_stats.add(len(nodes) + len(edges), seconds)
+            with lock:
+                if error:
+                    totals['failed'] += 1
+                    print(f'Parsing {fp} failed: {error}')
+                    continue
+                print(f'Parsed {fp}: nodes={len(nodes)}, edges={len(edges)}')
+                totals['nodes'] += len(nodes)
+                totals['edges'] += len(edges)
+            if writers:
+                # blocks while the writers are behind (backpressure on parsing)
+                work.put((fp, nodes, edges))
+        for fp in streamed:
+            print(f'Streaming {fp} ({os.path.getsize(fp) / 1048576:.0f} MB)')
+            work.put((fp, None, None))
+    finally:
+        for _ in writers:
+            work.put(None)
+        for t in writers:
+            t.join()
+        if manifest_path and args.commit:
+            save_manifest(manifest_path, entries, folder_label, connection_desc, options)
+    wall = time.perf_counter() - started
+    print('Summary: files=', len(files), 'nodes=', totals['nodes'], 'edges=', totals['edges'],
+          'failed=', totals['failed'], 'unchanged=', unchanged, 'removed=', len(removed), f'elapsed={wall:.2f}s')
+    print('  ' + parse_stats.report(wall))
+    if writers:
+        print('  ' + write_stats.report(wall))
+    if totals['failed']:
+        sys.exit(1)
 
 
 if __name__ == '__main__':
@@ -0,0 +1,485 @@
+#!/usr/bin/env python3
+"""
+Restore archives written by export_meteor_mongo_py.py into a MongoDB database.
+
+Usage:
+  python3 scripts/restore_meteor_mongo_py.py exports/meteor_mongo_export_*.tar.gz --port 27017 --drop --commit
+  python3 scripts/restore_meteor_mongo_py.py BASE.tar.gz DELTA1.tar.gz DELTA2.tar.gz --commit
+  python3 scripts/restore_meteor_mongo_py.py ARCHIVE --topogram 65f0c1... --commit
+
+Archives are read straight from the tarball, never extracted to disk, and
+every collection is restored by its own worker (`--jobs` at once) that sends
+unordered `insertMany` chunks to its own mongosh process. A compressed
+archive is streamed once by a reader thread, which decompresses each
+collection file and hands its lines to that collection's worker through a
+bounded queue; in an uncompressed `.tar` each worker seeks to its own file.
+Several archives are
+applied in the given order (a base, then its deltas); documents of delta
+archives are upserted by _id. By default the script runs in dry-run mode and only
+counts the documents it would write.
+
+With --topogram only the given topograms, their nodes and their edges are
+restored. Sharded archives (`--layout sharded`) are read through their offset
+index, so only those topograms' bytes are decompressed; other archives are
+scanned and filtered.
+
+Requires: mongosh present in PATH for --commit.
+"""
+import argparse
+import bz2
+import gzip
+import json
+import lzma
+import os
+import queue
+import subprocess
+import sys
+import tarfile
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import export_meteor_mongo_py as exporter
+from import_topograms_folder import CHUNK_MAX_BYTES, DEFAULT_CHUNK_SIZE, MONGOSH_STDIN_JS
+
+# collection file suffix -> streaming decompressor over a file object
+DECOMPRESSORS = {
+    '.gz': lambda fh: gzip.GzipFile(fileobj=fh, mode='rb'),
+    '.bz2': lambda fh: bz2.BZ2File(fh, mode='rb'),
+    '.xz': lambda fh: lzma.LZMAFile(fh, mode='rb'),
+    '': lambda fh: fh,
+}
+# restored with --topogram, and the field that ties their documents to a topogram
+TOPOGRAM_COLLECTIONS = {'topograms': '_id', 'nodes': 'topogramId', 'edges': 'topogramId'}
+PROGRESS_SECONDS = 5
+# lines per batch handed from the archive reader to a worker, and batches queued per worker
+FEED_BATCH_LINES = 1000
+FEED_QUEUE_BATCHES = 16
+
+# Runs inside mongosh. A collection is sent as `begin`, any number of `docs`
+# chunks and `end`, which prints the result line. Lines are parsed as Extended
+# JSON so ObjectIds and dates come back with their types.
+RESTORE_DRIVER_JS = MONGOSH_STDIN_JS + r"""
+let current = null;
+
+function writeChunk(docs) {
+  const c = current;
+  try {
+    if (c.upsert) {
+      c.collection.bulkWrite(docs.map(d => ({ replaceOne: { filter: { _id: d._id }, replacement: d, upsert: true } })),
+                             { ordered: false });
+    } else {
+      c.collection.insertMany(docs, { ordered: false });
+    }
+    c.written += docs.length;
+  } catch (e) {
+    // unordered: everything but the failed documents was written
+    const failed = (e.writeErrors && e.writeErrors.length) || docs.length;
+    c.errors += failed;
+    c.written += docs.length - failed;
+    if (!c.error) c.error = String(e && e.message || e);
+  }
+}
+
+for (let line = nextLine(); line !== null; line = nextLine()) {
+  if (!line.trim()) continue;
+  let cmd = {};
+  try {
+    cmd = EJSON.parse(line);
+    if (cmd.op === 'begin') {
+      current = { collection: db.getSiblingDB(cmd.db).getCollection(cmd.collection), upsert: !!cmd.upsert,
+                  written: 0, errors: 0, error: null };
+    } else if (cmd.op === 'docs') {
+      if (current) writeChunk(cmd.docs);
+    } else if (cmd.op === 'drop') {
+      db.getSiblingDB(cmd.db).getCollection(cmd.collection).drop();
+      print(JSON.stringify({ ok: true, seq: cmd.seq }));
+    } else if (cmd.op === 'end') {
+      const c = current || { written: 0, errors: 0, error: 'no collection in progress' };
+      print(JSON.stringify({ ok: !c.error, written: c.written, errors: c.errors, error: c.error, seq: cmd.seq }));
+      current = null;
+    }
+  } catch (e) {
+    if (current && cmd.op !== 'end') {
+      current.error = current.error || String(e && e.message || e);
+    } else {
+      current = null;
+      print(JSON.stringify({ ok: false, error: String(e && e.message || e), seq: cmd.seq }));
+    }
+  }
+}
+"""
+
+
+class RestoreSession:
+    """A mongosh process running RESTORE_DRIVER_JS; restores one collection at a time."""
+
+    def __init__(self, target, chunk_size=DEFAULT_CHUNK_SIZE):
+        self.target = target
+        self.chunk_size = chunk_size
+        self.proc = None
+        self.script_path = None
+        self.seq = 0
+
+    def start(self):
+        fd, self.script_path = tempfile.mkstemp(prefix='topogram-restore-', suffix='.js')
+        with os.fdopen(fd, 'w', encoding='utf-8') as handle:
+            handle.write(RESTORE_DRIVER_JS)
+        cmd = ['mongosh', '--quiet']
+        if self.target.get('url'):
+            cmd.append(self.target['url'])
+        else:
+            cmd.extend(['--port', str(self.target['port'])])
+        cmd.extend(['--file', self.script_path])
+        # stderr is inherited so mongosh warnings can never fill an unread pipe
+        self.proc = subprocess.Popen(cmd, stdin=subprocess.PIPE, stdout=subprocess.PIPE)
+
+    def drop(self, dbname, collection):
+        return self._request(lambda write, seq: write(
+            json.dumps({'op': 'drop', 'db': dbname, 'collection': collection, 'seq': seq}).encode() + b'\n'))
+
+    def restore(self, dbname, collection, lines, upsert=False, progress=None):
+        """Write `lines` (one JSON document each, bytes) into the collection in unordered chunks.
+
+        `progress(sent)` is called after every chunk; mongosh applies
+        backpressure through the pipe, so sent documents track written ones.
+        """
+        def send(write, seq):
+            write(json.dumps({'op': 'begin', 'db': dbname, 'collection': collection, 'upsert': upsert}).encode() + b'\n')
+            sent = 0
+            for chunk in iter_chunks(lines, self.chunk_size):
+                write(b'{"op":"docs","docs":[' + b','.join(chunk) + b']}\n')
+                sent += len(chunk)
+                if progress:
+                    progress(sent)
+            write(json.dumps({'op': 'end', 'seq': seq}).encode() + b'\n')
+
+        return self._request(send)
+
+    def _request(self, send):
+        if self.proc is None:
+            self.start()
+        self.seq += 1
+        try:
+            send(self.proc.stdin.write, self.seq)
+            self.proc.stdin.flush()
+            for line in self.proc.stdout:
+                line = line.strip()
+                if line.startswith(b'{'):
+                    try:
+                        res = json.loads(line)
+                    except ValueError:
+                        continue
+                    if res.get('seq') == self.seq:
+                        res.pop('seq')
+                        return res
+        except OSError as exc:
+            self.close()
+            return {'ok': False, 'error': f'mongosh session failed: {exc}'}
+        code = self.close()
+        return {'ok': False, 'error': f'mongosh exited with status {code}'}
+
+    def close(self):
+        code = None
+        if self.proc is not None:
+            try:
+                self.proc.stdin.close()
+            except OSError:
+                pass
+            code = self.proc.wait()
+            self.proc.stdout.close()
+            self.proc = None
+        if self.script_path and os.path.exists(self.script_path):
+            os.remove(self.script_path)
+        self.script_path = None
+        return code
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def iter_chunks(lines, chunk_size, max_bytes=CHUNK_MAX_BYTES):
+    """Group document lines into lists of at most `chunk_size` lines / about `max_bytes` bytes."""
+    chunk = []
+    size = 0
+    for line in lines:
+        line = line.strip()
+        if not line:
+            continue
+        if chunk and (len(chunk) >= chunk_size or size + len(line) > max_bytes):
+            yield chunk
+            chunk = []
+            size = 0
+        chunk.append(line)
+        size += len(line) + 1
+    if chunk:
+        yield chunk
+
+
+def archive_contents(archive):
+    """(manifest or None, shard index or None, {collection: file name}) of an export archive.
+
+    Reads tar headers in streaming mode; archives with a MANIFEST.json (which
+    sorts before the collection files) stop right after it.
+    """
+    manifest = index = None
+    files = {}
+    with tarfile.open(archive, 'r|*') as tf:
+        for ti in tf:
+            if ti.name == exporter.INDEX_NAME:
+                index = json.load(tf.extractfile(ti))
+            elif ti.name == exporter.MANIFEST_NAME:
+                manifest = json.load(tf.extractfile(ti))
+                files = {name: entry['file'] for name, entry in manifest['collections'].items()}
+                break
+            elif ti.isfile() and '.jsonl' in ti.name:
+                files[ti.name.split('.jsonl', 1)[0]] = ti.name
+    return manifest, index, files
+
+
+def is_plain_tar(archive):
+    """True for an uncompressed tar, whose members can be read with a seek."""
+    try:
+        with tarfile.open(archive, 'r:'):
+            return True
+    except tarfile.ReadError:
+        return False
+
+
+def iter_member_lines(archive, member):
+    """Document lines (bytes) of one collection file of an uncompressed tar, decompressed.
+
+    extractfile seeks straight to the member's data offset, so nothing before
+    it is read.
+    """
+    suffix = member.rsplit('.jsonl', 1)[1]
+    with tarfile.open(archive, 'r:') as tf:
+        try:
+            ti = tf.getmember(member)
+        except KeyError:
+            raise FileNotFoundError(f'{member} not found in {archive}') from None
+        with DECOMPRESSORS[suffix](tf.extractfile(ti)) as stream:
+            yield from stream
+
+
+class MemberFeed:
+    """Lines of one collection file, handed over in batches by `read_archive`.
+
+    The queue is bounded, so the reader runs at most FEED_QUEUE_BATCHES
+    batches ahead of the worker. None ends the file; an exception is raised
+    in the worker.
+    """
+
+    def __init__(self):
+        self.queue = queue.Queue(FEED_QUEUE_BATCHES)
+        self.done = False
+
+    def __iter__(self):
+        while not self.done:
+            batch = self.queue.get()
+            if batch is None or isinstance(batch, BaseException):
+                self.done = True
+                if batch is not None:
+                    raise batch
+                return
+            yield from batch
+
+    def drain(self):
+        """Discard what is left, so the reader never blocks on a worker that stopped early."""
+        try:
+            for _ in self:
+                pass
+        except Exception:
+            pass
+
+
+def read_archive(archive, feeds):
+    """Stream `archive` once, feeding the lines of each member named in `feeds` ({member: MemberFeed}).
+
+    Members are fed in archive order. Feeds still waiting when the archive
+    ends, or when reading fails, get the error instead.
+    """
+    pending = dict(feeds)
+    error = None
+    try:
+        with tarfile.open(archive, 'r|*') as tf:
+            for ti in tf:
+                feed = pending.get(ti.name)
+                if feed is None:
+                    continue
+                with DECOMPRESSORS[ti.name.rsplit('.jsonl', 1)[1]](tf.extractfile(ti)) as stream:
+                    batch = []
+                    for line in stream:
+                        batch.append(line)
+                        if len(batch) >= FEED_BATCH_LINES:
+                            feed.queue.put(batch)
+                            batch = []
+                    if batch:
+                        feed.queue.put(batch)
+                del pending[ti.name]
+                feed.queue.put(None)
+                if not pending:
+                    break
+    except Exception as exc:
+        error = exc
+    for member, feed in pending.items():
+        feed.queue.put(error or FileNotFoundError(f'{member} not found in {archive}'))
+
+
+def _ref(value):
+    # topogram reference as a string: relaxed EJSON {"$oid": hex}, a hex string or a Meteor id
+    if isinstance(value, dict):
+        return value.get('$oid')
+    return value
+
+
+def filter_topograms(lines, field, wanted):
+    """Only the lines whose `field` (or data.topogramId) references one of the `wanted` topograms."""
+    needles = [w.encode() for w in wanted]
+    for line in lines:
+        # cheap substring test first; most lines belong to other topograms
+        if not any(n in line for n in needles):
+            continue
+        doc = json.loads(line)
+        ref = _ref(doc.get(field))
+        if ref is None and field != '_id':
+            ref = _ref((doc.get('data') or {}).get(field))
+        if ref in wanted:
+            yield line
+
+
+def collection_lines(archive, name, lines, index, topograms):
+    """Lines to restore for one collection of one archive, out of all the `lines` of its file."""
+    if topograms is None:
+        return lines
+    field = TOPOGRAM_COLLECTIONS[name]
+    if index and name in index['collections']:
+        # sharded archive: seek to each wanted topogram instead of scanning the file
+        return (line.encode('utf-8') for tid in sorted(topograms)
+                for _, line in exporter.iter_topogram_lines(archive, tid, [name]))
+    return filter_topograms(lines, field, topograms)
+
+
+def main():
+    p = argparse.ArgumentParser()
+    p.add_argument('archives', nargs='+', help='Export archives, applied in order (a base, then its deltas)')
+    p.add_argument('--port', type=int, default=None, help='mongod port (default: detected like the exporter)')
+    p.add_argument('--mongo-url', default=None, help='MongoDB connection string (overrides --port)')
+    p.add_argument('--db', default=None, help="Database to restore into (default: the archive's, else meteor)")
+    p.add_argument('--commit', action='store_true', help='Actually write to the database; otherwise dry-run')
+    p.add_argument('--jobs', type=int, default=min(4, os.cpu_count() or 1),
+                   help='Collections restored concurrently, each with its own mongosh (default: min(4, CPUs))')
+    p.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE,
+                   help=f'Documents per unordered insertMany (default: {DEFAULT_CHUNK_SIZE})')
+    p.add_argument('--collections', nargs='+', default=None, help='Restore only these collections')
+    p.add_argument('--topogram', nargs='+', default=None, metavar='ID',
+                   help='Restore only these topograms (by _id) with their nodes and edges')
+    p.add_argument('--drop', action='store_true', help='Drop each collection before restoring the first archive')
+    p.add_argument('--upsert', action='store_true', help='Replace documents by _id instead of inserting (always on for deltas)')
+    args = p.parse_args()
+
+    if args.drop and args.topogram:
+        raise SystemExit('--drop would delete every other topogram; it cannot be combined with --topogram')
+    if args.mongo_url and args.port:
+        raise SystemExit('Use either --mongo-url or --port, not both')
+    target = {'url': args.mongo_url} if args.mongo_url else {'port': args.port or exporter.detect_mongod_port()}
+    topograms = set(args.topogram) if args.topogram else None
+    print(f"Restoring {len(args.archives)} archive(s) into {target.get('url') or 'port ' + str(target.get('port'))}; "
+          f'commit={args.commit}')
+
+    lock = threading.Lock()
+    failed = []
+    grand_total = 0
+    started = time.perf_counter()
+    for n, archive in enumerate(args.archives):
+        try:
+            manifest, index, files = archive_contents(archive)
+        except (tarfile.TarError, OSError, ValueError) as exc:
+            # later archives are deltas on top of this one: stop here
+            print(f'Cannot read {archive}: {type(exc).__name__}: {exc}', file=sys.stderr)
+            failed.append(archive)
+            break
+        dbname = args.db or (manifest or {}).get('db') or 'meteor'
+        kind = (manifest or {}).get('kind', 'full')
+        upsert = args.upsert or kind == 'delta'
+        names = [name for name in sorted(files)
+                 if (args.collections is None or name in args.collections)
+                 and (topograms is None or name in TOPOGRAM_COLLECTIONS)]
+        print(f"{archive}: {kind} export, {len(names)} collections -> {dbname} ({'upsert' if upsert else 'insert'})")
+
+        # a compressed archive is read once, by one thread feeding every worker
+        feeds = {} if is_plain_tar(archive) else {files[name]: MemberFeed() for name in names}
+
+        def restore_one(name):
+            feed = feeds.get(files[name])
+            try:
+                return restore_collection(name, iter_member_lines(archive, files[name]) if feed is None else feed)
+            finally:
+                if feed is not None:
+                    feed.drain()
+
+        def restore_collection(name, member_lines):
+            t0 = last = time.perf_counter()
+
+            def progress(sent):
+                nonlocal last
+                now = time.perf_counter()
+                if now - last >= PROGRESS_SECONDS:
+                    last = now
+                    with lock:
+                        print(f'  {name}: {sent} docs ({sent / (now - t0):.0f} docs/s)')
+
+            try:
+                lines = collection_lines(archive, name, member_lines, index, topograms)
+                if not args.commit:
+                    res = {'ok': True, 'written': sum(len(c) for c in iter_chunks(lines, args.chunk_size)), 'errors': 0}
+                else:
+                    with RestoreSession(target, chunk_size=args.chunk_size) as session:
+                        res = session.drop(dbname, name) if args.drop and n == 0 else {'ok': True}
+                        if res.get('ok'):
+                            res = session.restore(dbname, name, lines, upsert=upsert, progress=progress)
+            except Exception as exc:
+                # e.g. a malformed line or an archive error from the reader: the chunks sent so far were applied
+                res = {'ok': False, 'error': f'{type(exc).__name__}: {exc}', 'partial': args.commit}
+            seconds = time.perf_counter() - t0
+            written = res.get('written', 0)
+            with lock:
+                verb = 'Restored' if args.commit else 'Would restore'
+                print(f"{verb} {name}: {written} docs in {seconds:.1f}s ({written / max(seconds, 1e-9):.0f} docs/s)"
+                      + (f", errors={res.get('errors', 0)}: {res.get('error')}" if not res.get('ok') else '')
+                      + (' (stopped part-way; the collection may be partly restored)' if res.get('partial') else ''))
+                if not res.get('ok'):
+                    failed.append(f'{archive}:{name}')
+            return written
+
+        if feeds:
+            # workers start in the order the reader feeds them (the exporter writes files sorted by
+            # name), so a reader blocked on a full queue always has a running worker to wait for
+            names.sort(key=lambda name: files[name])
+            reader = threading.Thread(target=read_archive, args=(archive, feeds), daemon=True)
+            reader.start()
+        else:
+            # biggest collections (nodes, edges) first, so they do not start last
+            names.sort(key=lambda name: -(((manifest or {}).get('collections') or {}).get(name, {}).get('docs', 0)))
+        with ThreadPoolExecutor(max_workers=max(1, args.jobs)) as pool:
+            grand_total += sum(pool.map(restore_one, names))
+        if feeds:
+            reader.join()
+
+    elapsed = time.perf_counter() - started
+    print(f'Summary: docs={grand_total} elapsed={elapsed:.1f}s ({grand_total / max(elapsed, 1e-9):.0f} docs/s) '
+          f'failed={len(failed)}')
+    if failed:
+        print('Failed:', ', '.join(failed), file=sys.stderr)
+        if args.commit:
+            print('Failed collections may be partly restored; fix the cause and restore them again with '
+                  '--collections ... --upsert', file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+"""
+scripts/topogram_binary.py
+
+Compact binary topogram format (`.topogram.bin`), an alternative to the CSV
+written by `build_debian_topogram.py` for large generated graphs.
+
+A topogram holds the same fields as the CSV header (`NODE_FIELDS` then
+`EDGE_FIELDS`), stored by column instead of by row. Every value is interned
+once in a string table and each column is an array of uint32 string ids. So
+an edge's source/target are plain int arrays that share ids with the node `id`
+column, and repeated values ('#333', 'Depends', empty fields) cost 4 bytes.
+
+Layout (little-endian, every section 4-byte aligned):
+
+  header      magic, version, field counts, string/node/edge counts, blob size
+  fields      node then edge field names, '\\n'-joined, padded to 8 bytes
+  offsets     uint32[strings + 1] byte offsets into the blob; string 0 is ''
+  node cols   uint32[nodes] per node field, column after column
+  edge cols   uint32[edges] per edge field, column after column
+  blob        utf-8 string data
+
+`TopogramFile.open` memory-maps the file, and `column()` returns zero-copy
+memoryviews that can be sliced without reading the rest of the file. Strings
+are decoded on demand and cached by id.
+"""
+
+import mmap
+import os
+import struct
+import sys
+from array import array
+from pathlib import Path
+
+MAGIC = b'TPGTOPOG'
+VERSION = 1
+SUFFIX = '.topogram.bin'
+
+NODE_FIELDS = ('id', 'name', 'label', 'description', 'color', 'fillColor', 'weight', 'rawWeight', 'lat', 'lng', 'emoji', 'notes')
+EDGE_FIELDS = ('source', 'target', 'edgeLabel', 'edgeColor', 'edgeWeight', 'relationship', 'enlightement', 'extra')
+
+_HEADER = struct.Struct('<8sIIIIIIIQ')
+
+
+def write_topogram(path, nodes, edges):
+    """Write node and edge rows to `path` in the binary format.
+
+    `nodes` yields tuples in NODE_FIELDS order and `edges` tuples in
+    EDGE_FIELDS order (the CSV columns, without the padding of the other
+    kind). The output is deterministic for the same rows, and it is written
+    to a temporary sibling and renamed so readers never see a partial file.
+    """
+    ids = {'': 0}
+    blob = bytearray()
+    offsets = array('I', [0, 0])
+
+    def intern(value):
+        sid = ids.get(value)
+        if sid is None:
+            sid = ids[value] = len(offsets) - 1
+            blob.extend(value.encode('utf-8'))
+            if len(blob) > 0xFFFFFFFF:
+                raise ValueError('Topogram strings too large for binary format')
+            offsets.append(len(blob))
+        return sid
+
+    def columns(rows, width):
+        cols = [array('I') for _ in range(width)]
+        appends = [col.append for col in cols]
+        count = 0
+        for row in rows:
+            if len(row) != width:
+                raise ValueError(f'Expected {width} fields, got {len(row)}: {row!r}')
+            for append, value in zip(appends, row):
+                append(intern(value))
+            count += 1
+        return cols, count
+
+    node_cols, n_nodes = columns(nodes, len(NODE_FIELDS))
+    edge_cols, n_edges = columns(edges, len(EDGE_FIELDS))
+    if sys.byteorder != 'little':
+        for arr in (offsets, *node_cols, *edge_cols):
+            arr.byteswap()
+    field_bytes = '\n'.join(NODE_FIELDS + EDGE_FIELDS).encode('ascii')
+    field_pad = b'\0' * (-len(field_bytes) % 8)
+    path = Path(path)
+    tmp = path.with_name(path.name + f'.tmp{os.getpid()}')
+    try:
+        with open(tmp, 'wb') as fh:
+            fh.write(_HEADER.pack(MAGIC, VERSION, len(NODE_FIELDS), len(EDGE_FIELDS), len(field_bytes),
+                                  len(offsets) - 1, n_nodes, n_edges, len(blob)))
+            fh.write(field_bytes + field_pad)
+            fh.write(offsets.tobytes())
+            for col in node_cols + edge_cols:
+                fh.write(col.tobytes())
+            fh.write(blob)
+        os.replace(tmp, path)
+    except BaseException:
+        if tmp.exists():
+            tmp.unlink()
+        raise
+    return path
+
+
+class TopogramFile:
+    """Read-only, memory-mapped view of a `.topogram.bin` file."""
+
+    def __init__(self, buf, path=None):
+        self.path = path
+        self._buf = buf
+        if len(buf) < _HEADER.size:
+            raise ValueError(f'Not a binary topogram: {path}')
+        magic, version, n_nf, n_ef, flen, n_strings, n_nodes, n_edges, blen = _HEADER.unpack_from(buf, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f'Not a binary topogram (or unsupported version): {path}')
+        pos = _HEADER.size
+        fields = bytes(buf[pos:pos + flen]).decode('ascii').split('\n')
+        if tuple(fields[:n_nf]) != NODE_FIELDS or tuple(fields[n_nf:]) != EDGE_FIELDS:
+            raise ValueError(f'Binary topogram field layout mismatch: {path}')
+        pos += flen + (-flen % 8)
+        self.node_count = n_nodes
+        self.edge_count = n_edges
+        self.string_count = n_strings
+        self._views = []
+        self._offsets = self._uint32_view(pos, (n_strings + 1) * 4)
+        pos += (n_strings + 1) * 4
+        self._columns = {}
+        for kind, names, count in (('nodes', NODE_FIELDS, n_nodes), ('edges', EDGE_FIELDS, n_edges)):
+            for name in names:
+                self._columns[kind, name] = self._uint32_view(pos, count * 4)
+                pos += count * 4
+        if pos + blen > len(buf):
+            raise ValueError(f'Truncated binary topogram: {path}')
+        self._base = pos
+        self._strings = [None] * n_strings
+
+    def _uint32_view(self, pos, length):
+        if pos + length > len(self._buf):
+            raise ValueError(f'Truncated binary topogram: {self.path}')
+        if sys.byteorder == 'little':
+            view = memoryview(self._buf)[pos:pos + length].cast('I')
+            self._views.append(view)
+            return view
+        arr = array('I', bytes(self._buf[pos:pos + length]))
+        arr.byteswap()
+        return arr
+
+    @classmethod
+    def open(cls, path):
+        with open(path, 'rb') as fh:
+            if os.fstat(fh.fileno()).st_size == 0:
+                raise ValueError(f'Not a binary topogram: {path}')
+            buf = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            return cls(buf, path=str(path))
+        except Exception:
+            buf.close()
+            raise
+
+    def close(self):
+        for view in self._views:
+            view.release()
+        self._views = []
+        if isinstance(self._buf, mmap.mmap):
+            self._buf.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def column(self, kind, field):
+        """uint32 string ids of one column (`kind` is 'nodes' or 'edges'); slicing is zero-copy."""
+        return self._columns[kind, field]
+
+    def string(self, sid):
+        value = self._strings[sid]
+        if value is None:
+            start = self._base + self._offsets[sid]
+            value = self._strings[sid] = str(self._buf[start:self._base + self._offsets[sid + 1]], 'utf-8')
+        return value
+
+    def rows(self, kind, start=0, stop=None):
+        """Yield rows of `kind` between `start` and `stop` as tuples of strings, in field order."""
+        fields = NODE_FIELDS if kind == 'nodes' else EDGE_FIELDS
+        count = self.node_count if kind == 'nodes' else self.edge_count
+        stop = count if stop is None else min(stop, count)
+        string = self.string
+        cols = [self._columns[kind, f][start:stop] for f in fields]
+        try:
+            for sids in zip(*cols):
+                yield tuple([string(sid) for sid in sids])
+        finally:
+            for col in cols:
+                if isinstance(col, memoryview):
+                    col.release()
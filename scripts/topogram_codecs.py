@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""
+scripts/topogram_codecs.py
+
+Compressed topogram CSV files. `x.topogram.csv.gz`, `.csv.bz2` and `.csv.xz`
+hold the same text as `x.topogram.csv`, and every script that reads or writes
+topogram CSVs opens them through `open_csv`. The codec comes from the file
+suffix unless one is given explicitly (e.g. for temporary files).
+
+Gzip output has no file name or timestamp in its header, so the same rows
+always compress to the same bytes, and `batch_build_topograms.py` can still
+skip rewriting unchanged files.
+"""
+
+import bz2
+import gzip
+import io
+import lzma
+from contextlib import contextmanager
+
+# codec -> (suffix, writer(fh, level), reader(fh), default level)
+CODECS = {
+    'gzip': ('.gz', lambda fh, level: gzip.GzipFile(filename='', fileobj=fh, mode='wb', compresslevel=level, mtime=0),
+             lambda fh: gzip.GzipFile(fileobj=fh, mode='rb'), 6),
+    'bz2': ('.bz2', lambda fh, level: bz2.BZ2File(fh, mode='wb', compresslevel=max(1, level)),
+            lambda fh: bz2.BZ2File(fh, mode='rb'), 9),
+    'xz': ('.xz', lambda fh, level: lzma.LZMAFile(fh, mode='wb', preset=level),
+           lambda fh: lzma.LZMAFile(fh, mode='rb'), 6),
+}
+CSV_SUFFIXES = ('.csv',) + tuple('.csv' + suffix for suffix, *_ in CODECS.values())
+TOPOGRAM_CSV_PATTERNS = tuple('*.topogram' + suffix for suffix in CSV_SUFFIXES)
+
+BUFFER_SIZE = 1 << 20
+
+
+def codec_for_path(path):
+    """Codec name for a compressed suffix of `path`, or None for plain files."""
+    name = str(path).lower()
+    for codec, (suffix, *_) in CODECS.items():
+        if name.endswith(suffix):
+            return codec
+    return None
+
+
+def is_csv(path):
+    """True for `.csv` files, compressed or not."""
+    return str(path).lower().endswith(CSV_SUFFIXES)
+
+
+@contextmanager
+def open_csv(path, mode='r', codec=None, level=None):
+    """Open a (possibly compressed) CSV file as utf-8 text for the csv module.
+
+    `mode` is 'r' or 'w'. `codec` defaults to the one named by the suffix of
+    `path`; pass it explicitly when the name does not carry it. Reads and
+    writes go through a BUFFER_SIZE buffer.
+    """
+    codec = codec or codec_for_path(path)
+    with open(path, mode + 'b', buffering=BUFFER_SIZE) as raw:
+        if codec is None:
+            stream = raw
+        else:
+            _, writer, reader, default_level = CODECS[codec]
+            stream = writer(raw, default_level if level is None else level) if mode == 'w' else reader(raw)
+        with io.TextIOWrapper(stream, encoding='utf-8', newline='') as text:
+            yield text